@@ -9,12 +9,24 @@ environmental changes.
 
 from __future__ import annotations
 
+import bisect
+import collections
+import contextlib
+import datetime
+import functools
+import itertools
+import math
+import queue
+import threading
+import time
 from types import MappingProxyType
 from typing import TYPE_CHECKING
 
 import appdaemon.plugins.hass.hassapi as hass
 
 if TYPE_CHECKING:
+    from collections.abc import Callable
+
     from climate import Climate
     from control import Control
     from lights import Lights
@@ -48,27 +60,1452 @@ class IDs:
         return cls.get_name(id_value) == "System"
 
 
+class GroupIndex:
+    """Members of each group, kept current as groups change.
+
+    Loaded with the state cache's snapshot and updated from the same events, so
+    group-backed devices don't need to look up their group's state to find its
+    members. Apps can subscribe to be told when a group's members change, which
+    they are (with a members keyword argument) on their own thread.
+    """
+
+    def __init__(self):
+        """Start with no groups indexed or subscribed to."""
+        self.members: dict[str, tuple[str, ...]] = {}
+        self.changes = 0
+        self.__subscribers: dict[str, list[tuple[App, Callable]]] = {}
+
+    def load(self, states: dict[str, dict]):
+        """Index the members of every group in a bulk snapshot of states."""
+        self.members = {
+            entity_id: tuple(state.get("attributes", {}).get("entity_id", ()))
+            for entity_id, state in states.items()
+            if entity_id.startswith("group.")
+        }
+
+    def update(self, group_id: str, state: dict | None):
+        """Update a group's members from its state, telling subscribers of changes."""
+        members = tuple(
+            (state or {}).get("attributes", {}).get("entity_id", ()),
+        )
+        if self.members.get(group_id, members) == members:
+            self.members[group_id] = members
+            return
+        self.members[group_id] = members
+        self.changes += 1
+        for app, callback in self.__subscribers.get(group_id, ()):
+            app.run_in(callback, 0, members=members)
+
+    def get(self, app: App, group_id: str) -> tuple[str, ...]:
+        """Get the members of a group (looking up the group if not yet indexed)."""
+        members = self.members.get(group_id)
+        if members is None:
+            members = tuple(app.state_cache.get(app, group_id, "entity_id", ()))
+            self.members[group_id] = members
+        return members
+
+    def subscribe(self, app: App, group_id: str, callback: Callable):
+        """Call back with a group's new members whenever they change."""
+        self.__subscribers.setdefault(group_id, []).append((app, callback))
+
+    def release(self, app: App):
+        """Drop an app's subscriptions (before it terminates)."""
+        for group_id, subscribers in list(self.__subscribers.items()):
+            subscribers[:] = [
+                subscriber for subscriber in subscribers if subscriber[0] is not app
+            ]
+            if not subscribers:
+                del self.__subscribers[group_id]
+
+
+class StateCache:
+    """Process-wide cache of Home Assistant states shared by all apps.
+
+    Loaded from a single bulk snapshot and then kept current by 'state_changed'
+    events, so repeated reads of the same entity (and the parsing of its numeric
+    values) don't go back through AppDaemon's state API every time.
+    Returned values are shared between apps, so they must be treated as read-only.
+    """
+
+    def __init__(self):
+        """Start empty, the first app to attach loads the snapshot."""
+        self.states: dict[str, dict] = {}
+        self.parsed: dict[str, dict[str | None, str | float | list | None]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.groups = GroupIndex()
+        self.versions: collections.Counter[str] = collections.Counter()
+        self.__lock = threading.Lock()
+        self.__apps: list[App] = []
+        self.__listener: App | None = None
+
+    @property
+    def stats(self) -> dict:
+        """Get the number of cached entities and groups, hits, misses and hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            "entities": len(self.states),
+            "groups": len(self.groups.members),
+            "group_changes": self.groups.changes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0,
+        }
+
+    def attach(self, app: App):
+        """Register an app, loading the snapshot and listening if it's the first."""
+        with self.__lock:
+            self.__apps.append(app)
+            if self.__listener is not None:
+                return
+            self.__listener = app
+        self.__load(app)
+
+    def detach(self, app: App):
+        """Unregister an app, handing over event listening if it was the listener."""
+        with self.__lock:
+            if app in self.__apps:
+                self.__apps.remove(app)
+            if self.__listener is not app:
+                return
+            self.__listener = self.__apps[0] if self.__apps else None
+        if self.__listener is not None:
+            self.__load(self.__listener)
+        else:
+            self.states = {}
+            self.parsed = {}
+
+    def __load(self, app: App):
+        """Replace the cache with a bulk snapshot then listen for changes."""
+        self.states = hass.Hass.get_state(app)
+        self.parsed = {}
+        self.groups.load(self.states)
+        self.versions.update(entity_id.split(".")[0] for entity_id in self.states)
+        app.listen_event(self.__handle_state_changed, "state_changed")
+        app.log(f"State cache loaded with {len(self.states)} entities", level="DEBUG")
+
+    def __handle_state_changed(self, event_name: str, data: dict, **kwargs: dict):
+        """Update the cached state of an entity (or remove it if deleted)."""
+        del event_name, kwargs
+        entity_id = data["entity_id"]
+        new_state = data.get("new_state")
+        self.parsed.pop(entity_id, None)
+        self.versions[entity_id.split(".")[0]] += 1
+        if entity_id.startswith("group."):
+            self.groups.update(entity_id, new_state)
+        if new_state is None:
+            self.states.pop(entity_id, None)
+            return
+        cached = self.states.get(entity_id)
+        if cached is None or cached.get("last_updated", "") <= new_state.get(
+            "last_updated",
+            "",
+        ):
+            self.states[entity_id] = new_state
+
+    def version(self, domain: str) -> int:
+        """Get a number that changes whenever any entity in the domain changes."""
+        return self.versions[domain]
+
+    def invalidate(self, entity_id: str):
+        """Drop an entity so it is fetched fresh on its next lookup."""
+        self.states.pop(entity_id, None)
+        self.parsed.pop(entity_id, None)
+
+    def get(
+        self,
+        app: App,
+        entity_id: str,
+        attribute: str | None = None,
+        default: str | float | None = None,
+    ) -> str | float | list | dict | None:
+        """Get an entity's state or attribute, as AppDaemon's get_state would."""
+        state = self.states.get(entity_id)
+        if state is None:
+            self.misses += 1
+            state = hass.Hass.get_state(app, entity_id, attribute="all")
+            if state is None:
+                return default
+            self.states[entity_id] = state
+        else:
+            self.hits += 1
+        value = self.__value(state, attribute)
+        return default if value is None else value
+
+    @staticmethod
+    def __value(state: dict, attribute: str | None) -> str | float | list | dict | None:
+        """Get an entity's state or attribute (or whole state for 'all')."""
+        if attribute == "all":
+            return state
+        if attribute is None:
+            return state.get("state")
+        if attribute in state.get("attributes", {}):
+            return state["attributes"][attribute]
+        return state.get(attribute)
+
+    def observe(self, entity_id: str, attribute: str | None, new) -> dict | None:
+        """Bring an entity up to date with a state callback's new value, if possible.
+
+        Whole new states replace older cached ones. A single new value can only be
+        confirmed, so an entity whose 'state_changed' event hasn't been handled yet
+        is dropped to be fetched fresh. Returns the entity's state, if up to date.
+        """
+        cached = self.states.get(entity_id)
+        if attribute == "all" and isinstance(new, dict):
+            if cached is None or cached.get("last_updated", "") <= new.get(
+                "last_updated",
+                "",
+            ):
+                self.states[entity_id] = cached = new
+                self.parsed.pop(entity_id, None)
+            return cached
+        if cached is not None and self.__value(cached, attribute) == new:
+            return cached
+        self.invalidate(entity_id)
+        return None
+
+    def get_value(
+        self,
+        app: App,
+        entity_id: str,
+        attribute: str | None = None,
+        default: str | float | None = None,
+    ) -> str | float | list | None:
+        """Get a state or attribute as a float if numeric, parsing only once."""
+        parsed = self.parsed.get(entity_id)
+        if parsed is not None and attribute in parsed and entity_id in self.states:
+            self.hits += 1
+            value = parsed[attribute]
+            return default if value is None else value
+        value = self.get(app, entity_id, attribute)
+        if value is not None:
+            with contextlib.suppress(ValueError, TypeError):
+                value = float(value)
+        self.parsed.setdefault(entity_id, {})[attribute] = value
+        return default if value is None else value
+
+
+class ServiceCallQueue:
+    """Outbound service calls merged per entity and batched within each dispatch tick.
+
+    Calls are held until the tick ends (the next AppDaemon scheduler run), then
+    only the final desired state of each entity is sent: turning off supersedes
+    everything queued before it, turning on merges its parameters and any other
+    service keeps only its latest parameters. Entities with identical calls are
+    then sent together as a single call with a list of entity IDs.
+    """
+
+    def __init__(self):
+        """Start with nothing queued."""
+        self.pending: dict[str, dict[str, dict]] = {}
+        self.sent = 0
+        self.commands = 0
+        self.suppressed = 0
+        self.__lock = threading.Lock()
+        self.__flush_lock = threading.Lock()  # one flush at a time keeps calls in order
+        self.__flush_app: App | None = None
+
+    @property
+    def stats(self) -> dict:
+        """Get the number of calls sent, entity commands they held, and suppressed."""
+        return {
+            "sent": self.sent,
+            "commands": self.commands,
+            "suppressed": self.suppressed,
+        }
+
+    def queue(self, app: App, service: str, entity_id: str, **kwargs: dict):
+        """Queue a service call, merging it with any already queued for the entity."""
+        with self.__lock:
+            calls = self.pending.setdefault(entity_id, {})
+            domain, action = service.split("/")
+            if action == "turn_off":
+                self.suppressed += len(calls)
+                calls.clear()
+            elif action == "turn_on":
+                self.suppressed += calls.pop(f"{domain}/turn_off", None) is not None
+            previous_kwargs = calls.pop(service, None)
+            if previous_kwargs is not None:
+                self.suppressed += 1
+                if action == "turn_on":
+                    kwargs = {**previous_kwargs, **kwargs}
+            calls[service] = kwargs
+            if self.__flush_app is None:
+                self.__flush_app = app
+                app.run_in(self.flush, 0)
+
+    def discard(self, entity_id: str) -> bool:
+        """Drop any calls queued for an entity, returning if there were any."""
+        with self.__lock:
+            calls = self.pending.pop(entity_id, {})
+            self.suppressed += len(calls)
+        return bool(calls)
+
+    def flush(self, **kwargs: dict):
+        """Send the final queued calls for each entity, batching identical calls."""
+        del kwargs
+        with self.__flush_lock:
+            with self.__lock:
+                app = self.__flush_app
+                pending = self.pending
+                self.pending = {}
+                self.__flush_app = None
+            self.__send(app, pending)
+
+    def __send(self, app: App, pending: dict[str, dict[str, dict]]):
+        """Send the calls drained from the queue, one round of each entity's at once."""
+        rounds = [list(calls.items()) for calls in pending.values()]
+        entity_ids = list(pending)
+        for call_round in range(max((len(calls) for calls in rounds), default=0)):
+            batches: dict[tuple[str, str], tuple[str, dict, list[str]]] = {}
+            for entity_id, calls in zip(entity_ids, rounds, strict=True):
+                if call_round >= len(calls):
+                    continue
+                service, service_kwargs = calls[call_round]
+                batch_key = (service, repr(sorted(service_kwargs.items())))
+                batches.setdefault(batch_key, (service, service_kwargs, []))[2].append(
+                    entity_id,
+                )
+            with self.__lock:
+                self.commands += sum(len(batch[2]) for batch in batches.values())
+            for service, service_kwargs, batch_entity_ids in batches.values():
+                app.call_service(
+                    service,
+                    entity_id=batch_entity_ids
+                    if len(batch_entity_ids) > 1
+                    else batch_entity_ids[0],
+                    **service_kwargs,
+                )
+                with self.__lock:
+                    self.sent += 1
+
+    def release(self, app: App):
+        """Flush immediately if the app (about to terminate) was going to flush."""
+        if self.__flush_app is app:
+            self.flush()
+
+
+class PlanCache:
+    """Plans (e.g. for scene transitions) compiled once and reused while valid.
+
+    Keys must include everything a plan is compiled from, such as the versions of
+    the domains of any settings it reads, so that a change to any of them results
+    in a new key (and so a fresh plan) rather than a stale one.
+    """
+
+    max_plans = 256
+
+    def __init__(self):
+        """Start with no plans compiled."""
+        self.plans: dict[tuple, tuple] = {}
+        self.hits = 0
+        self.compiles = 0
+
+    @property
+    def stats(self) -> dict:
+        """Get the number of plans cached, reused and compiled."""
+        return {"plans": len(self.plans), "hits": self.hits, "compiles": self.compiles}
+
+    def get(self, key: tuple, compile_plan: Callable[[], tuple]) -> tuple:
+        """Get the plan for a key, compiling (and caching) it if there isn't one."""
+        plan = self.plans.get(key)
+        if plan is not None:
+            self.hits += 1
+            return plan
+        if len(self.plans) >= self.max_plans:
+            self.plans.clear()
+        plan = self.plans[key] = compile_plan()
+        self.compiles += 1
+        return plan
+
+
+class Settings:
+    """Typed snapshot of an app's UI settings, loaded once and updated as they change.
+
+    Subclasses annotate each setting, named after its input_number (or its
+    input_datetime, for names ending in '_time'), so device logic reads plain
+    attributes instead of getting and converting states. The version is bumped by
+    every change, for caches of anything compiled from the settings.
+    """
+
+    number_type: type = float
+
+    def __init__(self, app: App):
+        """Load each setting, then follow changes through the app's dispatcher."""
+        self.version = 0
+        self.__app = app
+        for name in type(self).__annotations__:
+            entity_id = (
+                f"input_datetime.{name}"
+                if name.endswith("_time")
+                else f"input_number.{name}"
+            )
+            setattr(self, name, None)
+            self.__set(name, app.get_state(entity_id))
+            app.dispatcher.listen(self.__handle_change, entity_id)
+
+    def __set(self, name: str, state: str | None) -> bool:
+        """Set a setting from its state, returning False (and keeping it) if invalid."""
+        try:
+            value = (
+                self.__app.parse_time(state)
+                if name.endswith("_time")
+                else self.number_type(float(state))
+            )
+        except (TypeError, ValueError):
+            return False
+        setattr(self, name, value)
+        return True
+
+    def __handle_change(
+        self,
+        entity: str,
+        attribute: str,
+        old: str,
+        new: str,
+        **kwargs: dict,
+    ):
+        """Update a setting when it changes."""
+        del attribute, old, kwargs
+        if self.__set(entity.split(".", 1)[1], new):
+            self.version += 1
+
+
+class AppRegistry:
+    """Process-wide references to app instances, resolved once per app lifecycle.
+
+    Each app binds itself when AppDaemon initialises it and is released when
+    AppDaemon terminates it (e.g. on reload), so lookups between apps only fall
+    back to AppDaemon's get_app while an app is between those events.
+    """
+
+    def __init__(self):
+        """Start with no apps bound."""
+        self.apps: dict[str, App] = {}
+        self.lookups = 0
+        self.resolutions = 0
+
+    @property
+    def stats(self) -> dict:
+        """Get the number of lookups and how many needed AppDaemon to resolve."""
+        return {"lookups": self.lookups, "resolutions": self.resolutions}
+
+    def bind(self, app: App):
+        """Register an app instance as the reference for its name."""
+        self.apps[app.name] = app
+
+    def release(self, app: App):
+        """Forget an app instance (if it is still the one bound to its name)."""
+        if self.apps.get(app.name) is app:
+            del self.apps[app.name]
+
+    def get(self, app: App, name: str) -> App | None:
+        """Get a bound app instance, resolving it via AppDaemon if not yet bound."""
+        self.lookups += 1
+        instance = self.apps.get(name)
+        if instance is None:
+            self.resolutions += 1
+            instance = app.get_app(name)
+            if instance is not None:
+                self.apps[name] = instance
+        return instance
+
+
+class NotificationQueue:
+    """Process-wide notification pipeline, delivering in the background.
+
+    Notifications are delivered by the scheduler of the app that queued them, in
+    priority order (critical first), with each one sent to all of its targets in
+    parallel (a callback per target, unpinned so AppDaemon runs them on any free
+    worker thread rather than one after another on the app's). Non-critical
+    notifications are dropped if an identical one (same tag, message and targets)
+    was queued recently.
+    """
+
+    def __init__(self, dedup_window: float = 300):
+        """Prepare the queue, delivery is scheduled when notifications are queued."""
+        self.dedup_window = dedup_window
+        self.queue: queue.PriorityQueue = queue.PriorityQueue()
+        self.recent: dict[tuple[str, str, str], float] = {}
+        self.delivered = 0
+        self.deduplicated = 0
+        self.latencies: collections.deque[float] = collections.deque(maxlen=100)
+        self.__sequence = itertools.count()
+        self.__lock = threading.Lock()
+        self.__delivery_app: App | None = None
+
+    @property
+    def stats(self) -> dict:
+        """Get delivery counts and recent latency (seconds from queued to sent)."""
+        return {
+            "queued": self.queue.qsize(),
+            "delivered": self.delivered,
+            "deduplicated": self.deduplicated,
+            "mean_latency": sum(self.latencies) / len(self.latencies)
+            if self.latencies
+            else None,
+            "max_latency": max(self.latencies, default=None),
+        }
+
+    def enqueue(self, app: App, message: str, **kwargs: dict) -> bool:
+        """Queue a notification for delivery, returning False if it's a duplicate."""
+        critical = bool(kwargs.get("critical"))
+        key = (kwargs["title"], message, kwargs.get("targets", "all"))
+        now = time.monotonic()
+        with self.__lock:
+            if (
+                not critical
+                and now - self.recent.get(key, -math.inf) < self.dedup_window
+            ):
+                self.deduplicated += 1
+                app.log(
+                    f'Ignoring duplicate notification: "{kwargs["title"]}: {message}"',
+                    level="DEBUG",
+                )
+                return False
+            self.recent = {
+                recent_key: queued_at
+                for recent_key, queued_at in self.recent.items()
+                if now - queued_at < self.dedup_window
+            }
+            self.recent[key] = now
+            self.queue.put(
+                (
+                    0 if critical else 1,
+                    next(self.__sequence),
+                    now,
+                    app,
+                    message,
+                    kwargs,
+                ),
+            )
+            if self.__delivery_app is None:
+                self.__delivery_app = app
+                app.run_in(self.deliver, 0)
+        return True
+
+    def close(self):
+        """Deliver anything still queued straight away (as the last app terminates)."""
+        self.deliver(immediately=True)
+
+    def deliver(self, *, immediately: bool = False, **kwargs: dict):
+        """Fan queued notifications (highest priority first) out to their targets.
+
+        Each target is sent to in its own unpinned callback, unless delivering
+        immediately.
+        """
+        del kwargs
+        with self.__lock:
+            self.__delivery_app = None
+        while True:
+            try:
+                _, _, queued_at, app, message, kwargs = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            targets = kwargs.get("targets", "all")
+            try:
+                people = app.notification_recipients(targets)
+            except Exception as error:  # noqa: BLE001 - keep delivering others
+                app.log(
+                    f"Failed to notify '{targets}' of \"{kwargs['title']}\": {error!r}",
+                    level="WARNING",
+                )
+                continue
+            notification = {
+                "queued_at": queued_at,
+                "app": app,
+                "message": message,
+                "kwargs": kwargs,
+                "unsent": len(people),
+                "failed": False,
+            }
+            if not people:
+                self.__finish(notification)
+            for person in people:
+                if immediately:
+                    self.__send(notification=notification, person=person)
+                else:
+                    app.run_in(
+                        self.__send,
+                        0,
+                        notification=notification,
+                        person=person,
+                        pin=False,
+                    )
+
+    def __send(self, **kwargs: dict):
+        """Send a notification to one of its targets, finishing it after the last."""
+        notification = kwargs["notification"]
+        app = notification["app"]
+        try:
+            app.send_notification(
+                kwargs["person"],
+                notification["message"],
+                **notification["kwargs"],
+            )
+        except Exception as error:  # noqa: BLE001 - keep sending to others
+            app.log(
+                f"Failed to notify '{kwargs['person']}' of "
+                f'"{notification["kwargs"]["title"]}": {error!r}',
+                level="WARNING",
+            )
+            notification["failed"] = True
+        with self.__lock:
+            notification["unsent"] -= 1
+            finished = notification["unsent"] == 0
+        if finished:
+            self.__finish(notification)
+
+    def __finish(self, notification: dict):
+        """Record a notification's latency once sent to all targets (unless failed)."""
+        if notification["failed"]:
+            return
+        latency = time.monotonic() - notification["queued_at"]
+        with self.__lock:
+            self.latencies.append(latency)
+            self.delivered += 1
+        targets = notification["kwargs"].get("targets", "all")
+        notification["app"].log(
+            f"Notified '{targets}': \"{notification['kwargs']['title']}: "
+            f'{notification["message"]}" ({latency * 1000:.0f} ms after queueing)',
+        )
+
+
+class CallbackStats:
+    """Process-wide invocation counts, wall times and queueing delays of callbacks."""
+
+    histogram_buckets = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 15)
+
+    def __init__(self):
+        """Start with no callbacks recorded."""
+        self.callbacks: dict[str, dict] = {}
+        self.__lock = threading.Lock()
+
+    def record(self, name: str, wall_time: float, queue_delay: float | None):
+        """Record a single invocation of a callback (times in seconds)."""
+        with self.__lock:
+            stats = self.callbacks.get(name)
+            if stats is None:
+                stats = self.callbacks[name] = {
+                    "count": 0,
+                    "total_time": 0.0,
+                    "max_time": 0.0,
+                    "histogram": [0] * (len(self.histogram_buckets) + 1),
+                    "delayed_count": 0,
+                    "total_queue_delay": 0.0,
+                    "max_queue_delay": 0.0,
+                }
+            stats["count"] += 1
+            stats["total_time"] += wall_time
+            stats["max_time"] = max(stats["max_time"], wall_time)
+            stats["histogram"][
+                bisect.bisect_left(self.histogram_buckets, wall_time)
+            ] += 1
+            if queue_delay is not None:
+                stats["delayed_count"] += 1
+                stats["total_queue_delay"] += queue_delay
+                stats["max_queue_delay"] = max(stats["max_queue_delay"], queue_delay)
+
+    @property
+    def total_count(self) -> int:
+        """Get the total number of callback invocations recorded."""
+        return sum(stats["count"] for stats in self.callbacks.values())
+
+    def summary(self, limit: int | None = None) -> dict[str, dict]:
+        """Summarise each callback in milliseconds, busiest (by total time) first."""
+        labels = [f"<={bucket * 1000:g}ms" for bucket in self.histogram_buckets]
+        labels.append(f">{self.histogram_buckets[-1] * 1000:g}ms")
+        busiest = sorted(
+            self.callbacks.items(),
+            key=lambda item: item[1]["total_time"],
+            reverse=True,
+        )[:limit]
+        return {
+            name: {
+                "count": stats["count"],
+                "total_ms": round(stats["total_time"] * 1000, 1),
+                "mean_ms": round(stats["total_time"] * 1000 / stats["count"], 2),
+                "max_ms": round(stats["max_time"] * 1000, 1),
+                "histogram": dict(zip(labels, stats["histogram"], strict=True)),
+                "mean_queue_delay_ms": round(
+                    stats["total_queue_delay"] * 1000 / stats["delayed_count"],
+                    1,
+                )
+                if stats["delayed_count"]
+                else None,
+                "max_queue_delay_ms": round(stats["max_queue_delay"] * 1000, 1),
+            }
+            for name, stats in busiest
+        }
+
+
+class StateRoute:
+    """A state listener registered with an app's entity dispatcher."""
+
+    def __init__(
+        self,
+        callback: Callable,
+        attribute: str | None,
+        filters: tuple[str | Callable | None, str | Callable | None],
+        duration: float,
+        constrain_input_boolean: str | None,
+    ):
+        """Listen as listen_state does with the same arguments (old/new as filters)."""
+        self.callback = callback
+        self.attribute = attribute
+        self.filters = filters
+        self.duration = duration
+        self.constrain_input_boolean = constrain_input_boolean
+        self.timer = None
+
+    def value(self, state: dict | None) -> str | dict | list | None:
+        """Get the value of the listened to attribute (or state) from a state."""
+        if state is None:
+            return None
+        if self.attribute is None:
+            return state.get("state")
+        attributes = state.get("attributes", {})
+        if self.attribute in attributes:
+            return attributes[self.attribute]
+        return state.get(self.attribute)
+
+    def matches(self, old: str | dict | None, new: str | dict | None) -> bool:
+        """Check if a change of value passes the old and new value filters."""
+        for value, wanted in zip((old, new), self.filters, strict=True):
+            if wanted is None:
+                continue
+            if callable(wanted):
+                if not wanted(value):
+                    return False
+            elif value != wanted:
+                return False
+        return True
+
+
+class EntityDispatcher:
+    """One AppDaemon state listener per entity, routing changes for an app.
+
+    Devices register their state listeners here rather than with AppDaemon, so
+    an entity watched by several devices (or several times by one) is only
+    listened to once and each change is matched against a prebuilt index of its
+    routes instead of AppDaemon filtering every listener separately.
+    """
+
+    def __init__(self, app: App):
+        """Start with no routes or listeners."""
+        self.app = app
+        self.routes: dict[str, dict[str, StateRoute]] = {}
+        self.listeners: dict[str, str] = {}
+        self.events = 0
+        self.dispatches = 0
+        self.dispatch_time = 0.0
+        self.__entity_ids: dict[str, str] = {}
+        self.__handles = itertools.count()
+
+    @property
+    def stats(self) -> dict:
+        """Get the listeners needed with and without routing, and the routing cost."""
+        return {
+            "listeners": len(self.listeners),
+            "routes": len(self.__entity_ids),
+            "events": self.events,
+            "dispatches": self.dispatches,
+            "mean_routing_us": round(self.dispatch_time * 1e6 / self.events, 1)
+            if self.events
+            else None,
+        }
+
+    def listen(
+        self,
+        callback: Callable,
+        entity_id: str,
+        attribute: str | None = None,
+        **kwargs: dict,
+    ) -> str:
+        """Route an entity's state changes to a callback, returning its handle.
+
+        Supports listen_state's old, new, duration and constrain_input_boolean.
+        """
+        handle = f"{self.app.name}_route_{next(self.__handles)}"
+        self.routes.setdefault(entity_id, {})[handle] = StateRoute(
+            callback,
+            attribute,
+            (kwargs.get("old"), kwargs.get("new")),
+            kwargs.get("duration", 0),
+            kwargs.get("constrain_input_boolean"),
+        )
+        self.__entity_ids[handle] = entity_id
+        if entity_id not in self.listeners:
+            self.listeners[entity_id] = hass.Hass.listen_state(
+                self.app,
+                self.__dispatch,
+                entity_id,
+                attribute="all",
+            )
+        return handle
+
+    def cancel(self, handle: str):
+        """Stop routing to a callback (and listening to its entity if the last)."""
+        entity_id = self.__entity_ids.pop(handle)
+        route = self.routes[entity_id].pop(handle)
+        if route.timer is not None:
+            hass.Hass.cancel_timer(self.app, route.timer, silent=True)
+        if not self.routes[entity_id]:
+            del self.routes[entity_id]
+            hass.Hass.cancel_listen_state(self.app, self.listeners.pop(entity_id))
+
+    def __dispatch(
+        self,
+        entity: str,
+        attribute: str,
+        old: dict | None,
+        new: dict | None,
+        **kwargs: dict,
+    ):
+        """Run (or time) the callbacks of routes whose listened to value changed."""
+        del attribute, kwargs
+        start = time.perf_counter()
+        callback_time = 0.0
+        self.app.state_cache.observe(entity, "all", new)
+        for handle, route in list(self.routes.get(entity, {}).items()):
+            old_value = route.value(old)
+            new_value = route.value(new)
+            if old_value == new_value:
+                continue
+            if route.timer is not None:
+                hass.Hass.cancel_timer(self.app, route.timer, silent=True)
+                route.timer = None
+            if not route.matches(old_value, new_value):
+                continue
+            if route.duration:
+                route.timer = hass.Hass.run_in(
+                    self.app,
+                    self.__run_after_duration,
+                    route.duration,
+                    handle=handle,
+                    values=(old_value, new_value),
+                    last_updated=(new or {}).get("last_updated"),
+                )
+                continue
+            callback_start = time.perf_counter()
+            self.__run(
+                handle,
+                route,
+                old_value,
+                new_value,
+                (new or {}).get("last_updated"),
+            )
+            callback_time += time.perf_counter() - callback_start
+        self.events += 1
+        self.dispatch_time += time.perf_counter() - start - callback_time
+
+    def __run_after_duration(self, **kwargs: dict):
+        """Run a route's callback now its value has held for the required duration."""
+        entity_id = self.__entity_ids.get(kwargs["handle"])
+        if entity_id is None:
+            return
+        route = self.routes[entity_id][kwargs["handle"]]
+        route.timer = None
+        self.__run(kwargs["handle"], route, *kwargs["values"], kwargs["last_updated"])
+
+    def __run(
+        self,
+        handle: str,
+        route: StateRoute,
+        old: str | dict | None,
+        new: str | dict | None,
+        last_updated: str | None,
+    ):
+        """Run a route's callback as AppDaemon would, unless constrained."""
+        if (
+            route.constrain_input_boolean is not None
+            and self.app.get_state(route.constrain_input_boolean) != "on"
+        ):
+            return
+        self.dispatches += 1
+        self.app.run_instrumented(
+            route.callback,
+            self.app.get_now_ts()
+            - self.app.convert_utc(last_updated).timestamp()
+            - route.duration
+            if last_updated
+            else None,
+            self.__entity_ids[handle],
+            route.attribute or "state",
+            old,
+            new,
+        )
+
+
+class WheelTimer:
+    """A timer scheduled on an app's timer wheel."""
+
+    def __init__(
+        self,
+        callback: Callable,
+        due: float,
+        tick: int,
+        constrain_input_boolean: str | None,
+        kwargs: dict,
+    ):
+        """Run the callback with the keyword arguments at the tick it is due by."""
+        self.callback = callback
+        self.due = due
+        self.tick = tick
+        self.constrain_input_boolean = constrain_input_boolean
+        self.kwargs = kwargs
+        self.level = 0
+        self.slot: dict[str, WheelTimer] = {}
+
+
+class TimerWheel:
+    """Short-lived timers of an app, multiplexed onto a single AppDaemon timer.
+
+    Timers are kept in levels of slots, each slot of a level spanning a whole turn
+    of the level below, so scheduling or cancelling a timer only adds it to or
+    removes it from a slot. As the wheel turns, each slot of a higher level is
+    cascaded down when its time comes and the timers in the lowest level's slot
+    run. AppDaemon's timer is only rescheduled for a timer due before it, so timers
+    that are constantly cancelled and recreated cost AppDaemon nothing. Ticks are
+    whole resolutions, so timers run up to one resolution late (but never early).
+    """
+
+    resolution = 0.5
+    slots = 64
+    levels = 4
+
+    def __init__(self, app: App):
+        """Start with no timers scheduled."""
+        self.app = app
+        self.spans = [self.slots**level for level in range(self.levels)]
+        self.wheels: list[list[dict[str, WheelTimer]]] = [
+            [{} for _ in range(self.slots)] for _ in range(self.levels)
+        ]
+        self.counts = [0] * self.levels
+        self.timers: dict[str, WheelTimer] = {}
+        self.tick = 0
+        self.wakeup: tuple[int, str] | None = None
+        self.scheduled = 0
+        self.cancelled = 0
+        self.fired = 0
+        self.wakeups = 0
+        self.rearms = 0
+        self.__lock = threading.Lock()
+        self.__handles = itertools.count()
+
+    @property
+    def stats(self) -> dict:
+        """Get the live timers (by callback) and how often AppDaemon was needed."""
+        live = collections.Counter(
+            getattr(timer.callback, "__qualname__", repr(timer.callback))
+            for timer in list(self.timers.values())
+        )
+        return {
+            "live": len(self.timers),
+            "live_by_callback": dict(live.most_common()),
+            "scheduled": self.scheduled,
+            "cancelled": self.cancelled,
+            "fired": self.fired,
+            "wakeups": self.wakeups,
+            "rearms": self.rearms,
+        }
+
+    def run_in(self, callback: Callable, delay: float, **kwargs: dict) -> str:
+        """Run a callback after a delay, returning its handle.
+
+        Supports run_in's constrain_input_boolean (passed on to the callback as well).
+        """
+        now = self.app.get_now_ts()
+        handle = f"{self.app.name}_timer_{next(self.__handles)}"
+        with self.__lock:
+            if not self.timers:
+                self.tick = max(self.tick, math.floor(now / self.resolution))
+            timer = WheelTimer(
+                callback,
+                now + delay,
+                max(math.ceil((now + delay) / self.resolution), self.tick + 1),
+                kwargs.get("constrain_input_boolean"),
+                kwargs,
+            )
+            self.timers[handle] = timer
+            self.__insert(handle, timer)
+            self.scheduled += 1
+            if self.wakeup is None or timer.tick < self.wakeup[0]:
+                self.__arm(timer.tick)
+        return handle
+
+    def cancel(self, handle: str | None) -> bool:
+        """Cancel a timer, returning False if it wasn't scheduled (or has run)."""
+        with self.__lock:
+            timer = self.timers.pop(handle, None)
+            if timer is None:
+                return False
+            del timer.slot[handle]
+            self.counts[timer.level] -= 1
+            self.cancelled += 1
+        return True
+
+    def running(self, handle: str | None) -> bool:
+        """Check if a timer is still scheduled to run."""
+        return handle in self.timers
+
+    def __insert(self, handle: str, timer: WheelTimer):
+        """Add a timer to the lowest level with a slot for its tick."""
+        for level, span in enumerate(self.spans):
+            offset = timer.tick // span - self.tick // span
+            if offset < self.slots or level == self.levels - 1:
+                timer.level = level
+                timer.slot = self.wheels[level][
+                    (self.tick // span + min(offset, self.slots - 1)) % self.slots
+                ]
+                timer.slot[handle] = timer
+                self.counts[level] += 1
+                return
+
+    def __advance(self, tick: int) -> list[tuple[str, WheelTimer]]:
+        """Turn the wheel to a tick, returning the timers due (in due order)."""
+        due: list[tuple[str, WheelTimer]] = []
+        while self.tick < tick:
+            if not self.counts[0]:
+                occupied = next(
+                    (
+                        span
+                        for span, count in zip(self.spans, self.counts, strict=True)
+                        if count
+                    ),
+                    None,
+                )
+                if occupied is None:
+                    self.tick = tick
+                    break
+                self.tick = max(
+                    self.tick,
+                    min(tick, (self.tick // occupied + 1) * occupied) - 1,
+                )
+            self.tick += 1
+            for level in range(self.levels - 1, 0, -1):
+                span = self.spans[level]
+                if self.tick % span:
+                    continue
+                slot = self.wheels[level][self.tick // span % self.slots]
+                self.counts[level] -= len(slot)
+                cascaded = list(slot.items())
+                slot.clear()
+                for handle, timer in cascaded:
+                    self.__insert(handle, timer)
+            slot = self.wheels[0][self.tick % self.slots]
+            self.counts[0] -= len(slot)
+            due.extend(slot.items())
+            slot.clear()
+        for handle, _ in due:
+            del self.timers[handle]
+        due.sort(key=lambda item: item[1].due)
+        return due
+
+    def __next_tick(self) -> int | None:
+        """Get the tick the wheel next needs to turn to (None if it is empty)."""
+        ticks = []
+        for level, span in enumerate(self.spans):
+            if not self.counts[level]:
+                continue
+            current = self.tick // span
+            ticks.append(
+                next(
+                    (current + offset) * span
+                    for offset in range(1, self.slots)
+                    if self.wheels[level][(current + offset) % self.slots]
+                ),
+            )
+        return min(ticks, default=None)
+
+    def __arm(self, tick: int):
+        """Schedule (or reschedule) the AppDaemon timer for a tick."""
+        if self.wakeup is not None:
+            hass.Hass.cancel_timer(self.app, self.wakeup[1], silent=True)
+        self.wakeup = (
+            tick,
+            hass.Hass.run_in(
+                self.app,
+                self.__wake,
+                max(tick * self.resolution - self.app.get_now_ts(), 0),
+            ),
+        )
+        self.rearms += 1
+
+    def __wake(self, **kwargs: dict):
+        """Run the timers now due, then schedule the next wakeup (if any)."""
+        del kwargs
+        now = self.app.get_now_ts()
+        with self.__lock:
+            armed = self.wakeup[0] if self.wakeup is not None else 0
+            self.wakeup = None
+            self.wakeups += 1
+            due = self.__advance(max(math.floor(now / self.resolution), armed))
+        error = None
+        for _, timer in due:
+            if (
+                timer.constrain_input_boolean is not None
+                and self.app.get_state(timer.constrain_input_boolean) != "on"
+            ):
+                continue
+            self.fired += 1
+            try:
+                self.app.run_instrumented(
+                    timer.callback,
+                    now - timer.due,
+                    **timer.kwargs,
+                )
+            except Exception as exception:  # noqa: BLE001 - raised after the rest run
+                error = error or exception
+        with self.__lock:
+            tick = self.__next_tick()
+            if tick is not None and (self.wakeup is None or tick < self.wakeup[0]):
+                self.__arm(tick)
+        if error is not None:
+            raise error
+
+
+class CoalescingLimiter:
+    """Events coalesced into single runs of a callback, rate limited by a token bucket.
+
+    Events within the window of the first are collected into one run of the
+    callback when it ends. Each run takes a token from a bucket holding up to the
+    burst and refilled by one each period, so however many events arrive the
+    callback runs at most burst times at once and once a period after that. While
+    the bucket is empty, the run waits on the app's timer wheel for the next token,
+    and events arriving meanwhile are dropped into it (the callback reads current
+    states, so dropping them loses nothing but the extra runs).
+    """
+
+    def __init__(
+        self,
+        app: App,
+        callback: Callable[[], None],
+        window: float,
+        period: float,
+        burst: int = 1,
+        constrain_input_boolean: str | None = None,
+    ):
+        """Start with a full bucket and no events collected (period 0 for no limit)."""
+        self.app = app
+        self.callback = callback
+        self.window = window
+        self.period = period
+        self.burst = burst
+        self.constrain_input_boolean = constrain_input_boolean
+        self.tokens = float(burst)
+        self.refilled = app.get_now_ts()
+        self.timer: str | None = None
+        self.throttled = False
+        self.events = 0
+        self.runs = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    @property
+    def stats(self) -> dict:
+        """Get the events collected, runs made, and events coalesced or dropped."""
+        return {
+            "events": self.events,
+            "runs": self.runs,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+        }
+
+    def add(self):
+        """Collect an event into the pending run (scheduling one if none is)."""
+        self.events += 1
+        if self.app.timer_wheel.running(self.timer):
+            if self.throttled:
+                self.dropped += 1
+            else:
+                self.coalesced += 1
+            return
+        self.throttled = False
+        self.__schedule(self.window)
+
+    def cancel(self):
+        """Cancel the pending run (if any)."""
+        self.app.timer_wheel.cancel(self.timer)
+        self.timer = None
+
+    def __schedule(self, delay: float):
+        """Schedule the pending run."""
+        self.timer = self.app.timer_wheel.run_in(
+            self.__run,
+            delay,
+            constrain_input_boolean=self.constrain_input_boolean,
+        )
+
+    def __run(self, **kwargs: dict):
+        """Run the callback if a token is available, otherwise wait for the next."""
+        del kwargs
+        now = self.app.get_now_ts()
+        self.tokens = (
+            min(self.burst, self.tokens + (now - self.refilled) / self.period)
+            if self.period
+            else self.burst
+        )
+        self.refilled = now
+        if self.tokens < 1 and not math.isclose(self.tokens, 1):
+            self.throttled = True
+            self.__schedule((1 - self.tokens) * self.period)
+            return
+        self.tokens = max(self.tokens - 1, 0)
+        self.timer = None
+        self.throttled = False
+        self.runs += 1
+        self.callback()
+
+
 class App(hass.Hass):
     """Utility functions and methods for Home Assistant interaction."""
 
+    state_cache = StateCache()
+    service_calls = ServiceCallQueue()
+    registry = AppRegistry()
+    notifications = NotificationQueue()
+    callback_stats = CallbackStats()
+
     def __init__(self, *args, **kwargs):
         """Extend with attribute definitions."""
         super().__init__(*args, **kwargs)
         self.constants = self.args
+        self.dispatcher = EntityDispatcher(self)
+        self.plans = PlanCache()
+        self.timer_wheel = TimerWheel(self)
 
     def initialize(self):
         """AppDaemon calls when app is ready."""
+        self.registry.bind(self)
+        self.state_cache.attach(self)
+
+    def terminate(self):
+        """Release shared resources before termination (auto run by Appdaemon)."""
+        self.registry.release(self)
+        self.service_calls.release(self)
+        self.state_cache.groups.release(self)
+        self.state_cache.detach(self)
+        if not self.registry.apps:
+            self.notifications.close()
+
+    def get_state(
+        self,
+        entity_id: str | None = None,
+        attribute: str | None = None,
+        default: str | float | None = None,
+        **kwargs: dict,
+    ) -> str | float | list | dict | None:
+        """Get an entity's state from the shared cache (or AppDaemon if not simple)."""
+        if kwargs or entity_id is None or "." not in entity_id:
+            return super().get_state(
+                entity_id,
+                attribute=attribute,
+                default=default,
+                **kwargs,
+            )
+        return self.state_cache.get(self, entity_id, attribute, default)
+
+    def get_state_value(
+        self,
+        entity_id: str,
+        attribute: str | None = None,
+        default: str | float | None = None,
+    ) -> str | float | list | None:
+        """Get a state or attribute from the shared cache, as a float if numeric."""
+        return self.state_cache.get_value(self, entity_id, attribute, default)
+
+    def turn_on(self, entity_id: str, **kwargs: dict):
+        """Turn an entity on, batched with other calls made in the same tick."""
+        if "namespace" in kwargs:
+            return super().turn_on(entity_id, **kwargs)
+        self.service_calls.queue(
+            self,
+            self.__toggle_service(entity_id, "on"),
+            entity_id,
+            **kwargs,
+        )
+        return None
+
+    def turn_off(self, entity_id: str, **kwargs: dict):
+        """Turn an entity off, batched with other calls made in the same tick."""
+        if "namespace" in kwargs:
+            return super().turn_off(entity_id, **kwargs)
+        self.service_calls.queue(
+            self,
+            self.__toggle_service(entity_id, "off"),
+            entity_id,
+            **kwargs,
+        )
+        return None
+
+    def __toggle_service(self, entity_id: str, state: str) -> str:
+        """Get the turn on/off service for an entity (generic for groups)."""
+        domain, _ = self.split_entity(entity_id)
+        return f"{'homeassistant' if domain == 'group' else domain}/turn_{state}"
+
+    def listen_state(self, callback, entity_id: str | None = None, **kwargs: dict):
+        """Listen for state changes, updating the cached state before callbacks.
+
+        Queueing delay is measured from when the triggering state was last updated
+        (excluding any requested duration).
+        """
+        duration = kwargs.get("duration", 0)
+
+        @functools.wraps(callback)
+        def instrumented_callback(
+            entity: str,
+            attribute: str,
+            old,
+            new,
+            *args,
+            **callback_kwargs: dict,
+        ):
+            state = self.state_cache.observe(entity, attribute, new)
+            if state is None:
+                state = self.get_state(entity, attribute="all") or {}
+            last_updated = state.get("last_updated")
+            queue_delay = (
+                self.get_now_ts()
+                - self.convert_utc(last_updated).timestamp()
+                - duration
+                if last_updated
+                else None
+            )
+            return self.run_instrumented(
+                callback,
+                queue_delay,
+                entity,
+                attribute,
+                old,
+                new,
+                *args,
+                **callback_kwargs,
+            )
+
+        return super().listen_state(instrumented_callback, entity_id, **kwargs)
+
+    def listen_event(self, callback, event: str | None = None, **kwargs: dict):
+        """Listen for events, recording callback statistics."""
+
+        @functools.wraps(callback)
+        def instrumented_callback(*args, **callback_kwargs: dict):
+            return self.run_instrumented(callback, None, *args, **callback_kwargs)
+
+        return super().listen_event(instrumented_callback, event, **kwargs)
+
+    def run_in(self, callback, delay: float, *args, **kwargs: dict):
+        """Run a callback after a delay, recording callback statistics."""
+        expected = self.get_now_ts() + delay
+
+        @functools.wraps(callback)
+        def instrumented_callback(*callback_args, **callback_kwargs: dict):
+            return self.run_instrumented(
+                callback,
+                self.get_now_ts() - expected,
+                *callback_args,
+                **callback_kwargs,
+            )
+
+        return super().run_in(instrumented_callback, delay, *args, **kwargs)
+
+    def run_every(self, callback, start, interval: float, *args, **kwargs: dict):
+        """Run a callback periodically, recording callback statistics."""
+        if isinstance(start, datetime.datetime):
+            expected = [
+                self.get_now_ts() + (start - self.datetime()).total_seconds(),
+            ]
+        elif isinstance(start, str) and start.startswith("now"):
+            expected = [self.get_now_ts() + float(start.removeprefix("now") or 0)]
+        else:
+            expected = [None]
+
+        @functools.wraps(callback)
+        def instrumented_callback(*callback_args, **callback_kwargs: dict):
+            queue_delay = None
+            if expected[0] is not None:
+                queue_delay = self.get_now_ts() - expected[0]
+                expected[0] += interval
+            return self.run_instrumented(
+                callback,
+                queue_delay,
+                *callback_args,
+                **callback_kwargs,
+            )
+
+        return super().run_every(
+            instrumented_callback,
+            start,
+            interval,
+            *args,
+            **kwargs,
+        )
+
+    def run_daily(self, callback, start, *args, **kwargs: dict):
+        """Run a callback daily, recording callback statistics."""
+
+        @functools.wraps(callback)
+        def instrumented_callback(*callback_args, **callback_kwargs: dict):
+            scheduled = datetime.datetime.combine(
+                self.date(),
+                self.parse_time(start) if isinstance(start, str) else start,
+            )
+            queue_delay = (self.datetime() - scheduled).total_seconds()
+            return self.run_instrumented(
+                callback,
+                queue_delay if 0 <= queue_delay < 12 * 60 * 60 else None,
+                *callback_args,
+                **callback_kwargs,
+            )
+
+        return super().run_daily(instrumented_callback, start, *args, **kwargs)
+
+    def create_task(self, coro, callback=None, **kwargs: dict):
+        """Run a coroutine in the background, recording statistics of its callback."""
+        if callback is None:
+            return super().create_task(coro, **kwargs)
+
+        @functools.wraps(callback)
+        def instrumented_callback(*callback_args, **callback_kwargs: dict):
+            return self.run_instrumented(
+                callback,
+                None,
+                *callback_args,
+                **callback_kwargs,
+            )
+
+        return super().create_task(coro, callback=instrumented_callback, **kwargs)
+
+    def run_instrumented(self, callback, queue_delay: float | None, *args, **kwargs):
+        """Run a callback, recording its wall time and queueing delay."""
+        start = time.perf_counter()
+        try:
+            return callback(*args, **kwargs)
+        finally:
+            self.callback_stats.record(
+                f"{self.name}: {getattr(callback, '__qualname__', repr(callback))}",
+                time.perf_counter() - start,
+                queue_delay,
+            )
 
     def cancel_timer(self, handle):
         """Cancel timer or ignore if it is invalid or has already triggered."""
         super().cancel_timer(handle, silent=True)
 
     def notify(self, message: str, **kwargs):
-        """Send a notification (title required) to target users (anyone_home or all)."""
-        targets = kwargs.get("targets", "all")
+        """Queue a notification (title required) to target users (anyone_home or all).
+
+        Returns immediately, the notification is delivered in the background.
+        """
+        self.notifications.enqueue(self, message, **kwargs)
+
+    def notification_recipients(self, targets: str) -> list[str]:
+        """Get the people a notification should be sent to for the given targets."""
         if targets == "anyone_home_else_all":
             targets = "anyone_home" if self.presence.anyone_home else "all"
-        for person in ("dan", "rachel"):
+        return [
+            person
+            for person in self.control.constants["mobiles"]
             if any(
                 (
                     targets == "all",
@@ -76,72 +1513,86 @@ class App(hass.Hass):
                     targets == "anyone_home"
                     and self.get_state(f"person.{person}") == "home",
                 ),
-            ):
-                data = {"tag": kwargs["title"]}
-                if "critical" in kwargs:
-                    if self.control.constants["mobiles"][person]["type"] == "iOS":
-                        data.update(
-                            {
-                                "push": {
-                                    "sound": {
-                                        "name": "default",
-                                        "critical": 1,
-                                        "volume": 1.0,
-                                    },
-                                },
-                            },
-                        )
-                    else:
-                        data.update(
-                            {
-                                "ttl": 0,
-                                "priority": "high",
-                                "media_stream": "alarm_stream_max",
-                                "tts_text": message,
+            )
+        ]
+
+    def send_notification(self, person: str, message: str, **kwargs: dict):
+        """Send a notification to a person's mobile (critical if specified)."""
+        mobile = self.control.constants["mobiles"][person]
+        data = {"tag": kwargs["title"]}
+        if kwargs.get("critical"):
+            if mobile["type"] == "iOS":
+                data.update(
+                    {
+                        "push": {
+                            "sound": {
+                                "name": "default",
+                                "critical": 1,
+                                "volume": 1.0,
                             },
-                        )
-                super().notify(
-                    message,
-                    title=kwargs["title"],
-                    name=self.control.constants["mobiles"][person]["name"],
-                    data=data,
+                        },
+                    },
+                )
+            else:
+                data.update(
+                    {
+                        "ttl": 0,
+                        "priority": "high",
+                        "media_stream": "alarm_stream_max",
+                        "tts_text": message,
+                    },
                 )
-        self.log(f"Notified '{targets}': \"{kwargs['title']}: {message}\"")
+        super().notify(message, title=kwargs["title"], name=mobile["name"], data=data)
 
     @property
     def climate(self) -> Climate:
         """Get the Climate app instance."""
-        return self.get_app("Climate")
+        return self.registry.get(self, "Climate")
 
     @property
     def control(self) -> Control:
         """Get the Control app instance."""
-        return self.get_app("Control")
+        return self.registry.get(self, "Control")
 
     @property
     def lights(self) -> Lights:
         """Get the Lights app instance."""
-        return self.get_app("Lights")
+        return self.registry.get(self, "Lights")
 
     @property
     def media(self) -> Media:
         """Get the Media app instance."""
-        return self.get_app("Media")
+        return self.registry.get(self, "Media")
 
     @property
     def presence(self) -> Presence:
         """Get the Presence app instance."""
-        return self.get_app("Presence")
+        return self.registry.get(self, "Presence")
 
     @property
     def safety(self) -> Safety:
         """Get the Safety app instance."""
-        return self.get_app("Safety")
+        return self.registry.get(self, "Safety")
 
 
 class Device:
     """Basic device that can be configured to respond to environmental changes."""
 
+    attribute_services = MappingProxyType(
+        {
+            "hvac_mode": "set_hvac_mode",
+            "temperature": "set_temperature",
+            "fan_mode": "set_fan_mode",
+            "swing_mode": "set_swing_mode",
+            "percentage": "set_percentage",
+            "direction": "set_direction",
+            "humidity": "set_humidity",
+            "mode": "set_mode",
+        },
+    )
+    turn_on_attributes = ("brightness", "color_temp_kelvin", "percentage")
+    command_timeout = 10
+
     def __init__(
         self,
         device_id: str,
@@ -162,17 +1613,17 @@ class Device:
             "input_boolean.control_" + device_name + control_input_boolean_suffix
         )
         self.last_adjustment_time = self.controller.get_now_ts()
-        devices = [self.device_id]
+        self.in_flight: dict[str, tuple[str | float, float]] = {}
+        self.members: tuple[str, ...] = ()
+        self.__user_adjustment_handles: dict[str, str] = {}
+        self.__listen_for_user_adjustments(self.device_id)
         if self.device_type == "group":
-            devices += self.controller.get_state(self.device_id, "entity_id")
-        for device in devices:
-            self.controller.listen_state(
-                self.__handle_user_adjustment,
-                entity_id=device,
-                attribute="context",
-                new=lambda new: not IDs.is_system(new["user_id"]),
+            groups = self.controller.state_cache.groups
+            self.__handle_members_changed(
+                members=groups.get(controller, self.device_id),
             )
-        self.controller.listen_state(
+            groups.subscribe(controller, device_id, self.__handle_members_changed)
+        self.controller.dispatcher.listen(
             self.__handle_control_enabled,
             self.control_input_boolean,
             new="on",
@@ -213,33 +1664,107 @@ class Device:
         return False
 
     def turn_on(self, **kwargs: dict):
-        """Turn the device on if it's off or adjust with provided parameters."""
-        if not self.on or kwargs:
-            if self.device_type != "group":
-                self.device.turn_on(**kwargs)
-            else:
-                self.controller.call_service(
-                    "homeassistant/turn_on",
-                    entity_id=self.device_id,
-                    **kwargs,
-                )
-            self.last_adjustment_time = self.controller.get_now_ts()
+        """Turn the device on if it's off and/or adjust any parameters that differ."""
+        self.reconcile(state="on", **kwargs)
 
     def turn_off(self):
-        """Turn the device off if it's on."""
-        if self.on:
-            if self.device_type != "group":
-                self.device.turn_off()
-            else:
-                self.controller.call_service(
-                    "homeassistant/turn_off",
-                    entity_id=self.device_id,
-                )
+        """Turn the device off if it's on (or cancel turning it on if not yet sent)."""
+        if not self.on and self.controller.service_calls.discard(self.device_id):
+            self.in_flight.clear()
             self.last_adjustment_time = self.controller.get_now_ts()
+        else:
+            self.reconcile(state="off")
+
+    def expected(self, field: str) -> str | float | list | None:
+        """Get a field's value as last commanded (until confirmed) or as it is now.
+
+        Fields are 'state' ('on' or 'off'), 'hvac_mode' (the state of climate
+        devices) or an attribute. Commands not confirmed by Home Assistant within the
+        timeout are assumed to have failed, so are forgotten.
+        """
+        if field == "state":
+            current = "on" if self.on else "off"
+        elif field == "hvac_mode":
+            current = self.device.state
+        else:
+            current = self.get_attribute(field)
+        commanded = self.in_flight.get(field)
+        if commanded is not None:
+            value, sent_time = commanded
+            if (
+                value != current
+                and self.controller.get_now_ts() - sent_time < self.command_timeout
+            ):
+                return value
+            del self.in_flight[field]
+        return current
+
+    @property
+    def awaiting_confirmation(self) -> bool:
+        """Check if Home Assistant is yet to confirm any commands sent to the device."""
+        for field in list(self.in_flight):
+            self.expected(field)
+        return bool(self.in_flight)
+
+    def reconcile(self, *, check_only: bool = False, **desired: dict) -> bool:
+        """Send only the service calls needed to reach a desired state (if any).
+
+        The desired state can include the 'state' ('on' or 'off') and any fields
+        expected() supports, with None meaning any value. Returns whether the device
+        differs from the desired state (so calls were, or would be, sent).
+        """
+        changes = {
+            field: value
+            for field, value in desired.items()
+            if value is not None and self.expected(field) != value
+        }
+        if not changes or check_only:
+            return bool(changes)
+        now = self.controller.get_now_ts()
+        if changes.get("state") == "off":
+            self.in_flight = {"state": ("off", now)}
+            self.call_service("turn_off")
+            return True
+        turn_on = changes.pop("state", None) == "on"
+        turn_on_kwargs = {
+            field: value
+            for field, value in desired.items()
+            if value is not None
+            and (
+                (field in changes and field not in self.attribute_services)
+                or (turn_on and field in self.turn_on_attributes)
+            )
+        }
+        services = {
+            field: value
+            for field, value in changes.items()
+            if field not in turn_on_kwargs
+        }
+        self.in_flight.update(
+            (field, (value, now))
+            for field, value in {**turn_on_kwargs, **services}.items()
+        )
+        if turn_on:
+            self.in_flight["state"] = ("on", now)
+        if turn_on or turn_on_kwargs:
+            self.call_service("turn_on", **turn_on_kwargs)
+        for field, value in services.items():
+            self.call_service(self.attribute_services[field], **{field: value})
+        return True
 
     def call_service(self, service: str, **kwargs: dict):
-        """Call one of the device's services in Home Assistant."""
-        self.device.call_service(service, **kwargs)
+        """Queue one of the device's services to be called in Home Assistant."""
+        domain = (
+            "homeassistant"
+            if self.device_type == "group" and service in ("turn_on", "turn_off")
+            else self.device_type
+        )
+        self.controller.service_calls.queue(
+            self.controller,
+            f"{domain}/{service}",
+            self.device_id,
+            **kwargs,
+        )
         self.last_adjustment_time = self.controller.get_now_ts()
 
     def get_attribute(
@@ -248,18 +1773,32 @@ class Device:
         default: str | float | None = None,
     ) -> str | float | list | None:
         """Get an attribute of the device (or group of synced devices)."""
-        value = self.controller.get_state(
-            self.device_id
-            if self.device_type != "group"
-            else self.controller.get_state(self.device_id, "entity_id")[0],
+        return self.controller.get_state_value(
+            self.members[0] if self.members else self.device_id,
             attribute=attribute,
+            default=default,
         )
-        if value is None:
-            return default
-        try:
-            return float(value)
-        except (ValueError, TypeError):
-            return value
+
+    def __listen_for_user_adjustments(self, entity_id: str):
+        """Listen for users changing an entity (the device or a member of its group)."""
+        self.__user_adjustment_handles[entity_id] = self.controller.dispatcher.listen(
+            self.__handle_user_adjustment,
+            entity_id,
+            attribute="context",
+            new=lambda new: not IDs.is_system(new["user_id"]),
+        )
+
+    def __handle_members_changed(self, **kwargs: dict):
+        """Listen to the group's current members (only), for user adjustments."""
+        members = kwargs["members"]
+        for member in set(self.members) - set(members):
+            self.controller.dispatcher.cancel(
+                self.__user_adjustment_handles.pop(member),
+            )
+        for member in members:
+            if member not in self.__user_adjustment_handles:
+                self.__listen_for_user_adjustments(member)
+        self.members = members
 
     def __handle_user_adjustment(
         self,
@@ -271,6 +1810,7 @@ class Device:
     ):
         """Handle manual adjustment of the device via the UI."""
         del attribute, old, kwargs
+        self.in_flight.clear()
         user = IDs.get_name(new["user_id"])
         self.controller.log(
             f"'{user}' changed {entity} from UI: "
@@ -12,17 +12,39 @@ User defined variables are configued in climate.yaml
 # TODO: rearrange all properties and methods more logically
 from __future__ import annotations
 
+import contextlib
+import functools
+import json
 import logging
+import math
+import threading
 from math import floor
+from pathlib import Path
 from typing import TYPE_CHECKING
 
-from app import App, Device
+from app import App, CoalescingLimiter, Device, Settings
+from climate_kernel import columns, might_adjust
 from presence import PresenceDevice
+from thermal_model import ThermalModel
 
 if TYPE_CHECKING:
+    import datetime
+    from collections.abc import Callable, Iterator
+
     from appdaemon.entity import Entity
 
 
+def decision(method: Callable) -> Callable:
+    """Make a climate device's decision from a single frame of its conditions."""
+
+    @functools.wraps(method)
+    def decide_from_frame(device: ClimateDevice, *args, **kwargs: dict):
+        with device.deciding():
+            return method(device, *args, **kwargs)
+
+    return decide_from_frame
+
+
 class Climate(App):
     """Control aircon based on user input and automated rules."""
 
@@ -34,6 +56,14 @@ class Climate(App):
         self.heaters: dict[str, Heater] = {}
         self.fans: dict[str, Fan] = {}
         self.humidifiers: dict[str, Humidifier] = {}
+        self.settings: ClimateSettings | None = None
+        self.decisions = 0
+        self.condition_reads = 0
+        self.condition_reads_saved = 0
+        self.thermal_models: dict[str, ThermalModel] = {}
+        self.thermal_devices: dict[str, ClimateDevice] = {}
+        self.predicted_adjustments = 0
+        self.sensor_changes_predicted = 0
 
     def initialize(self):
         """Initialise TemperatureMonitor, Aircon units, and event listening.
@@ -41,6 +71,7 @@ class Climate(App):
         Appdaemon defined init function called once ready after __init__.
         """
         super().initialize()
+        self.settings = ClimateSettings(self)
         self.aircons = {
             "bedroom": Aircon(
                 device_id="climate.bedroom_aircon",
@@ -99,6 +130,7 @@ class Climate(App):
                 room="bedroom",
             ),
         }
+        self.fit_thermal_models()
         for device_group in (self.aircons, self.fans, self.heaters, self.humidifiers):
             for device in device_group.values():
                 device.monitor_presence()
@@ -158,9 +190,131 @@ class Climate(App):
 
     def get_setting(self, setting_name: str) -> float:
         """Get temperature target and trigger settings, accounting for Sleep scene."""
-        if self.control.scene == "Sleep" or self.control.bed_time:
+        if self.sleep_settings_apply(self.control.scene):
             setting_name = f"sleep_{setting_name}"
-        return float(self.get_state(f"input_number.{setting_name}"))
+        return getattr(self.settings, setting_name)
+
+    def sleep_settings_apply(self, scene: str) -> bool:
+        """Check if sleep targets and triggers apply (in Sleep or after bed time)."""
+        return scene == "Sleep" or self.time() > self.settings.bed_time
+
+    def record_conditions(self, frame: ConditionFrame):
+        """Count a decision's condition reads (and how many the frame saved)."""
+        self.decisions += 1
+        self.condition_reads += frame.reads
+        self.condition_reads_saved += frame.saved
+
+    @property
+    def condition_stats(self) -> dict:
+        """Get the decisions made and condition reads that frames saved."""
+        return {
+            "decisions": self.decisions,
+            "reads": self.condition_reads,
+            "saved": self.condition_reads_saved,
+        }
+
+    @property
+    def sensor_change_stats(self) -> dict:
+        """Get each device's sensor changes and how many were coalesced or dropped."""
+        return {
+            device.device_id: device.sensor_changes.stats
+            for device_group in (
+                self.aircons,
+                self.fans,
+                self.heaters,
+                self.humidifiers,
+            )
+            for device in device_group.values()
+        }
+
+    @property
+    def fan_sequence_stats(self) -> dict:
+        """Get each fan's direction and speed sequences and their confirmation times."""
+        return {fan.device_id: fan.sequencer.stats for fan in self.fans.values()}
+
+    @property
+    def thermal_models_path(self) -> Path:
+        """Get the file the rooms' thermal models are kept in between restarts."""
+        return Path(self.config_dir) / "climate_thermal_models.json"
+
+    def fit_thermal_models(self):
+        """Restore each aircon and heater room's thermal model and keep fitting it.
+
+        Models are fitted on the temperature their devices act on (averaged over any
+        linked rooms), and saved periodically and on termination.
+        """
+        try:
+            saved = json.loads(self.thermal_models_path.read_text())
+        except FileNotFoundError:
+            saved = {}
+        except (OSError, ValueError) as error:
+            self.log(
+                f"Could not restore thermal models ({error}), fitting new ones",
+                level="WARNING",
+            )
+            saved = {}
+        sensor_ids = set()
+        for device in (*self.aircons.values(), *self.heaters.values()):
+            self.thermal_devices[device.room] = device
+            try:
+                self.thermal_models[device.room] = ThermalModel.from_dict(
+                    saved.get(device.room),
+                )
+            except (KeyError, TypeError):
+                self.thermal_models[device.room] = ThermalModel()
+            sensor_ids.update(sensor.entity_id for sensor in device.temperature_sensors)
+        for sensor_id in sorted(sensor_ids):
+            self.dispatcher.listen(self.handle_room_temperature_change, sensor_id)
+        period = self.constants["thermal_model"]["save_period"]
+        self.run_every(self.save_thermal_models, f"now+{period}", period)
+
+    def handle_room_temperature_change(
+        self,
+        entity: str,
+        attribute: str,
+        old: float,
+        new: float,
+        **kwargs: dict,
+    ):
+        """Fit the thermal models of the rooms whose temperature the reading is in."""
+        del attribute, old, kwargs
+        if new in (None, "unavailable", "unknown"):
+            return
+        now = self.get_now_ts()
+        outside = self.outside_temperature
+        for room, device in self.thermal_devices.items():
+            if any(sensor.entity_id == entity for sensor in device.temperature_sensors):
+                temperature = device.read_room_temperature()
+                if math.isnan(temperature):
+                    continue
+                self.thermal_models[room].observe(
+                    now,
+                    temperature,
+                    outside,
+                    heating=device.heating,
+                    cooling=device.cooling,
+                )
+
+    def save_thermal_models(self, **kwargs: dict):
+        """Save the rooms' thermal models (replacing the previous save in one step)."""
+        del kwargs
+        path = self.thermal_models_path
+        partial = path.with_suffix(".partial")
+        partial.write_text(
+            json.dumps(
+                {room: model.to_dict() for room, model in self.thermal_models.items()},
+            ),
+        )
+        partial.replace(path)
+
+    @property
+    def thermal_model_stats(self) -> dict:
+        """Get each room's fitted thermal model and how its predictions were used."""
+        return {
+            "rooms": {room: model.stats for room, model in self.thermal_models.items()},
+            "predicted_adjustments": self.predicted_adjustments,
+            "sensor_changes_predicted": self.sensor_changes_predicted,
+        }
 
     def update_door_check_delay(self, seconds: float):
         """Update the delay before registering a door as open for each aircon."""
@@ -177,20 +331,15 @@ class Climate(App):
 
     def transition_to_scene(self, scene: str):
         """Adjust aircon & temperature triggers, suggest climate control if suitable."""
-        if "Away" in scene:
-            device_groups_to_turn_off = [self.heaters, self.humidifiers]
-            if not self.presence.pets_home_alone:
-                device_groups_to_turn_off.extend([self.aircons, self.fans])
-            for device_group in device_groups_to_turn_off:
-                for device in device_group.values():
-                    device.turn_off()
+        plan = self.plans.get(
+            (scene, self.presence.pets_home_alone),
+            lambda: self.compile_scene_plan(scene),
+        )
+        for device, method in plan:
+            getattr(device, method)()
         self.aircons["bedroom"].preferred_fan_mode = (
             "low" if self.control.napping_in_bedroom else "auto"
         )
-        if scene == "Morning":
-            self.aircons["living_room"].ignore_vacancy()
-        else:
-            self.aircons["living_room"].monitor_presence()
         for humidifier in self.humidifiers.values():
             humidifier.already_notified_of_empty_water_tank = False
         if self.any_climate_control_enabled:
@@ -200,6 +349,26 @@ class Climate(App):
             self.suggest_if_extreme_forecast_and_control_disabled()
         self.allow_suggestion()
 
+    def compile_scene_plan(self, scene: str) -> tuple[tuple[Device, str], ...]:
+        """Compile the device changes for a scene, as (device, method) steps."""
+        plan = []
+        if "Away" in scene:
+            device_groups_to_turn_off = [self.heaters, self.humidifiers]
+            if not self.presence.pets_home_alone:
+                device_groups_to_turn_off.extend([self.aircons, self.fans])
+            plan.extend(
+                (device, "turn_off")
+                for device_group in device_groups_to_turn_off
+                for device in device_group.values()
+            )
+        plan.append(
+            (
+                self.aircons["living_room"],
+                "ignore_vacancy" if scene == "Morning" else "monitor_presence",
+            ),
+        )
+        return tuple(plan)
+
     def suggest_for_conditions(self):
         """Control aircon or suggest based on changes in inside temperature."""
         """Handle each case (house open, outside nicer, climate control status)?"""
@@ -235,10 +404,63 @@ class Climate(App):
     def adjust_for_conditions(
         self,
     ):
-        """Control aircon or suggest based on changes in inside temperature."""
-        for device_group in (self.aircons, self.fans, self.heaters, self.humidifiers):
-            for device in device_group.values():
-                device.adjust_for_conditions()
+        """Adjust the devices whose conditions might call for it (checked all at once).
+
+        Fans follow their companion devices, so are adjusted after (and whenever)
+        their companion is.
+        """
+        with contextlib.ExitStack() as decisions:
+            devices = self.devices_that_might_adjust(decisions)
+            adjusted = set()
+            for device, might in devices.items():
+                if might or getattr(device, "companion_device", None) in adjusted:
+                    device.adjust_for_conditions()
+                    adjusted.add(device)
+
+    def devices_that_might_adjust(
+        self,
+        decisions: contextlib.ExitStack,
+    ) -> dict[ClimateDevice, bool]:
+        """Check which available devices might adjust, companions before fans.
+
+        Each device's decision is entered into the stack, so the check and any
+        adjustment that follows use the same conditions.
+        """
+        devices = [
+            device
+            for device_group in (
+                self.aircons,
+                self.heaters,
+                self.humidifiers,
+                self.fans,
+            )
+            for device in device_group.values()
+            if device.device.state not in (None, "unavailable", "unknown")
+        ]
+        for device in devices:
+            decisions.enter_context(device.deciding())
+        return dict(
+            zip(
+                devices,
+                might_adjust(columns([device.decision_inputs() for device in devices])),
+                strict=True,
+            ),
+        )
+
+    def devices_left_alone_wrongly(self) -> list[ClimateDevice]:
+        """Get devices that would adjust but might_adjust says won't (for checks).
+
+        Such a device means climate_kernel's thresholds have diverged from the
+        device's own, so it would be left alone when it shouldn't be.
+        """
+        with contextlib.ExitStack() as decisions:
+            return [
+                device
+                for device, might in self.devices_that_might_adjust(decisions).items()
+                if not might
+                and device.control_enabled
+                and device.adjust_for_conditions(check_if_would_adjust_only=True)
+            ]
 
     def condition_room_for_sleep(self, room: str):
         """Cool/heat/humidify the given room for nice sleeping conditions."""
@@ -333,10 +555,13 @@ class Climate(App):
         self.suggest_for_conditions()
 
     def terminate(self):
-        """Cancel presence callbacks before termination (auto run by Appdaemon)."""
+        """Save thermal models and cancel presence callbacks before termination."""
+        if self.thermal_models:
+            self.save_thermal_models()
         for device_group in (self.aircons, self.fans, self.heaters, self.humidifiers):
             for device in device_group.values():
                 device.ignore_vacancy()
+        super().terminate()
 
     # TODO: consider making a TemperatureChecker class with all the following checks
     # devices can use with their own temperature
@@ -428,6 +653,8 @@ class Climate(App):
 class ClimateDevice(Device):
     """Climate device configured to respond to environmental changes."""
 
+    kind = ""
+
     def __init__(
         self,
         **kwargs: dict,
@@ -437,35 +664,228 @@ class ClimateDevice(Device):
             **kwargs,
         )
         self.temperature_sensors = []
+        self.sensor_changes = CoalescingLimiter(
+            self.controller,
+            self.adjust_for_sensor_changes,
+            window=self.constants["sensor_changes"]["window"],
+            period=self.constants["adjustment_delay"],
+            burst=self.constants["sensor_changes"]["burst"],
+            constrain_input_boolean=self.control_input_boolean,
+        )
         for room in (self.room, *self.linked_rooms):
             temperature_sensor_id = f"sensor.{room}_apparent_temperature_ignoring_wind"
             self.temperature_sensors.append(
                 self.controller.get_entity(temperature_sensor_id),
             )
-            self.controller.listen_state(
+            self.controller.dispatcher.listen(
                 self.handle_sensor_change,
                 temperature_sensor_id,
-                duration=0.5,
                 constrain_input_boolean=self.control_input_boolean,
             )
-        self.adjustment_delay = self.constants["adjustment_delay"]
-        self.adjustment_timer = None
+        self.prediction_timer = None
+        self.prediction: tuple[str, tuple, float] | None = None
+        self.__decision = threading.local()  # a frame per thread deciding
+
+    @property
+    def frame(self) -> ConditionFrame | None:
+        """Get the frame of the decision being made on this thread (None if none)."""
+        return getattr(self.__decision, "frame", None)
+
+    @property
+    def conditions(self) -> ConditionFrame:
+        """Get the conditions of the decision being made (or fresh ones if none)."""
+        return self.frame or ConditionFrame(self)
+
+    @contextlib.contextmanager
+    def deciding(self) -> Iterator[ConditionFrame]:
+        """Decide from a single frame of conditions (shared by nested decisions)."""
+        frame = self.frame
+        if frame is not None:
+            yield frame
+            return
+        frame = self.__decision.frame = ConditionFrame(self)
+        try:
+            yield frame
+        finally:
+            self.controller.record_conditions(frame)
+            self.__decision.frame = None
+
+    def decision_inputs(self) -> dict:
+        """Get the device's inputs to the whole-house decision (see climate_kernel)."""
+        conditions = self.conditions
+        away_scene = "Away" in conditions.scene
+        return {
+            "kind": self.kind,
+            "on": self.on,
+            "control_enabled": self.control_enabled,
+            "ignoring_vacancy": self.ignoring_vacancy,
+            "vacant": conditions.vacant,
+            "door_open": conditions.door_open,
+            "away": away_scene and not self.controller.presence.pets_home_alone,
+            "away_scene": away_scene,
+            "sleep_scene": conditions.scene == "Sleep",
+            "anyone_home": self.controller.presence.anyone_home,
+            "room_temperature": (
+                conditions.room_temperature if self.control_enabled else math.nan
+            ),
+            **{
+                setting: conditions.setting(setting)
+                for setting in (
+                    "cooling_target_temperature",
+                    "heating_target_temperature",
+                    "low_temperature_aircon_trigger",
+                    "high_temperature_aircon_trigger",
+                    "low_humidity_humidifier_trigger",
+                    "high_humidity_aircon_trigger",
+                    "target_humidity",
+                )
+            },
+            "heater_temperature_buffer": self.constants["target_buffer"][
+                "heater_temperature"
+            ],
+        }
+
+    @property
+    def heating(self) -> bool:
+        """Check if the device is heating its room (for its room's thermal model)."""
+        return False
+
+    @property
+    def cooling(self) -> bool:
+        """Check if the device is cooling its room (for its room's thermal model)."""
+        return False
+
+    def prediction_thresholds(self) -> tuple[tuple[float, int], ...]:
+        """Get the temperatures (and directions) the device acts on reaching.
+
+        Directions are 1 for reaching from below and -1 from above. Devices without
+        any are not adjusted predictively.
+        """
+        return ()
+
+    def predict_adjustment(self):
+        """Schedule an adjustment for when the room is predicted to reach a threshold.
+
+        Predictions are made from the room's thermal model (once fitted), and only
+        as far ahead as the prediction horizon.
+        """
+        self.controller.timer_wheel.cancel(self.prediction_timer)
+        self.prediction_timer = None
+        self.prediction = None
+        model = self.controller.thermal_models.get(self.room)
+        thermal_constants = self.constants["thermal_model"]
+        if (
+            model is None
+            or not self.control_enabled
+            or not model.fitted(thermal_constants["min_updates"])
+        ):
+            return
+        with self.deciding() as conditions:
+            thresholds = self.prediction_thresholds()
+            margin = thermal_constants["margin"]
+            predictions = [
+                (seconds, threshold + direction * margin)
+                for threshold, direction in thresholds
+                if (
+                    seconds := model.seconds_until(
+                        threshold + direction * margin,
+                        conditions.room_temperature,
+                        conditions.outside_temperature,
+                        heating=self.heating,
+                        cooling=self.cooling,
+                    )
+                )
+                is not None
+            ]
+        if not predictions:
+            return
+        seconds, temperature = min(predictions)
+        if not 0 < seconds <= thermal_constants["prediction_horizon"]:
+            return
+        self.prediction = (self.device.state, thresholds, temperature)
+        self.prediction_timer = self.controller.timer_wheel.run_in(
+            self.adjust_for_conditions_as_predicted,
+            seconds,
+            constrain_input_boolean=self.control_input_boolean,
+        )
+        if self.controller.logger.isEnabledFor(logging.DEBUG):
+            self.controller.log(
+                f"The '{self.device_id}' is set to adjust for conditions in "
+                f"{seconds / 60:.0f} minutes, when the room is predicted to reach "
+                f"{temperature:.1f}°",
+                level="DEBUG",
+            )
+
+    def prediction_holds(self) -> bool:
+        """Check if a predicted adjustment is still due, with nothing to adjust yet.
+
+        Nothing is to be adjusted if no threshold has been reached and deciding for
+        the device's current conditions (e.g. humidity) would leave it alone.
+        """
+        if self.prediction_timer is None:
+            return False
+        with self.deciding() as conditions:
+            thresholds = self.prediction_thresholds()
+            if self.prediction[:2] != (self.device.state, thresholds) or any(
+                (conditions.room_temperature - threshold) * direction >= 0
+                for threshold, direction in thresholds
+            ):
+                return False
+            return might_adjust(columns([self.decision_inputs()])) == [False]
+
+    def adjust_for_conditions_as_predicted(self, **kwargs: dict):
+        """Adjust for the temperature the room was predicted to reach by now.
+
+        The prediction is only used if the latest reading agrees with it (within
+        the tolerance), otherwise the adjustment is for the reading as usual.
+        """
+        del kwargs
+        prediction = self.prediction
+        self.prediction_timer = None
+        self.prediction = None
+        with self.deciding() as conditions:
+            if (
+                prediction[:2] == (self.device.state, self.prediction_thresholds())
+                and abs(conditions.room_temperature - prediction[2])
+                <= self.constants["thermal_model"]["tolerance"]
+            ):
+                conditions.assume("room_temperature", prediction[2])
+                self.controller.predicted_adjustments += 1
+            self.adjust_for_conditions()
+
+    def read_room_temperature(self) -> float:
+        """Read the average temperature from all sensors in the room (or NaN)."""
+        return self.__read_sensors(lambda sensor: sensor.state)
+
+    def read_room_humidity(self) -> float:
+        """Read the average humidity from all sensors in the room (or NaN)."""
+        return self.__read_sensors(
+            lambda sensor: sensor.attributes.get("humidity_source_value"),
+        )
+
+    def __read_sensors(self, read: Callable[[Entity], str | None]) -> float:
+        """Average a value read from each sensor in the room (NaN if any is invalid)."""
+        try:
+            return sum(
+                float(read(temperature_sensor))
+                for temperature_sensor in self.temperature_sensors
+            ) / len(self.temperature_sensors)
+        except (TypeError, ValueError):
+            return math.nan
+
+    def read_door_open(self) -> bool:
+        """Read if any doors are open (none for devices without doors)."""
+        return False
 
     @property
     def room_temperature(self) -> float:
         """Get average temperature from all sensors in the room."""
-        return sum(
-            float(temperature_sensor.state)
-            for temperature_sensor in self.temperature_sensors
-        ) / len(self.temperature_sensors)
+        return self.conditions.room_temperature
 
     @property
     def room_humidity(self) -> float:
         """Get average humidity from all sensors in the room."""
-        return sum(
-            float(temperature_sensor.attributes["humidity_source_value"])
-            for temperature_sensor in self.temperature_sensors
-        ) / len(self.temperature_sensors)
+        return self.conditions.room_humidity
 
     # TODO: consider making a TemperatureChecker class with all the following checks
     # e.g. to switch room_temperature and inside_temperature
@@ -478,14 +898,14 @@ class ClimateDevice(Device):
     @property
     def above_target_temperature(self) -> bool:
         """Check if temperature is above the target temperature."""
-        return self.room_temperature > float(
-            self.controller.get_setting("cooling_target_temperature"),
+        return self.room_temperature > self.conditions.setting(
+            "cooling_target_temperature",
         )
 
     @property
     def below_target_temperature(self) -> bool:
         """Check if temperature is below the target temperature."""
-        return self.room_temperature < self.controller.get_setting(
+        return self.room_temperature < self.conditions.setting(
             "heating_target_temperature",
         )
 
@@ -493,9 +913,9 @@ class ClimateDevice(Device):
     def too_hot_or_cold(self) -> bool:
         """Check if temperature inside is above or below the max/min triggers."""
         return not (
-            self.controller.get_setting("low_temperature_aircon_trigger")
+            self.conditions.setting("low_temperature_aircon_trigger")
             < self.room_temperature
-            < self.controller.get_setting("high_temperature_aircon_trigger")
+            < self.conditions.setting("high_temperature_aircon_trigger")
         )
 
     @property
@@ -504,8 +924,8 @@ class ClimateDevice(Device):
         return (
             self.room_temperature
             > (
-                self.controller.get_setting("cooling_target_temperature")
-                + self.controller.get_setting("heating_target_temperature")
+                self.conditions.setting("cooling_target_temperature")
+                + self.conditions.setting("heating_target_temperature")
             )
             / 2
         )
@@ -515,7 +935,7 @@ class ClimateDevice(Device):
         """Check if temperature is higher outside than inside."""
         return (
             self.room_temperature
-            < self.controller.outside_temperature
+            < self.conditions.outside_temperature
             - self.constants["inside_outside_trigger"]
         )
 
@@ -524,7 +944,7 @@ class ClimateDevice(Device):
         """Check if temperature is lower outside than inside."""
         return (
             self.room_temperature
-            > self.controller.outside_temperature
+            > self.conditions.outside_temperature
             + self.constants["inside_outside_trigger"]
         )
 
@@ -532,22 +952,22 @@ class ClimateDevice(Device):
     def too_hot_or_cold_outside(self) -> bool:
         """Check if outside temperature exceeds desired indoor thresholds."""
         return not (
-            self.controller.get_setting("low_temperature_aircon_trigger")
-            <= self.controller.outside_temperature
-            <= self.controller.get_setting("high_temperature_aircon_trigger")
+            self.conditions.setting("low_temperature_aircon_trigger")
+            <= self.conditions.outside_temperature
+            <= self.conditions.setting("high_temperature_aircon_trigger")
         )
 
     @property
     def too_dry(self) -> bool:
         """Check if room is too dry based on desired target humidity settings."""
-        return self.room_humidity < self.controller.get_setting(
+        return self.room_humidity < self.conditions.setting(
             "low_humidity_humidifier_trigger",
         )
 
     @property
     def too_humid(self) -> bool:
         """Check if room is too humid based on desired target humidity settings."""
-        return self.room_humidity > self.controller.get_setting(
+        return self.room_humidity > self.conditions.setting(
             "high_humidity_aircon_trigger",
         )
 
@@ -559,7 +979,7 @@ class ClimateDevice(Device):
         new: float,
         **kwargs: dict,
     ):
-        """Adjust for new conditions with delay if appropriate."""
+        """Collect the change to adjust for (with any others shortly after it)."""
         del entity, attribute, old, new, kwargs
         if self.device.state in (None, "unavailable", "unknown"):
             self.controller.log(
@@ -567,51 +987,22 @@ class ClimateDevice(Device):
                 level="DEBUG",
             )
             return
-        if self.adjustment_delay == 0:
-            self.adjust_for_conditions()
+        if self.prediction_holds():
+            self.controller.sensor_changes_predicted += 1
             return
-        was_recent_adjustment = (
-            self.controller.get_now_ts() - self.last_adjustment_time
-            < self.adjustment_delay
-        )
-        if self.adjustment_timer is None and was_recent_adjustment:
-            run_in = (
-                self.last_adjustment_time
-                + self.adjustment_delay
-                - self.controller.get_now_ts()
-            )
-            self.adjustment_timer = self.controller.run_in(
-                self.adjust_for_conditions_after_delay,
-                run_in,
-            )
-            if self.controller.logger.isEnabledFor(logging.DEBUG):
-                self.controller.log(
-                    f"The '{self.device_id}' is set to adjust for conditions "
-                    f"in {run_in:.1f} seconds as it was already adjusted recently",
-                    level="DEBUG",
-                )
-        elif self.adjustment_timer is None or not was_recent_adjustment:
-            if self.adjustment_timer:
-                self.controller.cancel_timer(self.adjustment_timer)
-                self.adjustment_timer = None
-            self.adjust_for_conditions()
-        elif self.controller.logger.isEnabledFor(logging.DEBUG):
-            self.controller.log(
-                f"The '{self.device_id}' is already set to adjust for conditions "
-                "shortly - ignoring latest sensor change",
-                level="DEBUG",
-            )
+        self.sensor_changes.add()
 
-    def adjust_for_conditions_after_delay(self, **kwargs: dict):
-        """Delayed adjustment from timers initiated when handling presence change."""
-        del kwargs
-        self.adjustment_timer = None
+    def adjust_for_sensor_changes(self):
+        """Adjust for the sensor changes collected, then predict the next adjustment."""
         self.adjust_for_conditions()
+        self.predict_adjustment()
 
 
 class Aircon(ClimateDevice, PresenceDevice):
     """Control a specific aircon unit."""
 
+    kind = "aircon"
+
     def __init__(
         self,
         device_id: str,
@@ -632,28 +1023,24 @@ class Aircon(ClimateDevice, PresenceDevice):
             "both" if "both" in self.get_attribute("swing_modes") else "rangefull"
         )
         self.turn_off_timer_handle = None
-        self.vacating_delay = 60 * float(
-            controller.entities.input_number.aircon_vacating_delay.state,
-        )
+        self.vacating_delay = 60 * controller.settings.aircon_vacating_delay
         self.doors: list[Entity] = []
         for door in doors:
             door_id = f"binary_sensor.{door}_door"
             self.doors.append(self.controller.get_entity(door_id))
-            self.controller.listen_state(
+            self.controller.dispatcher.listen(
                 self.handle_door_change,
                 door_id,
                 new="off",
             )
-            self.controller.listen_state(
+            self.controller.dispatcher.listen(
                 self.handle_door_change,
                 door_id,
                 new="on",
                 duration=self.constants["aircon_reduce_fan"]["delay"],
             )
         self.__door_open_delay = None
-        self.door_open_delay = 60 * float(
-            controller.entities.input_number.aircon_door_check_delay.state,
-        )
+        self.door_open_delay = 60 * controller.settings.aircon_door_check_delay
         self.user_adjusted_on_time_threshold = 1
 
     @property
@@ -674,7 +1061,7 @@ class Aircon(ClimateDevice, PresenceDevice):
     def desired_target_temperature(self) -> float:
         """Get the desired room target temperature based on settings and conditions."""
         mode = self.best_mode_for_conditions
-        return self.controller.get_setting(mode + "ing_target_temperature")
+        return self.conditions.setting(mode + "ing_target_temperature")
 
     @property
     def fan_mode(self) -> str:
@@ -684,26 +1071,27 @@ class Aircon(ClimateDevice, PresenceDevice):
     @fan_mode.setter
     def fan_mode(self, mode: str):
         """Set the fan mode to the specified level (main options: 'low', 'auto')."""
-        if self.on and self.fan_mode != mode:
-            self.call_service("set_fan_mode", fan_mode=mode)
+        if self.on:
+            self.reconcile(fan_mode=mode)
 
     @property
     def swing_mode(self) -> str:
         """Get the aircon's current swing mode (main options: 'rangefull', 'both')."""
         return self.get_attribute("swing_mode")
 
+    @property
+    def desired_state_for_conditions(self) -> dict:
+        """Get the aircon settings to heat or cool as desired for current conditions."""
+        return {
+            "hvac_mode": self.best_mode_for_conditions,
+            "temperature": self.desired_target_temperature,
+            "fan_mode": None if self.door_open else self.preferred_fan_mode,
+            "swing_mode": self.preferred_swing_mode,
+        }
+
     def turn_on_for_conditions(self) -> bool:
         """Set the aircon unit to heat or cool at desired settings."""
-        mode = self.best_mode_for_conditions
-        if self.device.state != mode:
-            self.call_service("set_hvac_mode", hvac_mode=mode)
-        desired_target_temperature = self.desired_target_temperature
-        if self.target_temperature != desired_target_temperature:
-            self.call_service("set_temperature", temperature=desired_target_temperature)
-        if self.fan_mode != self.preferred_fan_mode and not self.door_open:
-            self.fan_mode = self.preferred_fan_mode
-        if self.swing_mode != self.preferred_swing_mode:
-            self.call_service("set_swing_mode", swing_mode=self.preferred_swing_mode)
+        return self.reconcile(**self.desired_state_for_conditions)
 
     def turn_off_after_delay(self, **kwargs: dict):
         """Turn aircon off after the required delay when a door opens."""
@@ -713,13 +1101,39 @@ class Aircon(ClimateDevice, PresenceDevice):
     @property
     def would_turn_on_adjust_for_conditions(self):
         """Check if turn_on_for_conditions would actually make any changes."""
+        return self.reconcile(check_only=True, **self.desired_state_for_conditions)
+
+    def decision_inputs(self) -> dict:
+        """Get the aircon's inputs to the whole-house decision, with humidity."""
+        return {
+            **super().decision_inputs(),
+            "room_humidity": self.room_humidity if self.control_enabled else math.nan,
+        }
+
+    @property
+    def heating(self) -> bool:
+        """Check if the aircon is heating."""
+        return self.device.state == "heat"
+
+    @property
+    def cooling(self) -> bool:
+        """Check if the aircon is cooling (or drying, which also cools)."""
+        return self.device.state in ("cool", "dry")
+
+    def prediction_thresholds(self) -> tuple[tuple[float, int], ...]:
+        """Get the target it turns off on reaching, or triggers it turns on at."""
+        if self.heating:
+            return ((self.conditions.setting("heating_target_temperature"), 1),)
+        if self.device.state == "cool":
+            return ((self.conditions.setting("cooling_target_temperature"), -1),)
+        if self.on:
+            return ()
         return (
-            self.device.state != self.best_mode_for_conditions
-            or self.target_temperature != self.desired_target_temperature
-            or self.fan_mode != self.preferred_fan_mode
-            or self.swing_mode != self.preferred_swing_mode
+            (self.conditions.setting("high_temperature_aircon_trigger"), 1),
+            (self.conditions.setting("low_temperature_aircon_trigger"), -1),
         )
 
+    @decision
     def adjust_for_conditions(  # noqa: PLR0911
         self,
         *,
@@ -729,7 +1143,7 @@ class Aircon(ClimateDevice, PresenceDevice):
         if not self.control_enabled and not check_if_would_adjust_only:
             return None
         if (
-            "Away" in self.controller.control.scene
+            "Away" in self.conditions.scene
             and not self.controller.presence.pets_home_alone
         ):
             if check_if_would_adjust_only:
@@ -739,7 +1153,7 @@ class Aircon(ClimateDevice, PresenceDevice):
         if not self.on:
             if (
                 (self.too_hot_or_cold or self.too_humid)
-                and (self.ignoring_vacancy or not self.vacant)
+                and (self.ignoring_vacancy or not self.conditions.vacant)
                 and not self.door_open
             ):
                 if check_if_would_adjust_only:
@@ -750,9 +1164,9 @@ class Aircon(ClimateDevice, PresenceDevice):
             self.door_open
             or (
                 self.within_target_temperatures
-                and self.room_humidity < self.controller.get_setting("target_humidity")
+                and self.room_humidity < self.conditions.setting("target_humidity")
             )
-            or (not self.ignoring_vacancy and self.vacant)
+            or (not self.ignoring_vacancy and self.conditions.vacant)
         ):
             if check_if_would_adjust_only:
                 return True
@@ -767,6 +1181,10 @@ class Aircon(ClimateDevice, PresenceDevice):
     @property
     def door_open(self) -> bool:
         """Check if any doors are open (and have been for the required delay)."""
+        return self.conditions.door_open
+
+    def read_door_open(self) -> bool:
+        """Read if any doors are open (and have been for the required delay)."""
         return any(
             door.state == "on" and door.last_changed_seconds >= self.door_open_delay
             for door in self.doors
@@ -857,7 +1275,7 @@ class Aircon(ClimateDevice, PresenceDevice):
             )
         ) and self.controller.presence.anyone_home:
             self.controller.suggest(
-                f"Outside ({self.controller.outside_temperature:.1f}°) "
+                f"Outside ({self.conditions.outside_temperature:.1f}°) "
                 f"is a more pleasant temperature than the {self.room} "
                 f"({self.room_temperature:.1f}°), consider opening up the house",
             )
@@ -866,6 +1284,8 @@ class Aircon(ClimateDevice, PresenceDevice):
 class Fan(ClimateDevice, PresenceDevice):
     """Control a fan and configure responses to environmental changes."""
 
+    kind = "fan"
+
     def __init__(
         self,
         device_id: str,
@@ -886,12 +1306,9 @@ class Fan(ClimateDevice, PresenceDevice):
         self.speed_levels = round(100 / self.speed_per_level)
         self.minimum_speed = self.speed_per_level * 1
         self.reverse_desired = self.reverse
-        self.reversing_timer = None
-        self.reversing_steps_remaining = []
+        self.sequencer = FanSequencer(self, self.constants["fan"]["reversing_delay"])
         self.companion_device = companion_device
-        self.vacating_delay = 60 * float(
-            controller.entities.input_number.fan_vacating_delay.state,
-        )
+        self.vacating_delay = 60 * controller.settings.fan_vacating_delay
 
     @property
     def speed(self) -> float:
@@ -936,7 +1353,7 @@ class Fan(ClimateDevice, PresenceDevice):
     @property
     def target_temperature(self) -> float:
         """Get the fan's target temperature."""
-        return self.controller.get_setting("cooling_target_temperature")
+        return self.conditions.setting("cooling_target_temperature")
 
     @property
     def cooling_effect(self) -> float:
@@ -990,6 +1407,13 @@ class Fan(ClimateDevice, PresenceDevice):
             )
         )
 
+    def decision_inputs(self) -> dict:
+        """Get the fan's inputs to the whole-house decision, with its companion."""
+        return {
+            **super().decision_inputs(),
+            "companion_on": bool(self.companion_device and self.companion_device.on),
+        }
+
     def turn_on_for_conditions(self):
         """Turn the fan on with appropriate speed and direction for the environment."""
         reverse = (
@@ -1002,6 +1426,7 @@ class Fan(ClimateDevice, PresenceDevice):
             speed=max(self.minimum_speed, self.desired_cooling_speed),
         )
 
+    @decision
     def adjust_for_conditions(
         self,
         *,
@@ -1018,10 +1443,10 @@ class Fan(ClimateDevice, PresenceDevice):
             speed = max(self.minimum_speed, self.desired_cooling_speed)
         elif (
             (
-                "Away" not in self.controller.control.scene
+                "Away" not in self.conditions.scene
                 or self.controller.presence.pets_home_alone
             )
-            and (self.ignoring_vacancy or not self.vacant)
+            and (self.ignoring_vacancy or not self.conditions.vacant)
             and not self.within_target_temperatures
         ):
             if self.closer_to_hot_than_cold:
@@ -1043,10 +1468,12 @@ class Fan(ClimateDevice, PresenceDevice):
         return None
 
     def adjust(self, reverse: bool, speed: float) -> float:
-        """Adjust the fan direction and speed in the correct order."""
-        if self.reversing_timer:
-            self.controller.cancel_timer(self.reversing_timer)
-            self.reversing_timer = None
+        """Adjust the fan direction and speed in the correct order.
+
+        Reversing slows the fan to its minimum speed first, then changes direction
+        and speed, each step once the fan has confirmed the last.
+        """
+        self.sequencer.cancel()
         speed = self.validate_speed(speed)
         if speed == 0:
             self.turn_off()
@@ -1064,23 +1491,12 @@ class Fan(ClimateDevice, PresenceDevice):
                 f"temperature by {temperature_change:.1f}C to "
                 f"{self.room_temperature + temperature_change:.1f}C",
             )
-            if not self.on:
-                self.turn_on(percentage=self.minimum_speed)
-                self.reversing_steps_remaining = ["reverse"]
-            elif self.speed != self.minimum_speed:
-                self.call_service("set_percentage", percentage=self.minimum_speed)
-                self.reversing_steps_remaining = ["reverse"]
-            else:
-                self.call_service(
-                    "set_direction",
-                    direction="reverse" if reverse else "forward",
-                )
-                self.reversing_steps_remaining = []
-            if speed != self.minimum_speed:
-                self.reversing_steps_remaining += [speed]
-            self.reversing_timer = self.controller.run_in(
-                self.continue_reverse,
-                self.constants["fan"]["reversing_delay"],
+            self.sequencer.start(
+                [
+                    ("percentage", self.minimum_speed),
+                    ("direction", "reverse" if reverse else "forward"),
+                    ("percentage", speed),
+                ],
             )
             return
         if speed == self.speed:
@@ -1094,44 +1510,14 @@ class Fan(ClimateDevice, PresenceDevice):
             f"{temperature_change:.1f}C to "
             f"{self.room_temperature + temperature_change:.1f}C",
         )
-        if self.on:
-            self.call_service("set_percentage", percentage=speed)
-        else:
-            self.turn_on(percentage=speed)
-
-    def continue_reverse(self, **kwargs: dict):
-        """Continue the remaining fan reversal steps (reverse or change speed)."""
-        del kwargs
-        if not self.reversing_steps_remaining:
-            return
-        if self.reversing_steps_remaining[0] == "reverse":
-            if self.reverse != self.reverse_desired:
-                self.call_service(
-                    "set_direction",
-                    direction="reverse" if self.reverse_desired else "forward",
-                )
-            else:
-                del self.reversing_steps_remaining[0]
-        elif self.speed != self.reversing_steps_remaining[0]:
-            self.call_service(
-                "set_percentage",
-                percentage=self.reversing_steps_remaining[0],
-            )
-        else:
-            del self.reversing_steps_remaining[0]
-        self.reversing_timer = (
-            self.controller.run_in(
-                self.continue_reverse,
-                self.constants["fan"]["reversing_delay"],
-            )
-            if self.reversing_steps_remaining
-            else None
-        )
+        self.turn_on(percentage=speed)
 
 
 class Heater(ClimateDevice, PresenceDevice):
     """Control a heater and configure responses to environmental changes."""
 
+    kind = "heater"
+
     def __init__(
         self,
         device_id: str,
@@ -1151,13 +1537,12 @@ class Heater(ClimateDevice, PresenceDevice):
         door_id = f"binary_sensor.{room}_door"
         if self.controller.entity_exists(door_id):
             self.door = self.controller.get_entity(door_id)
-            self.controller.listen_state(self.handle_door_change, door_id)
+            self.controller.dispatcher.listen(self.handle_door_change, door_id)
         else:
             self.door = None
         self.safe_when_vacant = safe_when_vacant
         self.vacating_delay = (
-            60
-            * float(self.controller.entities.input_number.heater_vacating_delay.state)
+            60 * self.controller.settings.heater_vacating_delay
             if safe_when_vacant
             else 0
         )
@@ -1165,7 +1550,7 @@ class Heater(ClimateDevice, PresenceDevice):
     @property
     def desired_target_temperature(self) -> float:
         """Get the heater's target temperature."""
-        return self.controller.get_setting("heating_target_temperature")
+        return self.conditions.setting("heating_target_temperature")
 
     @property
     def target_temperature(self) -> float:
@@ -1179,16 +1564,8 @@ class Heater(ClimateDevice, PresenceDevice):
     @target_temperature.setter
     def target_temperature(self, target: float):
         """Set the heater's target temperature."""
-        if self.should_update_target_temperature:
-            self.call_service("set_temperature", temperature=target)
-
-    @property
-    def should_update_target_temperature(self):
-        """Check if device target temperature is as desired (if device type can)."""
-        return (
-            self.device_type == "climate"
-            and self.target_temperature != self.desired_target_temperature
-        )
+        if self.device_type == "climate":
+            self.reconcile(temperature=target)
 
     @property
     def on_when_away_and_not_safe(self):
@@ -1198,10 +1575,31 @@ class Heater(ClimateDevice, PresenceDevice):
             and self.on
             and (
                 not self.controller.presence.anyone_home
-                or "Away" in self.controller.control.scene
+                or "Away" in self.conditions.scene
             )
         )
 
+    def decision_inputs(self) -> dict:
+        """Get the heater's inputs to the whole-house decision, with its door."""
+        return {
+            **super().decision_inputs(),
+            "door_open": self.door is not None and self.door.state != "off",
+            "door_closed": self.door is not None and self.door.state == "off",
+            "safe_when_vacant": self.safe_when_vacant,
+        }
+
+    @property
+    def heating(self) -> bool:
+        """Check if the heater is on."""
+        return self.on
+
+    def prediction_thresholds(self) -> tuple[tuple[float, int], ...]:
+        """Get the temperature it turns off at when on, or on at when off."""
+        buffer = self.constants["target_buffer"]["heater_temperature"]
+        if self.on:
+            return ((self.desired_target_temperature + buffer, 1),)
+        return ((self.desired_target_temperature - buffer, -1),)
+
     def turn_on_for_conditions(self):
         """Turn the heater on and adjust the target temperature if appropriate."""
         self.target_temperature = self.desired_target_temperature
@@ -1225,6 +1623,7 @@ class Heater(ClimateDevice, PresenceDevice):
             + self.constants["target_buffer"]["heater_temperature"]
         )
 
+    @decision
     def adjust_for_conditions(
         self,
         *,
@@ -1239,7 +1638,7 @@ class Heater(ClimateDevice, PresenceDevice):
             if not self.on:
                 if (
                     self.too_cold
-                    and (self.ignoring_vacancy or not self.vacant)
+                    and (self.ignoring_vacancy or not self.conditions.vacant)
                     and (self.door and self.door.state == "off")
                 ):
                     if check_if_would_adjust_only:
@@ -1247,7 +1646,7 @@ class Heater(ClimateDevice, PresenceDevice):
                     self.turn_on_for_conditions()
             elif (
                 self.room_warm_enough
-                or (not self.ignoring_vacancy and self.vacant)
+                or (not self.ignoring_vacancy and self.conditions.vacant)
                 or (self.door and self.door.state != "off")
             ):
                 if check_if_would_adjust_only:
@@ -1288,6 +1687,8 @@ class Heater(ClimateDevice, PresenceDevice):
 class Humidifier(ClimateDevice, PresenceDevice):
     """Control a humidifier and configure responses to environmental changes."""
 
+    kind = "humidifier"
+
     def __init__(
         self,
         device_id: str,
@@ -1303,9 +1704,7 @@ class Humidifier(ClimateDevice, PresenceDevice):
             room=room,
             linked_rooms=linked_rooms,
         )
-        self.vacating_delay = 60 * float(
-            self.controller.entities.input_number.humidifier_vacating_delay.state,
-        )
+        self.vacating_delay = 60 * self.controller.settings.humidifier_vacating_delay
         self.controller.listen_state(
             self.handle_empty_water_tank,
             f"sensor.{room}_humidifier_faults",
@@ -1338,8 +1737,7 @@ class Humidifier(ClimateDevice, PresenceDevice):
     @target_humidity.setter
     def target_humidity(self, target: float):
         """Set the humidifier's target humidity."""
-        if self.target_humidity != self.controller.get_setting("target_humidity"):
-            self.call_service("set_humidity", humidity=target)
+        self.reconcile(humidity=target)
 
     @property
     def constant_humidity_mode(self) -> bool:
@@ -1348,13 +1746,21 @@ class Humidifier(ClimateDevice, PresenceDevice):
 
     def set_constant_humidity_mode(self):
         """Set the humidifier to reach and maintain a constant humidity."""
-        if self.on and not self.constant_humidity_mode:
-            self.call_service("set_mode", mode="Constant Humidity")
+        if self.on:
+            self.reconcile(mode="Constant Humidity")
+
+    def decision_inputs(self) -> dict:
+        """Get the humidifier's inputs to the whole-house decision, with humidity."""
+        return {
+            **super().decision_inputs(),
+            "room_humidity": self.room_humidity if self.control_enabled else math.nan,
+            "empty_water_tank": self.empty_water_tank,
+        }
 
     def turn_on_for_conditions(self):
         """Turn the humidifier on and adjust the target humidity if appropriate."""
         self.set_constant_humidity_mode()
-        self.target_humidity = self.controller.get_setting("target_humidity")
+        self.target_humidity = self.conditions.setting("target_humidity")
         self.turn_on()
 
     @property
@@ -1388,6 +1794,7 @@ class Humidifier(ClimateDevice, PresenceDevice):
             )
             self.already_notified_of_empty_water_tank = True
 
+    @decision
     def adjust_for_conditions(
         self,
         *,
@@ -1401,7 +1808,7 @@ class Humidifier(ClimateDevice, PresenceDevice):
             and not self.on
             and (
                 self.ignoring_vacancy
-                or (not self.vacant and self.controller.control.scene == "Sleep")
+                or (not self.conditions.vacant and self.conditions.scene == "Sleep")
             )
         ):
             if self.empty_water_tank:
@@ -1413,7 +1820,7 @@ class Humidifier(ClimateDevice, PresenceDevice):
         elif self.on and (
             self.too_humid
             or (
-                (self.controller.control.scene != "Sleep" or self.vacant)
+                (self.conditions.scene != "Sleep" or self.conditions.vacant)
                 and not self.ignoring_vacancy
             )
         ):
@@ -1422,12 +1829,12 @@ class Humidifier(ClimateDevice, PresenceDevice):
             self.turn_off()
         elif self.on and (
             not self.constant_humidity_mode
-            or self.target_humidity != self.controller.get_setting("target_humidity")
+            or self.target_humidity != self.conditions.setting("target_humidity")
         ):
             if check_if_would_adjust_only:
                 return True
             self.set_constant_humidity_mode()
-            self.target_humidity = self.controller.get_setting("target_humidity")
+            self.target_humidity = self.conditions.setting("target_humidity")
         return False
 
     def sync_lighting(
@@ -1463,3 +1870,237 @@ class Humidifier(ClimateDevice, PresenceDevice):
         """Ensure the humidifier is set to not beep on status change."""
         del entity, attribute, old, new, kwargs
         self.controller.set_state(f"switch.{self.room}_humidifier_beeper", state="off")
+
+
+class ClimateSettings(Settings):
+    """Climate targets, triggers (normal and for sleep), delays and bed time."""
+
+    cooling_target_temperature: float
+    heating_target_temperature: float
+    high_temperature_aircon_trigger: float
+    low_temperature_aircon_trigger: float
+    high_humidity_aircon_trigger: float
+    low_humidity_humidifier_trigger: float
+    target_humidity: float
+    sleep_cooling_target_temperature: float
+    sleep_heating_target_temperature: float
+    sleep_high_temperature_aircon_trigger: float
+    sleep_low_temperature_aircon_trigger: float
+    sleep_high_humidity_aircon_trigger: float
+    sleep_low_humidity_humidifier_trigger: float
+    sleep_target_humidity: float
+    aircon_vacating_delay: float
+    aircon_door_check_delay: float
+    fan_vacating_delay: float
+    heater_vacating_delay: float
+    humidifier_vacating_delay: float
+    bed_time: datetime.time
+
+
+class ConditionFrame:
+    """The conditions a climate device's decision is made from.
+
+    Built at the start of each decision, so all of its threshold checks see the same
+    conditions. Each is read (from sensors, settings or other apps) when first
+    needed, then kept unchanged for the rest of the decision, with reads counted to
+    show how many were saved.
+    """
+
+    def __init__(self, device: ClimateDevice):
+        """Start a frame for a device with nothing read yet."""
+        self.__device = device
+        self.__values: dict[str, float | str | bool] = {}
+        self.reads = 0
+
+    @property
+    def saved(self) -> int:
+        """Get the number of reads served without reading the condition again."""
+        return self.reads - len(self.__values)
+
+    def __value(self, name: str, read: Callable[[], float | str | bool]):
+        """Get a condition's value, reading it if this is the first time."""
+        self.reads += 1
+        if name not in self.__values:
+            self.__values[name] = read()
+        return self.__values[name]
+
+    def assume(self, name: str, value: float | str | bool):
+        """Use a value for a condition (such as a prediction) instead of reading it."""
+        self.__values[name] = value
+
+    @property
+    def room_temperature(self) -> float:
+        """Get the average temperature of the device's room(s)."""
+        return self.__value("room_temperature", self.__device.read_room_temperature)
+
+    @property
+    def room_humidity(self) -> float:
+        """Get the average humidity of the device's room(s)."""
+        return self.__value("room_humidity", self.__device.read_room_humidity)
+
+    @property
+    def outside_temperature(self) -> float:
+        """Get the apparent temperature outside."""
+        return self.__value(
+            "outside_temperature",
+            lambda: self.__device.controller.outside_temperature,
+        )
+
+    @property
+    def scene(self) -> str:
+        """Get the current scene."""
+        return self.__value("scene", lambda: self.__device.controller.control.scene)
+
+    @property
+    def vacant(self) -> bool:
+        """Check if the device's room(s) are vacant."""
+        return self.__value("vacant", lambda: self.__device.vacant)
+
+    @property
+    def door_open(self) -> bool:
+        """Check if any of the device's doors are open (for long enough)."""
+        return self.__value("door_open", self.__device.read_door_open)
+
+    def setting(self, setting_name: str) -> float:
+        """Get a target or trigger setting, as it applies to the current scene."""
+        controller = self.__device.controller
+        sleep = self.__value(
+            "sleep_settings",
+            lambda: controller.sleep_settings_apply(self.scene),
+        )
+        return self.__value(
+            setting_name,
+            lambda: getattr(
+                controller.settings,
+                f"sleep_{setting_name}" if sleep else setting_name,
+            ),
+        )
+
+
+class FanSequencer:
+    """A fan's speed and direction changes, each sent once the last is confirmed.
+
+    A step is confirmed as soon as the fan reports the value it sets, and the next
+    is sent straight away. If the fan hasn't confirmed a step within the timeout,
+    the step is sent again. How long each attribute takes to confirm is recorded.
+    """
+
+    def __init__(self, fan: Fan, timeout: float):
+        """Listen for the fan's confirmations, with no steps to run yet."""
+        self.fan = fan
+        self.timeout = timeout
+        self.steps: list[tuple[str, str | float]] = []
+        self.sent_at = 0.0
+        self.timer: str | None = None
+        self.sequences = 0
+        self.timeouts = 0
+        self.confirmations = {
+            attribute: {"count": 0, "total_time": 0.0, "max_time": 0.0}
+            for attribute in ("percentage", "direction")
+        }
+        for attribute in (None, *self.confirmations):
+            fan.controller.dispatcher.listen(
+                self.handle_fan_change,
+                fan.device_id,
+                attribute=attribute,
+            )
+
+    @property
+    def stats(self) -> dict:
+        """Get the sequences run, steps timed out and times taken to confirm."""
+        return {
+            "sequences": self.sequences,
+            "timeouts": self.timeouts,
+            "confirmations": {
+                attribute: {
+                    "count": stats["count"],
+                    "mean_ms": round(stats["total_time"] * 1000 / stats["count"], 1)
+                    if stats["count"]
+                    else None,
+                    "max_ms": round(stats["max_time"] * 1000, 1),
+                }
+                for attribute, stats in self.confirmations.items()
+            },
+        }
+
+    def start(self, steps: list[tuple[str, str | float]]):
+        """Run steps of (attribute, value) in order, replacing any still running."""
+        self.cancel()
+        self.steps = list(steps)
+        self.sequences += 1
+        self.__send_next()
+
+    def cancel(self):
+        """Stop running the remaining steps."""
+        self.fan.controller.timer_wheel.cancel(self.timer)
+        self.timer = None
+        self.steps = []
+
+    def confirmed(self, attribute: str, value: str | float) -> bool:
+        """Check if the fan reports an attribute's value (a speed of 0 if off)."""
+        if attribute == "percentage":
+            return self.fan.speed == value
+        return self.fan.get_attribute(attribute) == value
+
+    def __send_next(self):
+        """Send the next step the fan doesn't already report (if any are left)."""
+        while self.steps and self.confirmed(*self.steps[0]):
+            del self.steps[0]
+        if self.steps:
+            self.sent_at = self.fan.controller.get_now_ts()
+            self.__send()
+
+    def __send(self):
+        """Send the current step and time out waiting for it to be confirmed."""
+        attribute, value = self.steps[0]
+        if attribute == "percentage":
+            self.fan.turn_on(percentage=value)
+        else:
+            self.fan.reconcile(**{attribute: value})
+        self.timer = self.fan.controller.timer_wheel.run_in(
+            self.handle_timeout,
+            self.timeout,
+        )
+
+    def __confirm(self):
+        """Record how long the current step took to confirm (from first sent)."""
+        attribute = self.steps.pop(0)[0]
+        seconds = self.fan.controller.get_now_ts() - self.sent_at
+        stats = self.confirmations[attribute]
+        stats["count"] += 1
+        stats["total_time"] += seconds
+        stats["max_time"] = max(stats["max_time"], seconds)
+        self.__send_next()
+
+    def handle_fan_change(
+        self,
+        entity: str,
+        attribute: str,
+        old: str | float,
+        new: str | float,
+        **kwargs: dict,
+    ):
+        """Advance to the next step if the fan now confirms the current one."""
+        del entity, attribute, old, new, kwargs
+        if self.steps and self.confirmed(*self.steps[0]):
+            self.fan.controller.timer_wheel.cancel(self.timer)
+            self.timer = None
+            self.__confirm()
+
+    def handle_timeout(self, **kwargs: dict):
+        """Send the current step again as the fan hasn't confirmed it in time."""
+        del kwargs
+        self.timer = None
+        if not self.steps:
+            return
+        if self.confirmed(*self.steps[0]):
+            self.__confirm()
+            return
+        self.timeouts += 1
+        attribute = self.steps[0][0]
+        # forget the unconfirmed command, or reconciling would expect it and not resend
+        for field in (
+            (attribute, "state") if attribute == "percentage" else (attribute,)
+        ):
+            self.fan.in_flight.pop(field, None)
+        self.__send()
@@ -0,0 +1,273 @@
+"""Whole-house climate decisions, evaluated for every device at once.
+
+Kept free of AppDaemon (like scenes.py) so the thresholds the climate devices act
+on can also be evaluated offline for many rooms or scenarios. Inputs are columns
+(one value per device), and every threshold comparison is evaluated in a single
+vectorised pass with numpy if it is installed, otherwise device by device.
+
+The actions say what the thresholds call for, for evaluating scenarios offline.
+Devices still decide for themselves (modes, targets, fan speeds and not disturbing
+sleep), so the apps only use might_adjust: a conservative test that leaves out
+presence, doors and scenes, so a device is only left alone when none of its
+thresholds could call for a change.
+"""
+
+from __future__ import annotations
+
+import math
+import operator
+from typing import TYPE_CHECKING
+
+try:
+    import numpy as np
+except ImportError:  # optional, only makes deciding for many devices faster
+    np = None
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+
+KEEP = "keep"
+TURN_ON = "turn_on"
+TURN_OFF = "turn_off"
+ADJUST = "adjust"
+INPUTS = (
+    "kind",
+    "on",
+    "control_enabled",
+    "ignoring_vacancy",
+    "vacant",
+    "door_open",
+    "door_closed",
+    "away",
+    "away_scene",
+    "sleep_scene",
+    "anyone_home",
+    "safe_when_vacant",
+    "companion_on",
+    "empty_water_tank",
+    "room_temperature",
+    "room_humidity",
+    "cooling_target_temperature",
+    "heating_target_temperature",
+    "low_temperature_aircon_trigger",
+    "high_temperature_aircon_trigger",
+    "low_humidity_humidifier_trigger",
+    "high_humidity_aircon_trigger",
+    "target_humidity",
+    "heater_temperature_buffer",
+)
+DEFAULTS = {  # inputs only some kinds of device have, and the value for others
+    "door_closed": False,
+    "safe_when_vacant": True,
+    "companion_on": False,
+    "empty_water_tank": False,
+    "room_humidity": math.nan,
+}
+
+
+def columns(rows: list[dict]) -> dict[str, list]:
+    """Get columns of inputs from each device's inputs (any it lacks defaulted)."""
+    return {
+        name: [row[name] if name in row else DEFAULTS[name] for row in rows]
+        for name in INPUTS
+    }
+
+
+def decide(inputs: dict[str, Sequence]) -> list[str]:
+    """Get the action for each device from columns of its inputs (see INPUTS)."""
+    return evaluate_columns(evaluate, inputs)
+
+
+def might_adjust(inputs: dict[str, Sequence]) -> list[bool]:
+    """Check which devices might need adjusting, from columns of their inputs."""
+    return evaluate_columns(evaluate_might_adjust, inputs)
+
+
+def evaluate_columns(evaluation: Callable, inputs: dict[str, Sequence]) -> list:
+    """Evaluate for every device at once (with numpy if installed, else one by one)."""
+    missing = set(INPUTS) - set(inputs)
+    if missing:
+        msg = f"Missing climate decision inputs: {', '.join(sorted(missing))}"
+        raise ValueError(msg)
+    if np is not None:
+        return evaluation(
+            {name: np.asarray(inputs[name]) for name in INPUTS},
+            np.logical_not,
+            np.select,
+        ).tolist()
+    return [
+        evaluation(dict(zip(INPUTS, device, strict=True)), operator.not_, select)
+        for device in zip(*(inputs[name] for name in INPUTS), strict=True)
+    ]
+
+
+def select(conditions: list, choices: list, default: str) -> str:
+    """Get the choice of the first condition met (as numpy.select, for one device)."""
+    return next(
+        (
+            choice
+            for condition, choice in zip(conditions, choices, strict=True)
+            if condition
+        ),
+        default,
+    )
+
+
+def evaluate(
+    inputs: dict,
+    logical_not: Callable,
+    choose: Callable,
+) -> str | object:
+    """Evaluate the actions for devices' inputs (arrays, or one device's values)."""
+    temperature = inputs["room_temperature"]
+    humidity = inputs["room_humidity"]
+    on = inputs["on"]
+    off = logical_not(on)
+    enabled = inputs["control_enabled"]
+    present = inputs["ignoring_vacancy"] | logical_not(inputs["vacant"])
+    left = logical_not(inputs["ignoring_vacancy"]) & inputs["vacant"]
+    within_targets = logical_not(
+        (temperature > inputs["cooling_target_temperature"])
+        | (temperature < inputs["heating_target_temperature"]),
+    )
+    too_hot_or_cold = logical_not(
+        (inputs["low_temperature_aircon_trigger"] < temperature)
+        & (temperature < inputs["high_temperature_aircon_trigger"]),
+    )
+    closer_to_hot_than_cold = (
+        temperature
+        > (inputs["cooling_target_temperature"] + inputs["heating_target_temperature"])
+        / 2
+    )
+    too_humid = humidity > inputs["high_humidity_aircon_trigger"]
+    too_dry = humidity < inputs["low_humidity_humidifier_trigger"]
+    too_cold = (
+        temperature
+        < inputs["heating_target_temperature"] - inputs["heater_temperature_buffer"]
+    )
+    warm_enough = (
+        temperature
+        > inputs["heating_target_temperature"] + inputs["heater_temperature_buffer"]
+    )
+    aircon = enabled & (inputs["kind"] == "aircon")
+    fan = enabled & (inputs["kind"] == "fan")
+    heater = inputs["kind"] == "heater"
+    humidifier = enabled & (inputs["kind"] == "humidifier")
+    fan_wanted = (
+        logical_not(inputs["away"])
+        & present
+        & logical_not(within_targets)
+        & closer_to_hot_than_cold
+    )
+    humidifier_wanted = (
+        off
+        & too_dry
+        & (
+            inputs["ignoring_vacancy"]
+            | (logical_not(inputs["vacant"]) & inputs["sleep_scene"])
+        )
+    )
+    return choose(
+        [
+            aircon & inputs["away"] & on,
+            aircon & inputs["away"],
+            aircon
+            & off
+            & (too_hot_or_cold | too_humid)
+            & present
+            & logical_not(inputs["door_open"]),
+            aircon
+            & on
+            & (
+                inputs["door_open"]
+                | (within_targets & (humidity < inputs["target_humidity"]))
+                | left
+            ),
+            aircon & on,
+            fan & (inputs["companion_on"] | (fan_wanted & on)),
+            fan & fan_wanted,
+            fan & on,
+            heater
+            & logical_not(inputs["safe_when_vacant"])
+            & on
+            & (logical_not(inputs["anyone_home"]) | inputs["away_scene"]),
+            heater & enabled & off & too_cold & present & inputs["door_closed"],
+            heater & enabled & on & (warm_enough | left | inputs["door_open"]),
+            heater & enabled & on,
+            humidifier & humidifier_wanted & inputs["empty_water_tank"],
+            humidifier & humidifier_wanted,
+            humidifier
+            & on
+            & (
+                too_humid
+                | (
+                    (logical_not(inputs["sleep_scene"]) | inputs["vacant"])
+                    & logical_not(inputs["ignoring_vacancy"])
+                )
+            ),
+            humidifier & on,
+        ],
+        [
+            TURN_OFF,
+            KEEP,
+            TURN_ON,
+            TURN_OFF,
+            ADJUST,
+            ADJUST,
+            TURN_ON,
+            TURN_OFF,
+            TURN_OFF,
+            TURN_ON,
+            TURN_OFF,
+            ADJUST,
+            ADJUST,
+            TURN_ON,
+            TURN_OFF,
+            ADJUST,
+        ],
+        KEEP,
+    )
+
+
+def evaluate_might_adjust(
+    inputs: dict,
+    logical_not: Callable,
+    choose: Callable,
+) -> bool | object:
+    """Evaluate if devices might need adjusting (arrays, or one device's values).
+
+    Devices that are on always might (they keep adjusting their settings), as do
+    devices whose temperature is unknown, and devices that are off only might if a
+    threshold they turn on at is crossed (whoever is home, wherever the doors are).
+    """
+    temperature = inputs["room_temperature"]
+    humidity = inputs["room_humidity"]
+    on = inputs["on"]
+    kind = inputs["kind"]
+    unknown = temperature != temperature  # noqa: PLR0124 - only NaN isn't itself
+    outside_targets = (temperature > inputs["cooling_target_temperature"]) | (
+        temperature < inputs["heating_target_temperature"]
+    )
+    too_hot_or_cold = logical_not(
+        (inputs["low_temperature_aircon_trigger"] < temperature)
+        & (temperature < inputs["high_temperature_aircon_trigger"]),
+    )
+    closer_to_hot_than_cold = (
+        temperature
+        > (inputs["cooling_target_temperature"] + inputs["heating_target_temperature"])
+        / 2
+    )
+    triggered = choose(
+        [kind == "aircon", kind == "fan", kind == "heater", kind == "humidifier"],
+        [
+            too_hot_or_cold | (humidity > inputs["high_humidity_aircon_trigger"]),
+            inputs["companion_on"] | (outside_targets & closer_to_hot_than_cold),
+            temperature
+            < inputs["heating_target_temperature"]
+            - inputs["heater_temperature_buffer"],
+            humidity < inputs["low_humidity_humidifier_trigger"],
+        ],
+        False,  # noqa: FBT003 - numpy.select's default
+    )
+    unsafe_heater = (kind == "heater") & logical_not(inputs["safe_when_vacant"]) & on
+    return unsafe_heater | (inputs["control_enabled"] & (on | unknown | triggered))
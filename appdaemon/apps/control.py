@@ -5,19 +5,113 @@ Schedules scene changes, reacts to user input, reports errors & low batteries.
 User defined variables are configued in control.yaml
 """
 
-import datetime
-import urllib.request
+from __future__ import annotations
 
-from app import App, IDs
+import asyncio
+import bisect
+import collections
+import functools
+import random
+import threading
+import time
+from types import MappingProxyType
+from typing import TYPE_CHECKING
+
+import aiohttp
+from app import App, Device, IDs
+from scenes import HouseSnapshot, choose_scene
+
+if TYPE_CHECKING:
+    import datetime
+    from collections.abc import Callable
 
 
 class Control(App):
     """Controls the scene based on scheduled events, people's presence and input."""
 
+    setting_entities = MappingProxyType(
+        {
+            "handle_scene_setting": ("input_select.scene",),
+            "handle_pets_home_alone_setting": ("input_boolean.pets_home_alone",),
+            "handle_napping_setting": (
+                "input_boolean.napping_in_bedroom",
+                "input_boolean.napping_in_nursery",
+            ),
+            "handle_development_mode_setting": ("input_boolean.development_mode",),
+            "handle_timer_setting": (
+                "input_datetime.morning_time",
+                "input_datetime.nursery_time",
+                "input_datetime.bed_time",
+            ),
+            "handle_circadian_setting": (
+                "input_datetime.circadian_end_time",
+                "input_number.circadian_initial_sunset_offset",
+            ),
+            "handle_lighting_setting": (
+                "input_number.bathroom_vacating_delay",
+                "input_number.bedroom_vacating_delay",
+                "input_number.final_circadian_brightness",
+                "input_number.final_circadian_kelvin",
+                "input_number.initial_circadian_brightness",
+                "input_number.initial_circadian_kelvin",
+                "input_number.morning_brightness",
+                "input_number.morning_kelvin",
+                "input_number.morning_vacating_delay",
+                "input_number.night_motion_brightness",
+                "input_number.night_motion_kelvin",
+                "input_number.night_transition_period",
+                "input_number.night_vacating_delay",
+                "input_number.nursery_vacating_delay",
+                "input_number.office_vacating_delay",
+                "input_number.sleep_motion_brightness",
+                "input_number.sleep_motion_kelvin",
+                "input_number.sleep_transition_period",
+                "input_number.sleep_vacating_delay",
+                "input_number.tv_brightness",
+                "input_number.tv_kelvin",
+                "input_number.tv_motion_brightness",
+                "input_number.tv_transition_period",
+                "input_number.tv_vacating_delay",
+            ),
+            "handle_temperature_setting": (
+                "input_number.cooling_target_temperature",
+                "input_number.heating_target_temperature",
+                "input_number.high_temperature_aircon_trigger",
+                "input_number.low_temperature_aircon_trigger",
+                "input_number.sleep_cooling_target_temperature",
+                "input_number.sleep_heating_target_temperature",
+                "input_number.sleep_high_temperature_aircon_trigger",
+                "input_number.sleep_low_temperature_aircon_trigger",
+            ),
+            "handle_humidity_setting": (
+                "input_number.high_humidity_aircon_trigger",
+                "input_number.low_humidity_humidifier_trigger",
+                "input_number.sleep_high_humidity_aircon_trigger",
+                "input_number.sleep_low_humidity_humidifier_trigger",
+                "input_number.sleep_target_humidity",
+                "input_number.target_humidity",
+            ),
+            "handle_door_check_delay_setting": (
+                "input_number.aircon_door_check_delay",
+            ),
+            "handle_climate_vacating_delay_setting": (
+                "input_number.aircon_vacating_delay",
+                "input_number.fan_vacating_delay",
+                "input_number.heater_vacating_delay",
+                "input_number.humidifier_vacating_delay",
+            ),
+        },
+    )
+
     def __init__(self, *args, **kwargs):
         """Extend with attribute definitions."""
         super().__init__(*args, **kwargs)
         self.online = False
+        self.online_since: float | None = None
+        self.heartbeat_client = HeartbeatClient(
+            self.constants["heartbeat"]["url"],
+            self.constants["heartbeat"]["timeout"],
+        )
         self.timers = {
             "morning_time": None,
             "day_time": None,
@@ -25,14 +119,35 @@ class Control(App):
             "bed_time": None,
             "heartbeat": None,
             "heartbeat_fail_count": 0,
-            "init_delay": None,
-            "living_room_button": None,
-            "living_room_button_last_press": 0,
-            "nursery_button": None,
-            "nursery_button_last_press": 0,
+        }
+        self.settings_handlers = {
+            entity_id: getattr(self, handler)
+            for handler, entity_ids in self.setting_entities.items()
+            for entity_id in entity_ids
+        }
+        self.buttons = {
+            name: ButtonGestures(
+                name,
+                self.constants["button_max_double_press_delay"],
+                single=getattr(self, f"handle_{name}_single_press"),
+                double=getattr(self, f"handle_{name}_double_press"),
+                long=getattr(self, f"handle_{name}_long_press"),
+            )
+            for name in ("living_room_button", "nursery_button")
+        } | {
+            name: ButtonGestures(
+                name,
+                self.constants["button_max_double_press_delay"],
+                single=functools.partial(self.handle_bedroom_button_single_press, name),
+                double=functools.partial(self.handle_bedroom_button_double_press, name),
+                long=functools.partial(self.handle_bedroom_button_long_press, name),
+            )
+            for name in ("Dan's bedroom button", "Rachel's bedroom button")
         }
         self.log_listener = None
-        self.is_all_initialised = False
+        self.log_issues = LogIssueCounter()
+        self.readiness = ReadinessBarrier(self.constants["scene_dependencies"])
+        self.scene_transition: SceneTransition | None = None
 
     def initialize(self):
         """Monitor logs, listen for user input, monitor batteries and set timers.
@@ -40,19 +155,17 @@ class Control(App):
         Appdaemon defined init function called once ready after __init__.
         """
         super().initialize()
-        self.log_listener = self.listen_log(self.increment_log_issue_counter, "WARNING")
+        self.notifications.dedup_window = self.constants["notification_dedup_window"]
+        self.log_listener = self.listen_log(self.record_log_issue, "WARNING")
+        self.run_every(
+            self.flush_log_issues,
+            "now",
+            self.constants["log_issue_flush_period"],
+        )
         if self.entities.input_boolean.development_mode.state == "off":
             self.set_production_mode()
-        for setting in [
-            "input_boolean.development_mode",
-            "input_boolean.pets_home_alone",
-            "input_boolean.napping_in_bedroom",
-            "input_boolean.napping_in_nursery",
-            "input_datetime",
-            "input_number",
-            "input_select",
-        ]:
-            self.listen_state(
+        for setting in self.settings_handlers:
+            self.dispatcher.listen(
                 self.handle_ui_settings_change,
                 setting,
                 duration=self.constants["settings_change_delay"],
@@ -83,103 +196,249 @@ class Control(App):
             "update",
             attribute="latest_version",
         )
-        self.listen_event(self.all_initialized, "appd_started")
-        self.timers["init_delay"] = self.run_in(
-            self.assume_all_initialised,
-            self.constants["init_delay"],
+        self.register_endpoint(self.handle_callback_stats_request, "callback_stats")
+        self.run_every(
+            self.publish_callback_stats,
+            f"now+{self.constants['callback_stats_period']}",
+            self.constants["callback_stats_period"],
         )
-        # TODO: https://app.asana.com/0/1207020279479204/1203851145721583/f
-        # test self.notify("test message", targets="dan", title="test title", critical=True)
-
-    def all_initialized(self, event_name: str, data: dict, **kwargs: dict):
-        """Configure all apps with the current scene."""
-        del event_name, data, kwargs
-        self.log("All apps ready, resetting scene")
-        self.is_all_initialised = True
-        self.reset_scene(keep_bright=True)
         self.listen_event(
-            self.handle_app_reloaded,
+            self.handle_app_initialized,
             "app_initialized",
             namespace="admin",
         )
+        self.listen_event(self.handle_appd_started, "appd_started")
+        for name in tuple(self.registry.apps):
+            self.handle_app_initialized(None, {"app": name})
+        # TODO: https://app.asana.com/0/1207020279479204/1203851145721583/f
+        # test self.notify("test message", targets="dan", title="test title", critical=True)
 
-    def assume_all_initialised(self, **kwargs: dict):
-        """Configure all apps if not already done normally."""
-        del kwargs
-        if not self.is_all_initialised:
+    def handle_app_initialized(self, event_name: str, data: dict, **kwargs: dict):
+        """Mark an app as ready, setting the scene once all apps it needs are."""
+        del event_name, kwargs
+        if self.readiness.opened_ms is not None:
+            self.handle_app_reloaded(data["app"])
+        elif self.readiness.mark_ready(data["app"]):
+            self.set_first_scene()
+
+    def handle_appd_started(self, event_name: str, data: dict, **kwargs: dict):
+        """Set the scene if not already, as every app has now been initialised."""
+        del event_name, data, kwargs
+        if self.readiness.open():
             self.log(
-                "Assuming initialisation complete after "
-                f"{self.constants['init_delay']} seconds",
+                "AppDaemon started without initialising "
+                f"{sorted(self.readiness.waiting)}, setting scene anyway",
+                level="WARNING",
             )
-            self.all_initialized(None, None)
+            self.set_first_scene()
 
-    def handle_app_reloaded(self, event_name: str, data: dict, **kwargs: dict):
-        """Re-link the app and set a timer to initialise it?"""
-        del event_name, kwargs
-        self.log(f"App added: '{data['app']}'")
+    def set_first_scene(self):
+        """Configure all apps with the current scene."""
+        self.log(
+            f"All apps ready after {self.readiness.opened_ms} ms, resetting scene",
+        )
         self.reset_scene(keep_bright=True)
 
+    def handle_app_reloaded(self, name: str):
+        """Configure a reloaded app for the current scene."""
+        self.log(f"App reloaded: '{name}'")
+        app = self.registry.get(self, name)
+        if app is not self and hasattr(app, "transition_to_scene"):
+            app.transition_to_scene(self.scene)
+
+    def report_time_to_first_scene(self):
+        """Publish how long after starting each app was ready and the scene was set."""
+        self.set_state(
+            "sensor.time_to_first_scene",
+            state=self.readiness.first_scene_ms,
+            attributes={
+                "friendly_name": "Time to first scene",
+                "unit_of_measurement": "ms",
+                **self.readiness.stats,
+            },
+        )
+
     @property
     def scene(self) -> str:
-        """Get scene from Home Assistant."""
-        return self.entities.input_select.scene.state
+        """Get the scene being transitioned to, or else the scene in Home Assistant."""
+        transition = self.scene_transition
+        if transition is not None and transition.finished_ms is None:
+            return transition.scene
+        return self.get_state("input_select.scene")
 
     @scene.setter
     def scene(self, new_scene: str):
         """Propagate scene change to other apps and sync scene with Home Assistant."""
         self.log(f"Setting scene to '{new_scene}' (was previously '{self.scene}')")
-        self.lights.transition_to_scene(new_scene)
-        self.climate.transition_to_scene(new_scene)
-        if new_scene == "Sleep" or "Away" in new_scene:
-            self.presence.lock_door()
-            for area in ("entryway", "back_door", "back_deck", "garage"):
-                self.turn_on(f"switch.{area}_camera_enabled")
-            if new_scene == "Sleep":
-                self.napping_in_bedroom = True
+        plan = self.plans.get(
+            (new_scene, new_scene == "TV" and self.media.on),
+            lambda: self.compile_scene_plan(new_scene),
+        )
+        self.scene_transition = SceneTransition(self, new_scene, plan)
+        self.scene_transition.run()
+
+    def compile_scene_plan(self, scene: str) -> tuple[tuple, ...]:
+        """Compile every app's changes for a scene, as branches that can run at once.
+
+        Steps are (branch, app name, method name, args, kwargs, branches to run
+        after), naming apps rather than holding them so cached plans survive reloads.
+        """
+        plan = [
+            ("lights", "Lights", "transition_to_scene", (scene,), {}, ()),
+            ("climate", "Climate", "transition_to_scene", (scene,), {}, ()),
+        ]
+        areas = ("entryway", "back_door", "back_deck", "garage")
+        napping_after = ("lights", "climate")
+        if scene == "Sleep" or "Away" in scene:
+            plan.append(("presence", "Presence", "lock_door", (), {}, ()))
+            if scene == "Sleep":
+                plan.extend(
+                    (
+                        ("control", "Control", "switch_cameras", ("on", areas), {}, ()),
+                        (
+                            "napping",
+                            "Control",
+                            "change_napping_state",
+                            ("bedroom",),
+                            {"napping": True},
+                            napping_after,
+                        ),
+                    ),
+                )
             else:
-                self.turn_on("switch.living_room_camera_enabled")
-                self.notify(
-                    f"Home set to {new_scene} mode",
-                    title="Door Locked",
+                plan.extend(
+                    (
+                        (
+                            "control",
+                            "Control",
+                            "switch_cameras",
+                            ("on", (*areas, "living_room")),
+                            {},
+                            (),
+                        ),
+                        (
+                            "control",
+                            "Control",
+                            "notify",
+                            (f"Home set to {scene} mode",),
+                            {"title": "Door Locked"},
+                            (),
+                        ),
+                    ),
+                )
+                plan.extend(
+                    (
+                        "napping",
+                        "Control",
+                        "change_napping_state",
+                        (room,),
+                        {"napping": False},
+                        napping_after,
+                    )
+                    for room in ("bedroom", "nursery")
                 )
-                self.napping_in_bedroom = False
-                self.napping_in_nursery = False
                 # TODO: https://app.asana.com/0/1207020279479204/1203851145721583/f
                 # clear above notification when not Away?
-                self.media.turn_off()
+                plan.append(("media", "Media", "turn_off", (), {}, ()))
         else:
-            for area in ("entryway", "living_room", "back_door", "back_deck", "garage"):
-                self.turn_off(f"switch.{area}_camera_enabled")
-            if new_scene == "TV" and not self.media.on:
-                self.media.turn_on()
+            plan.append(
+                (
+                    "control",
+                    "Control",
+                    "switch_cameras",
+                    (
+                        "off",
+                        ("entryway", "living_room", "back_door", "back_deck", "garage"),
+                    ),
+                    {},
+                    (),
+                ),
+            )
+            if scene == "TV" and not self.media.on:
+                plan.append(("media", "Media", "turn_on", (), {}, ()))
+        return tuple(plan)
+
+    def switch_cameras(self, state: str, areas: tuple[str, ...]):
+        """Turn the cameras in the given areas 'on' or 'off'."""
+        for area in areas:
+            (self.turn_on if state == "on" else self.turn_off)(
+                f"switch.{area}_camera_enabled",
+            )
+
+    def finish_scene_transition(self, transition: SceneTransition):
+        """Sync the scene with Home Assistant once all apps have made their changes."""
         self.call_service(
             "input_select/select_option",
             entity_id="input_select.scene",
-            option=new_scene,
+            option=transition.scene,
+        )
+        self.service_calls.flush()
+        self.report_transition_calls(
+            transition.scene,
+            self.service_calls.sent - transition.calls_before,
+        )
+        if (
+            self.readiness.opened_ms is not None
+            and self.readiness.first_scene_ms is None
+        ):
+            self.readiness.first_scene_ms = self.readiness.elapsed_ms
+            self.report_time_to_first_scene()
+
+    def report_transition_calls(self, scene: str, calls: int):
+        """Publish the number of batched service calls sent for a scene transition."""
+        self.log(f"Transition to '{scene}' sent {calls} service call(s)", level="DEBUG")
+        self.set_state(
+            "sensor.scene_transition_service_calls",
+            state=calls,
+            attributes={
+                "friendly_name": "Scene transition service calls",
+                "scene": scene,
+                **self.service_calls.stats,
+            },
+        )
+
+    def report_transition_trace(self, transition: SceneTransition):
+        """Publish how long a scene transition took, step by step, to a sensor."""
+        self.log(
+            f"Transition to '{transition.scene}' finished in "
+            f"{transition.finished_ms} ms and was confirmed in "
+            f"{transition.confirmed_ms} ms",
+            level="DEBUG",
+        )
+        self.set_state(
+            "sensor.scene_transition_latency",
+            state=transition.confirmed_ms,
+            attributes={
+                "friendly_name": "Scene transition latency",
+                "unit_of_measurement": "ms",
+                "scene": transition.scene,
+                "finished_ms": transition.finished_ms,
+                "unconfirmed": transition.unconfirmed,
+                "trace": transition.trace,
+            },
         )
 
     def reset_scene(self, *, keep_bright: bool = False):
         """Set scene based on who's home, time, stored scene, etc."""
         self.log("Detecting current appropriate scene")
-        if keep_bright and self.scene == "Bright":
-            self.scene = "Bright"
-        elif not self.presence.anyone_home and self.presence.manual_guest_mode == "off":
-            self.scene = "Away (Night)" if self.lights.dark_outside else "Away (Day)"
-        elif not self.lights.dark_outside:
-            self.scene = "Day"
-        elif self.media.playing:
-            self.scene = "TV"
-        elif self.scene in ("Morning", "Sleep"):
-            self.scene = (
-                "Morning"
-                if self.now_is_between(
-                    self.entities.input_datetime.morning_time.state,
-                    self.constants["day_time"],
-                )
-                else "Sleep"
-            )
-        else:
-            self.scene = "Night"
+        self.scene = choose_scene(
+            self.scene,
+            self.house_snapshot(),
+            keep_bright=keep_bright,
+        )
+
+    def house_snapshot(self) -> HouseSnapshot:
+        """Snapshot the state of the house that scenes are chosen from."""
+        return HouseSnapshot(
+            anyone_home=self.presence.anyone_home,
+            guest_mode=self.presence.manual_guest_mode,
+            dark_outside=self.lights.dark_outside,
+            tv_playing=self.media.playing,
+            morning=self.now_is_between(
+                self.entities.input_datetime.morning_time.state,
+                self.constants["day_time"],
+            ),
+        )
 
     @property
     def napping_in_bedroom(self) -> bool:
@@ -189,7 +448,7 @@ class Control(App):
     @napping_in_bedroom.setter
     def napping_in_bedroom(self, napping: bool):
         """Set bedroom napping state, adjusting lights and climate devices."""
-        self.__change_napping_state("bedroom", napping)
+        self.change_napping_state("bedroom", napping)
 
     @property
     def napping_in_nursery(self) -> bool:
@@ -199,13 +458,13 @@ class Control(App):
     @napping_in_nursery.setter
     def napping_in_nursery(self, napping: bool):
         """Set nursery napping state, adjusting lights and climate devices."""
-        self.__change_napping_state("nursery", napping)
+        self.change_napping_state("nursery", napping)
 
     def napping_in(self, room: str) -> bool:
         """Get napping state for the given room from Home Assistant."""
         return self.get_state(f"input_boolean.napping_in_{room}") == "on"
 
-    def __change_napping_state(self, room: str, napping: bool):
+    def change_napping_state(self, room: str, napping: bool):
         """Change device behaviour based on napping state in the specified room."""
         self.log(
             f"Configuring the '{room}' with "
@@ -290,8 +549,8 @@ class Control(App):
         new,
         **kwargs: dict,
     ):
-        """Handle a Z-Wave button event."""
-        del attribute, new, kwargs
+        """Handle a Z-Wave button event (its state is the time it was pressed)."""
+        del attribute, kwargs
         button = entity.removeprefix("event.")
         event = self.get_state(entity, attribute="event_type")
         if old == "unavailable":
@@ -300,33 +559,34 @@ class Control(App):
                 log_level="DEBUG",
             )
             return
-        self.cancel_timer(self.timers[button])
         now = self.get_now_ts()
+        try:
+            pressed_at = min(self.convert_utc(new).timestamp(), now)
+        except (TypeError, ValueError):
+            pressed_at = now
         if event == "KeyPressed":
-            if (
-                now - self.timers[f"{button}_last_press"]
-                < self.constants["button_max_double_press_delay"]
-            ):
-                getattr(self, f"handle_{button}_double_press")()
-            else:
-                self.log(
-                    f"The '{button}' was pressed once: "
-                    "delaying action to detect double press",
-                    level="DEBUG",
-                )
-                self.timers[button] = self.run_in(
-                    getattr(self, f"handle_{button}_single_press"),
-                    self.constants["button_max_double_press_delay"],
-                )
-            self.timers[f"{button}_last_press"] = now
+            self.buttons[button].press(pressed_at, now)
         elif event == "KeyHeldDown":
-            getattr(self, f"handle_{button}_long_press")()
+            self.buttons[button].gesture("long", pressed_at, now)
 
-    def handle_living_room_button_single_press(self, **kwargs: dict):
-        """Handle a single press of the living room button."""
-        del kwargs
+    def handle_living_room_button_single_press(self) -> Callable:
+        """Handle a single press of the living room button, returning its undo."""
         self.log("Living room button pressed")
+        previous_scene = self.scene
+        was_napping = self.napping_in_bedroom
+        door_was_locked = self.presence.door_locked
+
+        def undo():
+            self.log(f"Rolling back living room button press to '{previous_scene}'")
+            self.scene = previous_scene
+            if not was_napping:
+                self.napping_in_bedroom = False
+            if not door_was_locked:
+                # unlock even if the lock isn't confirmed yet (so not via Presence)
+                self.call_service("lock/unlock", entity_id="lock.door_lock")
+
         self.scene = "Sleep"
+        return undo
 
     def handle_living_room_button_double_press(self):
         """Handle a double press of the living room button."""
@@ -351,14 +611,20 @@ class Control(App):
                 aircon.turn_on_for_conditions()
             aircon.handle_user_adjustment("the living room button")
 
-    def handle_nursery_button_single_press(self, **kwargs: dict):
-        """Handle a single press of the nursery button."""
-        del kwargs
-        self.timers["nursery_button"] = None
+    def handle_nursery_button_single_press(self) -> Callable | None:
+        """Handle a single press of the nursery button, returning its undo (if any)."""
         self.log("Nursery button pressed")
         if self.napping_in_nursery:
             self.log("Nursery already configured for napping - setting again anyway")
+            self.napping_in_nursery = True
+            return None
+
+        def undo():
+            self.log("Rolling back nursery button press")
+            self.napping_in_nursery = False
+
         self.napping_in_nursery = True
+        return undo
 
     def handle_nursery_button_double_press(self):
         """Handle a double press of the nursery button."""
@@ -397,19 +663,21 @@ class Control(App):
         data: dict[str],
         **kwargs: dict,
     ):
-        """Handle a bedroom Tuya button event."""
+        """Handle a bedroom Tuya button event (gestures are detected by the button)."""
         del event_type, kwargs
         button = (
             "Dan's bedroom button"
             if data["device_id"] == self.constants["button_ids"]["dan"]
             else "Rachel's bedroom button"
         )
-        if data["value"] == "single_click":
-            self.handle_bedroom_button_single_press(button)
-        elif data["value"] == "double_click":
-            self.handle_bedroom_button_double_press(button)
-        elif data["value"] == "long_press":
-            self.handle_bedroom_button_long_press(button)
+        gesture = {
+            "single_click": "single",
+            "double_click": "double",
+            "long_press": "long",
+        }.get(data["value"])
+        if gesture is not None:
+            now = self.get_now_ts()
+            self.buttons[button].gesture(gesture, now, now)
 
     def handle_bedroom_button_single_press(self, button: str):
         """Handle a single press of a bedroom button."""
@@ -495,47 +763,76 @@ class Control(App):
             f"to '{new}' from '{old}'",
             level="DEBUG" if not is_user else "INFO",
         )
-        if not is_user:
-            return
-        if setting == "scene":
-            self.scene = new
-        elif setting == "pets_home_alone":
-            if (new == "on") != self.presence.pets_home_alone:
-                self.presence.pets_home_alone = new == "on"
-        elif "napping_in" in setting:
-            self.__change_napping_state(setting.split("_")[-1], new == "on")
-        else:
-            self.handle_simple_settings_change(setting, new, old)
-
-    def handle_simple_settings_change(self, setting: str, new: str, old: str):
-        """Act on changes to settings that can only be made through the UI."""
-        if setting == "development_mode":
-            self.set_production_mode(new == "off")
-        elif setting.startswith("circadian"):
-            try:
-                self.lights.redate_circadian()
-            except ValueError:
-                self.revert_setting(f"input_datetime.{setting}", old)
-        elif setting.endswith("_time"):
-            if self.valid_time_settings:
-                self.set_timer(setting)
-            else:
-                self.revert_setting(f"input_datetime.{setting}", old)
-        elif "temperature" in setting:
-            self.climate.validate_target_and_trigger(setting)
-        elif "door" in setting:
-            self.climate.update_door_check_delay(float(new))
+        if is_user:
+            self.settings_handlers[entity](entity, new, old)
+
+    def handle_scene_setting(self, entity: str, new: str, old: str):
+        """Change to the scene chosen by the user."""
+        del entity, old
+        self.scene = new
+
+    def handle_pets_home_alone_setting(self, entity: str, new: str, old: str):
+        """Change whether pets are home alone (if it differs from presence)."""
+        del entity, old
+        if (new == "on") != self.presence.pets_home_alone:
+            self.presence.pets_home_alone = new == "on"
+
+    def handle_napping_setting(self, entity: str, new: str, old: str):
+        """Configure the room for napping (or normally)."""
+        del old
+        self.change_napping_state(
+            entity.removeprefix("input_boolean.napping_in_"),
+            new == "on",
+        )
+
+    def handle_development_mode_setting(self, entity: str, new: str, old: str):
+        """Switch between development and production mode."""
+        del entity, old
+        self.set_production_mode(new == "off")
+
+    def handle_timer_setting(self, entity: str, new: str, old: str):
+        """Reschedule a morning or bed timer, reverting the setting if invalid."""
+        del new
+        if self.valid_time_settings:
+            self.set_timer(self.split_entity(entity)[1])
         else:
-            device_type, setting_type = setting.split("_", maxsplit=1)
-            if setting_type == "vacating_delay" and device_type in (
-                "aircon",
-                "fan",
-                "heater",
-                "humidifier",
-            ):
-                self.climate.update_vacating_delays(device_type, float(new))
-            else:
-                self.lights.transition_to_scene(self.scene)
+            self.revert_setting(entity, old)
+
+    def handle_circadian_setting(self, entity: str, new: str, old: str):
+        """Redate circadian lighting, reverting the setting if invalid."""
+        del new
+        try:
+            self.lights.redate_circadian()
+        except ValueError:
+            self.revert_setting(entity, old)
+
+    def handle_lighting_setting(self, entity: str, new: str, old: str):
+        """Apply a lighting setting by transitioning the lights to the scene again."""
+        del entity, new, old
+        self.lights.transition_to_scene(self.scene)
+
+    def handle_temperature_setting(self, entity: str, new: str, old: str):
+        """Validate a target or trigger temperature against its pair."""
+        del new, old
+        self.climate.validate_target_and_trigger(self.split_entity(entity)[1])
+
+    def handle_humidity_setting(self, entity: str, new: str, old: str):
+        """Adjust climate devices for a new humidity target or trigger."""
+        del entity, new, old
+        self.climate.allow_suggestion()
+        self.climate.adjust_for_conditions()
+        self.climate.suggest_for_conditions()
+
+    def handle_door_check_delay_setting(self, entity: str, new: str, old: str):
+        """Update how long a door is open for before aircons react."""
+        del entity, old
+        self.climate.update_door_check_delay(float(new))
+
+    def handle_climate_vacating_delay_setting(self, entity: str, new: str, old: str):
+        """Update the vacating delay for a type of climate device."""
+        del old
+        device_type = self.split_entity(entity)[1].removesuffix("_vacating_delay")
+        self.climate.update_vacating_delays(device_type, float(new))
 
     def revert_setting(self, setting_id: str, value: str):
         """Revert setting to specified value & notify."""
@@ -557,14 +854,26 @@ class Control(App):
         )
 
     def heartbeat(self, **kwargs: dict):
-        """Send a heartbeat then handle if it is received or not."""
-        del kwargs
-        try:
-            urllib.request.urlopen(  # noqa: S310
-                self.constants["heartbeat"]["url"],
-                timeout=self.constants["heartbeat"]["timeout"],
-            )
-        except OSError:
+        """Send a heartbeat in the background, handling the result when it arrives."""
+        self.create_task(
+            self.heartbeat_client.send(),
+            callback=self.handle_heartbeat,
+            attempt=kwargs.get("attempt", 0),
+        )
+
+    def handle_heartbeat(self, **kwargs: dict):
+        """Handle if a heartbeat was received or not (retrying with jitter first)."""
+        if kwargs["result"] is None:
+            if kwargs["attempt"] < self.constants["heartbeat"]["retries"]:
+                self.run_in(
+                    self.heartbeat,
+                    self.heartbeat_client.retry_delay(
+                        kwargs["attempt"],
+                        self.constants["heartbeat"]["retry_delay"],
+                    ),
+                    attempt=kwargs["attempt"] + 1,
+                )
+                return
             self.timers["heartbeat_fail_count"] += 1
             if (
                 self.online
@@ -572,6 +881,7 @@ class Control(App):
                 >= self.constants["heartbeat"]["max_fail_count"]
             ):
                 self.online = False
+                self.online_since = None
                 self.log("Heartbeat timed out", level="WARNING")
         else:
             if self.timers["heartbeat_fail_count"] > 0:
@@ -581,6 +891,7 @@ class Control(App):
                 )
             if not self.online:
                 self.online = True
+                self.online_since = self.get_now_ts()
                 if (
                     self.timers["heartbeat_fail_count"]
                     >= self.constants["heartbeat"]["max_fail_count"]
@@ -589,8 +900,26 @@ class Control(App):
                     self.cancel_listen_log(self.log_listener)
                     self.call_service("homeassistant/restart")
             self.timers["heartbeat_fail_count"] = 0
+        self.publish_heartbeat_uptime()
+
+    def publish_heartbeat_uptime(self):
+        """Publish how long heartbeats have been received, with their latency."""
+        self.set_state(
+            "sensor.heartbeat_uptime",
+            state=round(self.get_now_ts() - self.online_since)
+            if self.online_since is not None
+            else 0,
+            attributes={
+                "friendly_name": "Heartbeat uptime",
+                "unit_of_measurement": "s",
+                "device_class": "duration",
+                "online": self.online,
+                "fail_count": self.timers["heartbeat_fail_count"],
+                **self.heartbeat_client.stats,
+            },
+        )
 
-    def increment_log_issue_counter(
+    def record_log_issue(
         self,
         app_name: str,
         timestamp: datetime.datetime,
@@ -599,18 +928,97 @@ class Control(App):
         message: str,
         **kwargs: dict,
     ):
-        """Increment counters if logged message is a WARNING or ERROR."""
+        """Count a logged WARNING or ERROR (added to its counter at the next flush)."""
         del app_name, timestamp, kwargs
         if log_type == "error_log":
             level = "ERROR" if message.startswith("Traceback") else None
         elif log_type == "main_log" and message.endswith("errors.log"):
             level = None
         if level in ("WARNING", "ERROR"):
-            self.call_service(
-                "counter/increment",
-                entity_id=f"counter.{level.lower()}s",
+            self.log_issues.record(level.lower(), self.get_now_ts())
+
+    def flush_log_issues(self, **kwargs: dict):
+        """Add warnings and errors logged since the last flush to their counters.
+
+        Also publishes how many were logged in the last hour (every flush, so the
+        sensors come back after Home Assistant restarts).
+        """
+        del kwargs
+        now = self.get_now_ts()
+        pending = self.log_issues.take_pending()
+        for level in ("error", "warning"):
+            for _ in range(pending[level]):  # increments, so never resets the count
+                self.call_service("counter/increment", entity_id=f"counter.{level}s")
+            self.set_state(
+                f"sensor.{level}s_in_the_last_hour",
+                state=self.log_issues.in_window(level, now),
+                attributes={
+                    "friendly_name": f"{level.capitalize()}s in the last hour",
+                    "state_class": "measurement",
+                    "unit_of_measurement": f"{level}s",
+                },
             )
 
+    def publish_callback_stats(self, **kwargs: dict):
+        """Publish the busiest callbacks and shared cache/queue stats to a sensor."""
+        del kwargs
+        self.set_state(
+            "sensor.appdaemon_callbacks",
+            state=self.callback_stats.total_count,
+            attributes={
+                "friendly_name": "AppDaemon callbacks",
+                "unit_of_measurement": "calls",
+                "busiest": self.callback_stats.summary(limit=10),
+                "buttons": {
+                    name: button.stats for name, button in self.buttons.items()
+                },
+                **self.shared_stats,
+            },
+        )
+
+    async def handle_callback_stats_request(self, request, kwargs: dict):
+        """Respond to the 'callback_stats' endpoint with all callback statistics."""
+        del request, kwargs
+        return {
+            "callbacks": self.callback_stats.summary(),
+            "buttons": {name: button.stats for name, button in self.buttons.items()},
+            **self.shared_stats,
+        }, 200
+
+    def terminate(self):
+        """Flush log issues and close the heartbeat connection, then release."""
+        self.flush_log_issues()
+        self.create_task(self.heartbeat_client.close())
+        super().terminate()
+
+    @property
+    def shared_stats(self) -> dict:
+        """Get the statistics of resources shared between all apps.
+
+        Climate's are left out while it isn't running (e.g. while it reloads).
+        """
+        apps = tuple(self.registry.apps.items())
+        stats = {
+            "state_cache": self.state_cache.stats,
+            "service_calls": self.service_calls.stats,
+            "app_registry": self.registry.stats,
+            "plans": {name: app.plans.stats for name, app in apps},
+            "notifications": self.notifications.stats,
+            "dispatchers": {name: app.dispatcher.stats for name, app in apps},
+            "timer_wheels": {name: app.timer_wheel.stats for name, app in apps},
+        }
+        climate = self.climate
+        if climate is not None:
+            stats.update(
+                {
+                    "climate_conditions": climate.condition_stats,
+                    "climate_sensor_changes": climate.sensor_change_stats,
+                    "fan_sequences": climate.fan_sequence_stats,
+                    "thermal_models": climate.thermal_model_stats,
+                },
+            )
+        return stats
+
     def handle_update_available(
         self,
         entity: str,
@@ -635,3 +1043,392 @@ class Control(App):
             title="Update Available",
             targets="dan",
         )
+
+
+class SceneTransition:
+    """A planned scene change for all apps, run as branches at the same time.
+
+    Each branch is a list of steps run in order on one app's worker thread, so
+    branches for different apps run concurrently (e.g. an unavailable climate
+    device doesn't hold up the lights), except for branches that must wait for
+    others to finish. Every step is timed from when the scene was set until the
+    last light's new state is confirmed by Home Assistant.
+    """
+
+    def __init__(self, controller: Control, scene: str, plan: tuple[tuple, ...]):
+        """Start timing a transition to the scene, organising its plan into branches."""
+        self.controller = controller
+        self.scene = scene
+        self.calls_before = controller.service_calls.sent
+        self.branches: dict[str, dict] = {}
+        for branch, app, action, args, kwargs, after in plan:
+            planned = self.branches.setdefault(
+                branch,
+                {"app": app, "steps": [], "after": set()},
+            )
+            planned["steps"].append((action, args, kwargs))
+            planned["after"].update(after)
+        self.started: set[str] = set()
+        self.finished: set[str] = set()
+        self.trace: list[dict] = []
+        self.finished_ms = None
+        self.confirmed_ms = None
+        self.unconfirmed: list[str] = []
+        self.awaiting: dict[Device, list[str]] = {}
+        self.timeout_timer = None
+        self.__start_time = time.perf_counter()
+        self.__lock = threading.Lock()
+
+    @property
+    def elapsed_ms(self) -> float:
+        """Get the milliseconds since the scene was set."""
+        return round((time.perf_counter() - self.__start_time) * 1000, 1)
+
+    @property
+    def superseded(self) -> bool:
+        """Check if another scene has been set since this one."""
+        return self.controller.scene_transition is not self
+
+    def run(self):
+        """Start running every branch that doesn't need to wait for others."""
+        with self.__lock:
+            self.__start_ready_branches()
+
+    def __start_ready_branches(self):
+        """Start running the branches whose prerequisite branches have finished."""
+        for name, branch in self.branches.items():
+            if name not in self.started and (
+                branch["after"] & self.branches.keys() <= self.finished
+            ):
+                self.started.add(name)
+                self.__app(name).run_in(self.__run_branch, 0, branch=name)
+
+    def __app(self, branch: str) -> App:
+        """Get the (current instance of the) app that runs a branch."""
+        return self.controller.registry.get(
+            self.controller,
+            self.branches[branch]["app"],
+        )
+
+    def __run_branch(self, **kwargs: dict):
+        """Run a branch's steps in order (on its app's thread), timing each."""
+        name = kwargs["branch"]
+        if self.superseded:
+            return
+        try:
+            app = self.__app(name)
+            for method, args, action_kwargs in self.branches[name]["steps"]:
+                action = getattr(app, method)
+                start_ms = self.elapsed_ms
+                action(*args, **action_kwargs)
+                self.trace.append(
+                    {
+                        "branch": name,
+                        "step": action.__qualname__,
+                        "start_ms": start_ms,
+                        "duration_ms": round(self.elapsed_ms - start_ms, 1),
+                    },
+                )
+        finally:
+            with self.__lock:
+                self.finished.add(name)
+                self.__start_ready_branches()
+                all_finished = len(self.finished) == len(self.branches)
+            if all_finished:
+                self.controller.run_in(self.__finish, 0)
+
+    def __finish(self, **kwargs: dict):
+        """Sync the scene then wait for Home Assistant to confirm the lights."""
+        del kwargs
+        if self.superseded:
+            return
+        self.controller.finish_scene_transition(self)
+        self.finished_ms = self.elapsed_ms
+        for light in self.controller.lights.lights.values():
+            if light.awaiting_confirmation:
+                self.awaiting[light] = [
+                    self.controller.listen_state(
+                        self.__handle_light_change,
+                        entity_id,
+                        attribute="all",
+                    )
+                    for entity_id in (light.device_id, *light.members)
+                ]
+        if self.awaiting:
+            self.timeout_timer = self.controller.run_in(
+                self.__handle_timeout,
+                Device.command_timeout,
+            )
+        else:
+            self.confirmed_ms = self.finished_ms
+            self.controller.report_transition_trace(self)
+
+    def __handle_light_change(
+        self,
+        entity: str,
+        attribute: str,
+        old: dict,
+        new: dict,
+        **kwargs: dict,
+    ):
+        """Stop waiting for lights now confirmed, reporting when the last one is."""
+        del entity, attribute, old, new, kwargs
+        for light in [
+            light for light in self.awaiting if not light.awaiting_confirmation
+        ]:
+            for handle in self.awaiting.pop(light):
+                self.controller.cancel_listen_state(handle)
+        if not self.awaiting and self.confirmed_ms is None:
+            self.confirmed_ms = self.elapsed_ms
+            self.controller.cancel_timer(self.timeout_timer)
+            self.controller.report_transition_trace(self)
+
+    def __handle_timeout(self, **kwargs: dict):
+        """Report the transition with the lights still unconfirmed."""
+        del kwargs
+        for light, handles in self.awaiting.items():
+            self.unconfirmed.append(light.device_id)
+            for handle in handles:
+                self.controller.cancel_listen_state(handle)
+        self.awaiting = {}
+        self.controller.report_transition_trace(self)
+
+
+class HeartbeatClient:
+    """Keep-alive HTTP client sending heartbeats and recording their latency."""
+
+    latency_buckets = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, url: str, timeout: float):
+        """Prepare to send heartbeats (connecting with the first)."""
+        self.url = url
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.session: aiohttp.ClientSession | None = None
+        self.sent = 0
+        self.received = 0
+        self.total_latency = 0.0
+        self.last_latency: float | None = None
+        self.histogram = [0] * (len(self.latency_buckets) + 1)
+
+    async def send(self) -> float | None:
+        """Send a heartbeat, returning its round trip time (or None if it failed).
+
+        Runs on AppDaemon's event loop (so no worker thread waits on the network),
+        reusing the session's connection from the previous heartbeat.
+        """
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=self.timeout)
+        self.sent += 1
+        start = time.perf_counter()
+        try:
+            async with self.session.get(self.url) as response:
+                response.raise_for_status()
+                await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError, TimeoutError):  # noqa: UP041 - aiohttp raises asyncio's before Python 3.11
+            return None
+        latency = time.perf_counter() - start
+        self.received += 1
+        self.total_latency += latency
+        self.last_latency = latency
+        self.histogram[bisect.bisect_left(self.latency_buckets, latency)] += 1
+        return latency
+
+    async def close(self):
+        """Close the session and its kept-alive connection."""
+        if self.session is not None:
+            await self.session.close()
+
+    @staticmethod
+    def retry_delay(attempt: int, base: float) -> float:
+        """Get the delay before a retry, doubling each attempt, with random jitter."""
+        return base * 2**attempt * random.uniform(0.5, 1.5)  # noqa: S311 - not used for security
+
+    @property
+    def stats(self) -> dict:
+        """Get heartbeat counts and round trip latencies (in milliseconds)."""
+        labels = [f"<={bucket * 1000:g}ms" for bucket in self.latency_buckets]
+        labels.append(f">{self.latency_buckets[-1] * 1000:g}ms")
+        return {
+            "sent": self.sent,
+            "received": self.received,
+            "availability": round(self.received / self.sent, 4) if self.sent else None,
+            "mean_latency_ms": round(self.total_latency * 1000 / self.received, 1)
+            if self.received
+            else None,
+            "last_latency_ms": round(self.last_latency * 1000, 1)
+            if self.last_latency is not None
+            else None,
+            "latency_histogram": dict(zip(labels, self.histogram, strict=True)),
+        }
+
+
+class LogIssueCounter:
+    """Logged warnings and errors, totalled in-process and counted per minute."""
+
+    def __init__(self, window: float = 60 * 60, bucket: float = 60):
+        """Start with nothing logged, counting over the window (in seconds)."""
+        self.window = window
+        self.bucket = bucket
+        self.pending: collections.Counter[str] = collections.Counter()
+        self.buckets: dict[str, collections.deque[list]] = {}
+        self.__lock = threading.Lock()
+
+    def record(self, level: str, now: float):
+        """Count an issue logged at the given time."""
+        start = now - now % self.bucket
+        with self.__lock:
+            self.pending[level] += 1
+            buckets = self.buckets.setdefault(level, collections.deque())
+            if buckets and buckets[-1][0] == start:
+                buckets[-1][1] += 1
+            else:
+                buckets.append([start, 1])
+
+    def take_pending(self) -> collections.Counter[str]:
+        """Get the issues counted since last taken, resetting them."""
+        with self.__lock:
+            pending, self.pending = self.pending, collections.Counter()
+        return pending
+
+    def in_window(self, level: str, now: float) -> int:
+        """Get how many issues were logged in the window up to now (per minute)."""
+        with self.__lock:
+            buckets = self.buckets.get(level)
+            if buckets is None:
+                return 0
+            while buckets and buckets[0][0] + self.bucket <= now - self.window:
+                buckets.popleft()
+            return sum(count for _, count in buckets)
+
+
+class ButtonGestures:
+    """Gesture state machine for a button, acting on every gesture without delay.
+
+    A press runs the single press action straight away (speculatively), keeping the
+    undo it returns. If a second press follows within the double press window (or the
+    button is held down) the single press action has already run, so its undo
+    restores everything it changed before the double (or long) press action runs, in
+    the same callback so that their device commands are merged.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        double_press_window: float,
+        **actions: Callable,
+    ):
+        """Prepare the single, double and long press actions for a named button."""
+        self.name = name
+        self.double_press_window = double_press_window
+        self.actions = actions
+        self.last_press = 0.0
+        self.undo: Callable | None = None
+        self.latencies = {
+            gesture: {"count": 0, "total": 0.0, "max": 0.0} for gesture in actions
+        }
+        self.rolled_back = 0
+
+    def press(self, pressed_at: float, now: float):
+        """Handle a press, as a double press if soon enough after the previous one."""
+        follows_press = now - self.last_press < self.double_press_window
+        self.gesture(
+            "double" if follows_press else "single",
+            pressed_at,
+            now,
+            follows_press=follows_press,
+        )
+
+    def gesture(
+        self,
+        gesture: str,
+        pressed_at: float,
+        now: float,
+        *,
+        follows_press: bool | None = None,
+    ):
+        """Run a gesture's action, first rolling back a single press it follows.
+
+        Whether it follows a press (within the double press window) is worked out
+        from the last press if not given.
+        """
+        start = time.perf_counter()
+        if follows_press is None:
+            follows_press = now - self.last_press < self.double_press_window
+        if gesture != "long":
+            self.last_press = now
+        undo, self.undo = self.undo, None
+        if gesture != "single" and undo is not None and follows_press:
+            self.rolled_back += 1
+            undo()
+        result = self.actions[gesture]()
+        if gesture == "single":
+            self.undo = result
+        latency = now - pressed_at + time.perf_counter() - start
+        stats = self.latencies[gesture]
+        stats["count"] += 1
+        stats["total"] += latency
+        stats["max"] = max(stats["max"], latency)
+
+    @property
+    def stats(self) -> dict:
+        """Get press-to-action latency (in milliseconds) per gesture, and rollbacks."""
+        return {
+            "rolled_back": self.rolled_back,
+            **{
+                gesture: {
+                    "count": stats["count"],
+                    "mean_ms": round(stats["total"] * 1000 / stats["count"], 1),
+                    "max_ms": round(stats["max"] * 1000, 1),
+                }
+                for gesture, stats in self.latencies.items()
+                if stats["count"]
+            },
+        }
+
+
+class ReadinessBarrier:
+    """Apps that must finish initialising before the scene is first set.
+
+    Opens exactly once, as soon as the last of the required apps is ready (or when
+    AppDaemon reports it has started, if that is first), timing each step from when
+    the barrier was created.
+    """
+
+    def __init__(self, required: list[str]):
+        """Start waiting for the required apps."""
+        self.required = frozenset(required)
+        self.ready: dict[str, float] = {}
+        self.opened_ms: float | None = None
+        self.first_scene_ms: float | None = None
+        self.__start_time = time.perf_counter()
+
+    @property
+    def elapsed_ms(self) -> float:
+        """Get the milliseconds since the barrier was created."""
+        return round((time.perf_counter() - self.__start_time) * 1000, 1)
+
+    @property
+    def waiting(self) -> frozenset[str]:
+        """Get the required apps that aren't ready yet."""
+        return self.required - self.ready.keys()
+
+    def mark_ready(self, name: str) -> bool:
+        """Record an app as ready, returning True if that opens the barrier."""
+        self.ready.setdefault(name, self.elapsed_ms)
+        return not self.waiting and self.open()
+
+    def open(self) -> bool:
+        """Open the barrier, returning True only the first time."""
+        if self.opened_ms is not None:
+            return False
+        self.opened_ms = self.elapsed_ms
+        return True
+
+    @property
+    def stats(self) -> dict:
+        """Get when each app was ready and the barrier opened (in milliseconds)."""
+        return {
+            "ready_ms": dict(self.ready),
+            "opened_ms": self.opened_ms,
+            "not_ready": sorted(self.waiting),
+        }
@@ -11,8 +11,28 @@ from __future__ import annotations
 import datetime
 import logging
 
-from app import App
+from app import App, Settings
 from presence import PresenceDevice
+from scenes import scene_when_bright, scene_when_dark
+
+CIRCADIAN = "circadian"
+
+
+def step(light_name: str, method: str, *args, **kwargs: dict) -> tuple:
+    """Get a lighting plan step that calls one of a light's methods."""
+    return (light_name, method, args, kwargs)
+
+
+def plan_off(*light_names: str) -> list[tuple]:
+    """Get the lighting plan steps to turn lights off and keep them off."""
+    return [
+        light_step
+        for light_name in light_names
+        for light_step in (
+            step(light_name, "ignore_vacancy"),
+            step(light_name, "turn_off"),
+        )
+    ]
 
 
 class Lights(App):
@@ -33,6 +53,7 @@ class Lights(App):
             "nursery": None,
         }
         self.auto_off_delay = None
+        self.settings: LightSettings | None = None
 
     def initialize(self):
         """Initialise lights and start listening to scene events.
@@ -40,6 +61,7 @@ class Lights(App):
         Appdaemon defined init function called once ready after __init__.
         """
         super().initialize()
+        self.settings = LightSettings(self)
         self.lights["entryway"] = Light(
             device_id="group.entryway_lights",
             controller=self,
@@ -122,22 +144,61 @@ class Lights(App):
         """Cancel presence callbacks before termination (auto run by Appdaemon)."""
         for light in self.lights.values():
             light.ignore_vacancy()
+        super().terminate()
 
     def transition_to_scene(self, scene: str):
         """Change lighting based on the specified scene."""
         self.cancel_timer(self.circadian["timer"])
+        plan = self.plans.get(
+            self.scene_plan_key(scene),
+            lambda: self.compile_scene_plan(scene),
+        )
+        circadian = None
+        for light_name, method, args, kwargs in plan:
+            if kwargs.get("occupied") == CIRCADIAN:
+                circadian = circadian or self.calculate_circadian_brightness_kelvin()
+                kwargs = {**kwargs, "occupied": circadian}  # noqa: PLW2901
+            getattr(self.lights[light_name], method)(*args, **kwargs)
         if scene == "Night":
             self.start_circadian()
-        elif "Day" in scene:
-            self.transition_to_day_scene()
-        elif scene == "Away (Night)":
-            self.transition_to_away_night_scene()
-        else:
-            getattr(self, f"transition_to_{scene.lower()}_scene")()
+        elif scene == "Away (Night)" and any(
+            light.on and not light.control_enabled for light in self.lights.values()
+        ):
+            self.notify(
+                "Some lights are still on because their automatic control was disabled "
+                "- enable control or turn off manually if required",
+                title="Light Control",
+            )
         self.log(f"Light scene changed to '{scene}'")
 
-    def transition_to_day_scene(self):
-        """Configure lighting for the day scene."""
+    def scene_plan_key(self, scene: str) -> tuple:
+        """Get everything a scene's lighting plan is compiled from (besides scene)."""
+        return (
+            scene,
+            self.control.napping_in("bedroom"),
+            self.control.napping_in("nursery"),
+            self.is_lighting_sufficient("bedroom"),
+            self.is_lighting_sufficient("nursery"),
+            self.now_is_between("12:00:00", "23:59:59"),
+            self.settings.version,
+        )
+
+    def compile_scene_plan(self, scene: str) -> tuple[tuple, ...]:
+        """Compile the steps configuring each light for a scene.
+
+        Steps are (light name, method, args, kwargs), with circadian lighting
+        levels calculated when the plan is run rather than compiled.
+        """
+        if scene == "Night":
+            return ()
+        if "Day" in scene:
+            return tuple(self.plan_day_scene())
+        if scene == "Away (Night)":
+            return tuple(self.plan_away_night_scene())
+        return tuple(getattr(self, f"plan_{scene.lower()}_scene")())
+
+    def plan_day_scene(self) -> list[tuple]:
+        """Plan lighting for the day scene."""
         light_names = ["office", "bathroom"]
         light_names.extend(
             light_name
@@ -145,8 +206,10 @@ class Lights(App):
             if not self.is_lighting_sufficient(light_name)
             and not self.control.napping_in(light_name)
         )
-        for light_name in light_names:
-            self.lights[light_name].set_presence_adjustments(
+        plan = [
+            step(
+                light_name,
+                "set_presence_adjustments",
                 occupied=(
                     self.constants["max_brightness"],
                     self.lights[light_name].kelvin_limits["max"],
@@ -155,68 +218,86 @@ class Lights(App):
                 # TODO: https://app.asana.com/0/1207020279479204/1207237490859329/f
                 # this is always? the same, don't pass as an argument
             )
-        for light_name in (
-            "entryway",
-            "kitchen",
-            "kitchen_strip",
-            "tv",
-            "dining_room",
-            "hall",
-        ):
-            self.lights[light_name].ignore_vacancy()
-            self.lights[light_name].turn_off()
+            for light_name in light_names
+        ]
+        plan.extend(
+            plan_off(
+                "entryway",
+                "kitchen",
+                "kitchen_strip",
+                "tv",
+                "dining_room",
+                "hall",
+            ),
+        )
+        return plan
 
-    def transition_to_bright_scene(self):
-        """Configure lighting for the bright scene."""
-        for light in self.lights.values():
-            light.ignore_vacancy()
-            light.adjust_to_max()
+    def plan_bright_scene(self) -> list[tuple]:
+        """Plan lighting for the bright scene."""
+        return [
+            light_step
+            for light_name in self.lights
+            for light_step in (
+                step(light_name, "ignore_vacancy"),
+                step(light_name, "adjust_to_max"),
+            )
+        ]
 
-    def transition_to_tv_scene(self):
-        """Configure lighting for the tv scene."""
-        kelvin = self.get_setting("tv_kelvin")
-        self.lights["entryway"].set_presence_adjustments(
-            occupied=(
-                self.get_setting("tv_motion_brightness"),
-                kelvin,
+    def plan_tv_scene(self) -> list[tuple]:
+        """Plan lighting for the tv scene."""
+        kelvin = self.settings.tv_kelvin
+        plan = [
+            step(
+                "entryway",
+                "set_presence_adjustments",
+                occupied=(self.settings.tv_motion_brightness, kelvin),
             ),
-        )
-        self.lights["kitchen"].set_presence_adjustments(
-            vacant=(self.get_setting("tv_brightness"), kelvin),
-            entered=(self.get_setting("tv_motion_brightness"), kelvin),
-            occupied=(
-                self.constants["max_brightness"],
-                self.lights["kitchen"].kelvin_limits["max"],
+            step(
+                "kitchen",
+                "set_presence_adjustments",
+                vacant=(self.settings.tv_brightness, kelvin),
+                entered=(self.settings.tv_motion_brightness, kelvin),
+                occupied=(
+                    self.constants["max_brightness"],
+                    self.lights["kitchen"].kelvin_limits["max"],
+                ),
+                transition_period=self.settings.tv_transition_period,
+                vacating_delay=self.settings.tv_vacating_delay,
             ),
-            transition_period=self.get_setting("tv_transition_period"),
-            vacating_delay=self.get_setting("tv_vacating_delay"),
-        )
-        self.lights["kitchen_strip"].set_presence_adjustments(
-            entered=(self.get_setting("tv_motion_brightness"), kelvin),
-            occupied=(
-                self.constants["max_brightness"],
-                self.lights["kitchen_strip"].kelvin_limits["max"],
+            step(
+                "kitchen_strip",
+                "set_presence_adjustments",
+                entered=(self.settings.tv_motion_brightness, kelvin),
+                occupied=(
+                    self.constants["max_brightness"],
+                    self.lights["kitchen_strip"].kelvin_limits["max"],
+                ),
+                transition_period=self.settings.tv_transition_period,
+                vacating_delay=self.settings.tv_vacating_delay,
             ),
-            transition_period=self.get_setting("tv_transition_period"),
-            vacating_delay=self.get_setting("tv_vacating_delay"),
-        )
+        ]
         light_names = ["tv"]
         if self.control.napping_in_bedroom or self.control.napping_in_nursery:
-            self.lights["hall"].turn_off()
+            plan.append(step("hall", "turn_off"))
         else:
-            light_names.extend("hall")
-        for light_name in light_names:
-            self.lights[light_name].adjust(self.get_setting("tv_brightness"), kelvin)
-        self.lights["dining_room"].set_presence_adjustments(
-            entered=(self.get_setting("tv_motion_brightness"), kelvin),
-            occupied=(
-                self.constants["max_brightness"],
-                self.lights["dining_room"].kelvin_limits["max"],
+            light_names.append("hall")
+        plan.extend(
+            step(light_name, "adjust", self.settings.tv_brightness, kelvin)
+            for light_name in light_names
+        )
+        plan.append(
+            step(
+                "dining_room",
+                "set_presence_adjustments",
+                entered=(self.settings.tv_motion_brightness, kelvin),
+                occupied=(
+                    self.constants["max_brightness"],
+                    self.lights["dining_room"].kelvin_limits["max"],
+                ),
+                transition_period=self.settings.tv_transition_period,
+                vacating_delay=self.settings.tv_vacating_delay,
             ),
-            transition_period=self.get_setting("tv_transition_period"),
-            vacating_delay=self.get_setting("tv_vacating_delay"),
         )
-        brightness, kelvin = self.calculate_circadian_brightness_kelvin()
         light_names = ["office", "bathroom"]
         light_names.extend(
             light_name
@@ -224,115 +305,123 @@ class Lights(App):
             if not self.is_lighting_sufficient(light_name)
             and not self.control.napping_in(light_name)
         )
-        for light_name in light_names:
-            self.lights[light_name].set_presence_adjustments(
-                occupied=(
-                    brightness,
-                    kelvin,
-                ),
+        plan.extend(
+            step(
+                light_name,
+                "set_presence_adjustments",
+                occupied=CIRCADIAN,
                 vacating_delay=self.get_setting(f"{light_name}_vacating_delay"),
             )
+            for light_name in light_names
+        )
+        return plan
 
-    def transition_to_sleep_scene(self):
-        """Configure lighting for the sleep scene."""
-        for light_name in ("entryway", "kitchen"):
-            self.lights[light_name].set_presence_adjustments(
+    def plan_sleep_scene(self) -> list[tuple]:
+        """Plan lighting for the sleep scene."""
+        plan = [
+            step(
+                light_name,
+                "set_presence_adjustments",
                 entered=(
                     self.lights[light_name].minimum_brightness,
                     self.lights[light_name].kelvin_limits["min"],
                 ),
                 occupied=(
-                    self.get_setting("sleep_motion_brightness"),
-                    self.get_setting("sleep_motion_kelvin"),
+                    self.settings.sleep_motion_brightness,
+                    self.settings.sleep_motion_kelvin,
                 ),
-                transition_period=self.get_setting(
-                    "sleep_transition_period",
-                ),
-                vacating_delay=self.get_setting("sleep_vacating_delay"),
+                transition_period=self.settings.sleep_transition_period,
+                vacating_delay=self.settings.sleep_vacating_delay,
             )
-        for light_name in ("office", "bathroom"):
-            self.lights[light_name].set_presence_adjustments(
+            for light_name in ("entryway", "kitchen")
+        ]
+        plan.extend(
+            step(
+                light_name,
+                "set_presence_adjustments",
                 occupied=(
                     self.lights[light_name].minimum_brightness,
                     self.lights[light_name].kelvin_limits["min"],
                 ),
-                vacating_delay=self.get_setting(
-                    "sleep_vacating_delay",
-                ),
+                vacating_delay=self.settings.sleep_vacating_delay,
             )
-        for light_name in (
-            "kitchen_strip",
-            "tv",
-            "dining_room",
-            "hall",
-            "bedroom",
-            "nursery",
-        ):
-            self.lights[light_name].ignore_vacancy()
-            self.lights[light_name].turn_off()
-
-    def transition_to_morning_scene(self):
-        """Configure lighting for the morning scene."""
-        brightness = self.get_setting("morning_brightness")
-        kelvin = self.get_setting("morning_kelvin")
-        vacating_delay = self.get_setting("morning_vacating_delay")
-        self.lights["kitchen"].set_presence_adjustments(
-            vacant=(brightness, kelvin),
-            occupied=(self.constants["max_brightness"], kelvin),
-            vacating_delay=vacating_delay,
+            for light_name in ("office", "bathroom")
         )
-        self.lights["kitchen_strip"].set_presence_adjustments(
-            occupied=(self.constants["max_brightness"], kelvin),
-            vacating_delay=vacating_delay,
-        )
-        self.lights["office"].set_presence_adjustments(
-            occupied=(brightness, kelvin),
-            vacating_delay=self.get_setting("office_vacating_delay"),
+        plan.extend(
+            plan_off(
+                "kitchen_strip",
+                "tv",
+                "dining_room",
+                "hall",
+                "bedroom",
+                "nursery",
+            ),
         )
-        for light_name in ("tv", "dining_room", "bathroom", "entryway"):
-            self.lights[light_name].set_presence_adjustments(
-                occupied=(brightness, kelvin),
+        return plan
+
+    def plan_morning_scene(self) -> list[tuple]:
+        """Plan lighting for the morning scene."""
+        brightness = self.settings.morning_brightness
+        kelvin = self.settings.morning_kelvin
+        vacating_delay = self.settings.morning_vacating_delay
+        plan = [
+            step(
+                "kitchen",
+                "set_presence_adjustments",
+                vacant=(brightness, kelvin),
+                occupied=(self.constants["max_brightness"], kelvin),
                 vacating_delay=vacating_delay,
-            )
+            ),
+            step(
+                "kitchen_strip",
+                "set_presence_adjustments",
+                occupied=(self.constants["max_brightness"], kelvin),
+                vacating_delay=vacating_delay,
+            ),
+            step(
+                "office",
+                "set_presence_adjustments",
+                occupied=(brightness, kelvin),
+                vacating_delay=self.settings.office_vacating_delay,
+            ),
+        ]
+        light_names = ["tv", "dining_room", "bathroom", "entryway"]
         if not self.is_lighting_sufficient("nursery") and not self.control.napping_in(
             "nursery",
         ):
-            self.lights["nursery"].set_presence_adjustments(
+            light_names.append("nursery")
+        plan.extend(
+            step(
+                light_name,
+                "set_presence_adjustments",
                 occupied=(brightness, kelvin),
                 vacating_delay=vacating_delay,
             )
-        for light_name in ("hall", "bedroom"):
-            self.lights[light_name].ignore_vacancy()
-            self.lights[light_name].turn_off()
+            for light_name in light_names
+        )
+        plan.extend(plan_off("hall", "bedroom"))
+        return plan
 
-    def transition_to_away_night_scene(self):
-        """Configure lighting for the Away (Night) scene."""
-        for light_name in ("entryway", "kitchen", "office", "bathroom"):
-            self.lights[light_name].set_presence_adjustments(
+    def plan_away_night_scene(self) -> list[tuple]:
+        """Plan lighting for the Away (Night) scene."""
+        plan = [
+            step(
+                light_name,
+                "set_presence_adjustments",
                 occupied=(
                     self.constants["max_brightness"],
                     self.lights[light_name].kelvin_limits["max"],
                 ),
-                vacating_delay=float(
-                    self.entities.input_number.night_vacating_delay.state,
-                ),
+                vacating_delay=self.settings.night_vacating_delay,
             )
+            for light_name in ("entryway", "kitchen", "office", "bathroom")
+        ]
         if self.now_is_between("12:00:00", "23:59:59"):
-            self.lights["dining_room"].adjust_to_max()
+            plan.append(step("dining_room", "adjust_to_max"))
         else:
-            self.lights["dining_room"].ignore_vacancy()
-            self.lights["dining_room"].turn_off()
-        for light_name in ("kitchen_strip", "tv", "hall", "bedroom", "nursery"):
-            self.lights[light_name].ignore_vacancy()
-            self.lights[light_name].turn_off()
-        if any(
-            light.on and not light.control_enabled for light in self.lights.values()
-        ):
-            self.notify(
-                "Some lights are still on because their automatic control was disabled "
-                "- enable control or turn off manually if required",
-                title="Light Control",
-            )
+            plan.extend(plan_off("dining_room"))
+        plan.extend(plan_off("kitchen_strip", "tv", "hall", "bedroom", "nursery"))
+        return plan
 
     def start_circadian(self):
         """Schedule a timer to periodically set the lighting appropriately."""
@@ -370,32 +459,32 @@ class Lights(App):
         )
         self.lights["entryway"].set_presence_adjustments(
             occupied=(brightness, kelvin),
-            vacating_delay=self.get_setting("night_vacating_delay"),
+            vacating_delay=self.settings.night_vacating_delay,
         )
         for light_name in ("kitchen", "dining_room"):
             self.lights[light_name].set_presence_adjustments(
                 vacant=(brightness, kelvin),
                 entered=(
-                    max(brightness, self.get_setting("night_motion_brightness")),
+                    max(brightness, self.settings.night_motion_brightness),
                     kelvin,
                 ),
                 occupied=(
                     self.constants["max_brightness"],
-                    self.get_setting("night_motion_kelvin"),
+                    self.settings.night_motion_kelvin,
                 ),
-                transition_period=self.get_setting("night_transition_period"),
-                vacating_delay=self.get_setting("night_vacating_delay"),
+                transition_period=self.settings.night_transition_period,
+                vacating_delay=self.settings.night_vacating_delay,
             )
         self.lights["kitchen_strip"].set_presence_adjustments(
             entered=(brightness, kelvin)
-            if brightness >= self.get_setting("night_motion_brightness")
-            else (self.get_setting("night_motion_brightness"), kelvin),
+            if brightness >= self.settings.night_motion_brightness
+            else (self.settings.night_motion_brightness, kelvin),
             occupied=(
                 self.constants["max_brightness"],
-                self.get_setting("night_motion_kelvin"),
+                self.settings.night_motion_kelvin,
             ),
-            transition_period=self.get_setting("night_transition_period"),
-            vacating_delay=self.get_setting("night_vacating_delay"),
+            transition_period=self.settings.night_transition_period,
+            vacating_delay=self.settings.night_vacating_delay,
         )
         self.lights["tv"].adjust(brightness, kelvin)
         if self.control.napping_in_bedroom or self.control.napping_in_nursery:
@@ -404,21 +493,21 @@ class Lights(App):
             self.lights["hall"].adjust(brightness, kelvin)
         self.lights["office"].set_presence_adjustments(
             occupied=(brightness, kelvin),
-            vacating_delay=self.get_setting("office_vacating_delay"),
+            vacating_delay=self.settings.office_vacating_delay,
         )
         self.lights["bathroom"].set_presence_adjustments(
             occupied=(brightness, kelvin),
-            vacating_delay=self.get_setting("night_vacating_delay"),
+            vacating_delay=self.settings.night_vacating_delay,
         )
         if not self.control.napping_in_bedroom:
             self.lights["bedroom"].set_presence_adjustments(
                 occupied=(brightness, kelvin),
-                vacating_delay=self.get_setting("night_vacating_delay"),
+                vacating_delay=self.settings.night_vacating_delay,
             )
         if not self.control.napping_in_nursery:
             self.lights["nursery"].set_presence_adjustments(
                 occupied=(brightness, kelvin),
-                vacating_delay=self.get_setting("night_vacating_delay"),
+                vacating_delay=self.settings.night_vacating_delay,
             )
         self.log(
             "Adjusted lighting based on circadian progression to "
@@ -457,20 +546,18 @@ class Lights(App):
             circadian_progress = self.circadian_progress
         return (
             int(
-                float(self.entities.input_number.initial_circadian_brightness.state)
+                self.settings.initial_circadian_brightness
                 + (
-                    float(self.entities.input_number.final_circadian_brightness.state)
-                    - float(
-                        self.entities.input_number.initial_circadian_brightness.state,
-                    )
+                    self.settings.final_circadian_brightness
+                    - self.settings.initial_circadian_brightness
                 )
                 * circadian_progress,
             ),
             int(
-                float(self.entities.input_number.initial_circadian_kelvin.state)
+                self.settings.initial_circadian_kelvin
                 + (
-                    float(self.entities.input_number.final_circadian_kelvin.state)
-                    - float(self.entities.input_number.initial_circadian_kelvin.state)
+                    self.settings.final_circadian_kelvin
+                    - self.settings.initial_circadian_kelvin
                 )
                 * circadian_progress,
             ),
@@ -492,13 +579,13 @@ class Lights(App):
         )
         time_step = (end_time - start_time) / max(
             abs(
-                float(self.entities.input_number.initial_circadian_brightness.state)
-                - float(self.entities.input_number.final_circadian_brightness.state),
+                self.settings.initial_circadian_brightness
+                - self.settings.final_circadian_brightness,
             )
             / self.constants["brightness_per_step"],
             abs(
-                float(self.entities.input_number.initial_circadian_kelvin.state)
-                - float(self.entities.input_number.final_circadian_kelvin.state),
+                self.settings.initial_circadian_kelvin
+                - self.settings.final_circadian_kelvin,
             )
             / self.constants["kelvin_per_step"],
         )
@@ -524,7 +611,7 @@ class Lights(App):
     def is_lighting_sufficient(self, room: str) -> bool:
         """Return if there is enough light to not require further lighting."""
         return (
-            float(self.get_state(f"sensor.{room}_presence_sensor_illuminance"))
+            float(self.get_state_value(f"sensor.{room}_presence_sensor_illuminance"))
             - self.lighting_illuminance(room)
             >= self.constants["illuminance"]["auto_threshold"][room]
         )
@@ -552,14 +639,10 @@ class Lights(App):
     ):
         """Change scene appropriately for low outside light levels."""
         del entity, attribute, old, new, kwargs
-        if "Day" in self.control.scene:
+        scene = scene_when_dark(self.control.scene, self.control.house_snapshot())
+        if scene is not None:
             self.log("It is now dark outside - changing scene accordingly")
-            if self.media.playing:
-                self.control.scene = "TV"
-            elif self.presence.anyone_home:
-                self.control.scene = "Night"
-            else:
-                self.control.scene = "Away (Night)"
+            self.control.scene = scene
 
     def handle_bright_outside(
         self,
@@ -571,15 +654,10 @@ class Lights(App):
     ):
         """Change scene appropriately for high outside light levels."""
         del entity, attribute, old, new, kwargs
-        if self.control.scene not in (
-            "Bright",
-            "Sleep",
-            "Morning",
-            "Day",
-            "Away (Day)",
-        ):
+        scene = scene_when_bright(self.control.scene, self.control.house_snapshot())
+        if scene is not None:
             self.log("It is now bright outside - changing scene accordingly")
-            self.control.scene = "Day" if self.presence.anyone_home else "Away (Day)"
+            self.control.scene = scene
 
     def handle_kitchen_illuminance_change(
         self,
@@ -624,9 +702,7 @@ class Lights(App):
                             self.constants["max_brightness"],
                             self.lights[light_name].kelvin_limits["max"],
                         ),
-                        vacating_delay=self.get_setting(
-                            "morning_vacating_delay",
-                        ),
+                        vacating_delay=self.settings.morning_vacating_delay,
                     )
                 self.log(
                     f"The 'kitchen' light level is low ({new}lx), "
@@ -715,9 +791,8 @@ class Lights(App):
                 )
 
     def get_setting(self, setting_name: str) -> int:
-        """Get a UI input_number setting values as an integer."""
-        return int(float(self.get_state(f"input_number.{setting_name}")))
-        # TODO: better to be explicit, replace this method when refactoring this app
+        """Get a lighting setting by name (for settings named per light or scene)."""
+        return getattr(self.settings, setting_name)
 
     @property
     def lights(self) -> Lights:
@@ -769,18 +844,16 @@ class Light(PresenceDevice):
         if not self.control_enabled:
             return
         value = self.validate_brightness(value)
-        if self.brightness == value:
-            return
-        if value != 0:
-            if self.controller.logger.isEnabledFor(logging.DEBUG):
-                self.controller.log(
-                    f"Setting '{self.device_id}' brightness to {value} "
-                    f"(from {self.brightness})",
-                    level="DEBUG",
-                )
-            self.turn_on(brightness=value)
-        else:
+        if value == 0:
             self.turn_off()
+        elif self.reconcile(state="on", brightness=value) and (
+            self.controller.logger.isEnabledFor(logging.DEBUG)
+        ):
+            self.controller.log(
+                f"Setting '{self.device_id}' brightness to {value} "
+                f"(from {self.brightness})",
+                level="DEBUG",
+            )
 
     def validate_brightness(self, value: int) -> int:
         """Return closest valid value for brightness."""
@@ -802,14 +875,15 @@ class Light(PresenceDevice):
         if not self.control_enabled:
             return
         value = self.validate_kelvin(value)
-        if value is None or value == self.kelvin:
+        if value is None:
             return
-        if self.controller.logger.isEnabledFor(logging.DEBUG):
+        if self.reconcile(state="on", color_temp_kelvin=value) and (
+            self.controller.logger.isEnabledFor(logging.DEBUG)
+        ):
             self.controller.log(
                 f"Setting {self.device_id}'s kelvin to {value} (from {self.kelvin})",
                 level="DEBUG",
             )
-        self.turn_on(color_temp_kelvin=value)
 
     def validate_kelvin(self, value: int) -> int | None:
         """Return closest valid value for kelvin."""
@@ -836,12 +910,7 @@ class Light(PresenceDevice):
                     f"(from {self.brightness} and {self.kelvin})",
                     level="DEBUG",
                 )
-            if kelvin is None or kelvin == self.kelvin:
-                self.brightness = brightness
-            elif brightness == self.brightness:
-                self.kelvin = kelvin
-            else:
-                self.turn_on(brightness=brightness, color_temp_kelvin=kelvin)
+            self.reconcile(state="on", brightness=brightness, color_temp_kelvin=kelvin)
 
     def adjust_to_max(self):
         """Adjust light brightness and kelvin at the same time to maximum values."""
@@ -856,7 +925,9 @@ class Light(PresenceDevice):
 
     def turn_off(self):
         """Turn light off and record previous kelvin level."""
-        if self.control_enabled and self.brightness != 0:
+        if not self.control_enabled:
+            return
+        if self.brightness != 0:
             self.kelvin_before_off = self.kelvin
             if self.controller.logger.isEnabledFor(logging.DEBUG):
                 self.controller.log(
@@ -864,7 +935,7 @@ class Light(PresenceDevice):
                     f" {self.brightness} brightness and {self.kelvin} kelvin)",
                     level="DEBUG",
                 )
-            super().turn_off()
+        super().turn_off()
 
     def set_presence_adjustments(
         self,
@@ -980,3 +1051,34 @@ class Light(PresenceDevice):
                 - kwargs["kelvin_step"] * steps_remaining,
             )
         super().transition_towards_occupied(**kwargs)
+
+
+class LightSettings(Settings):
+    """Brightness, kelvin, transition periods and vacating delays, as integers."""
+
+    number_type = int
+
+    bathroom_vacating_delay: int
+    bedroom_vacating_delay: int
+    final_circadian_brightness: int
+    final_circadian_kelvin: int
+    initial_circadian_brightness: int
+    initial_circadian_kelvin: int
+    morning_brightness: int
+    morning_kelvin: int
+    morning_vacating_delay: int
+    night_motion_brightness: int
+    night_motion_kelvin: int
+    night_transition_period: int
+    night_vacating_delay: int
+    nursery_vacating_delay: int
+    office_vacating_delay: int
+    sleep_motion_brightness: int
+    sleep_motion_kelvin: int
+    sleep_transition_period: int
+    sleep_vacating_delay: int
+    tv_brightness: int
+    tv_kelvin: int
+    tv_motion_brightness: int
+    tv_transition_period: int
+    tv_vacating_delay: int
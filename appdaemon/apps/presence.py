@@ -339,7 +339,7 @@ class Room:
                 level="DEBUG",
             )
         for handle, callback in list(self.callbacks.items()):
-            self.controller.cancel_timer(callback["timer_handle"])
+            self.controller.timer_wheel.cancel(callback["timer_handle"])
             if not vacant or callback["vacating_delay"] == 0:
                 callback["callback"]()
                 self.controller.log(
@@ -347,10 +347,12 @@ class Room:
                     level="DEBUG",
                 )
             else:
-                self.callbacks[handle]["timer_handle"] = self.controller.run_in(
-                    callback["callback"],
-                    callback["vacating_delay"],
-                    constrain_input_boolean=callback["control_input_boolean"],
+                self.callbacks[handle]["timer_handle"] = (
+                    self.controller.timer_wheel.run_in(
+                        callback["callback"],
+                        callback["vacating_delay"],
+                        constrain_input_boolean=callback["control_input_boolean"],
+                    )
                 )
                 self.controller.log(
                     f"Set vacation timer for callback: {handle}",
@@ -378,7 +380,7 @@ class Room:
             "control_input_boolean": control_input_boolean,
         }
         if 0 < -1 * self.seconds_in_room() < vacating_delay:
-            self.callbacks[handle]["timer_handle"] = self.controller.run_in(
+            self.callbacks[handle]["timer_handle"] = self.controller.timer_wheel.run_in(
                 callback,
                 vacating_delay + self.seconds_in_room(),
                 constrain_input_boolean=control_input_boolean,
@@ -392,7 +394,7 @@ class Room:
     def cancel_callback(self, handle):
         """Cancel a callback (and its timer if it has one) by passing its handle."""
         if handle in self.callbacks:
-            self.controller.cancel_timer(self.callbacks[handle]["timer_handle"])
+            self.controller.timer_wheel.cancel(self.callbacks[handle]["timer_handle"])
             del self.callbacks[handle]
 
 
@@ -508,7 +510,7 @@ class PresenceDevice(Device):
         if step_time == 0 or steps_remaining == 0 or kwargs is None:
             return
         self.transition_timer = uuid.uuid4().hex
-        self.controller.run_in(
+        self.controller.timer_wheel.run_in(
             self.transition_towards_occupied,
             step_time,
             step_time=step_time,
@@ -544,7 +546,7 @@ class PresenceDevice(Device):
                     "transition to occupied state is complete",
                     level="DEBUG",
                 )
-            self.controller.run_in(
+            self.controller.timer_wheel.run_in(
                 self.transition_towards_occupied,
                 kwargs["step_time"],
                 **kwargs,
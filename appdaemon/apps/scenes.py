@@ -0,0 +1,65 @@
+"""Scene decisions, as pure functions of a snapshot of the house's state.
+
+Kept free of AppDaemon so the same decisions the apps make can be evaluated
+offline (e.g. by the simulation's backtester) against recorded history.
+"""
+
+from __future__ import annotations
+
+KEPT_WHEN_BRIGHT = ("Bright", "Sleep", "Morning", "Day", "Away (Day)")
+
+
+class HouseSnapshot:
+    """The state of the house that scenes are chosen from."""
+
+    def __init__(
+        self,
+        *,
+        anyone_home: bool,
+        guest_mode: bool,
+        dark_outside: bool,
+        tv_playing: bool,
+        morning: bool,
+    ):
+        """Snapshot the state (morning is if it's between morning and day time)."""
+        self.anyone_home = anyone_home
+        self.guest_mode = guest_mode
+        self.dark_outside = dark_outside
+        self.tv_playing = tv_playing
+        self.morning = morning
+
+
+def choose_scene(
+    current: str,
+    house: HouseSnapshot,
+    *,
+    keep_bright: bool = False,
+) -> str:
+    """Choose the scene for who's home, the light outside, the TV and the time."""
+    if keep_bright and current == "Bright":
+        return "Bright"
+    if not house.anyone_home and not house.guest_mode:
+        return "Away (Night)" if house.dark_outside else "Away (Day)"
+    if not house.dark_outside:
+        return "Day"
+    if house.tv_playing:
+        return "TV"
+    if current in ("Morning", "Sleep"):
+        return "Morning" if house.morning else "Sleep"
+    return "Night"
+
+
+def scene_when_dark(current: str, house: HouseSnapshot) -> str | None:
+    """Choose the scene to change to as it gets dark outside (None to keep it)."""
+    if "Day" not in current:
+        return None
+    if house.tv_playing:
+        return "TV"
+    return "Night" if house.anyone_home else "Away (Night)"
+
+
+def scene_when_bright(current: str, house: HouseSnapshot) -> str | None:
+    """Choose the scene to change to once it is bright outside (None to keep it)."""
+    if current in KEPT_WHEN_BRIGHT:
+        return None
+    return "Day" if house.anyone_home else "Away (Day)"
@@ -0,0 +1,188 @@
+"""First-order thermal models of rooms, fitted online by recursive least squares.
+
+Kept free of AppDaemon (like climate_kernel.py) so fitted models can be inspected
+or replayed offline. A room's temperature is modelled as relaxing towards an
+equilibrium that follows outside (partly, as rooms also exchange heat with the rest
+of the house), pushed up while heating and down while cooling, with a constant
+drift for gains such as people, appliances and sun:
+
+    dT/dt = outside_gain * outside - loss * T + heating_gain * heating
+            + cooling_gain * cooling + drift
+
+Each reading updates the five parameters in constant time (no history is kept),
+with older readings slowly forgotten so the model follows the seasons.
+"""
+
+from __future__ import annotations
+
+import math
+
+PARAMETERS = ("loss", "outside_gain", "heating_gain", "cooling_gain", "drift")
+FORGETTING = 0.999  # weight kept by each reading per new reading
+INITIAL_COVARIANCE = 100.0
+MAX_COVARIANCE = 1e4  # stop forgetting when this uncertain (prevents wind-up)
+MAX_GAP = 60 * 60  # seconds between readings beyond which the change isn't used
+MIN_LOSS = 1e-3  # per hour, below which the room is treated as not losing heat
+
+
+class ThermalModel:
+    """A room's thermal model, updated with each temperature reading."""
+
+    def __init__(
+        self,
+        parameters: list[float] | None = None,
+        covariance: list[list[float]] | None = None,
+        updates: int = 0,
+        squared_error: float = 0.0,
+    ):
+        """Start from fitted parameters (or an uninformed model if none)."""
+        self.parameters = list(parameters or [0.0] * len(PARAMETERS))
+        self.covariance = [
+            list(row)
+            for row in covariance
+            or (
+                [INITIAL_COVARIANCE if i == j else 0.0 for j in range(len(PARAMETERS))]
+                for i in range(len(PARAMETERS))
+            )
+        ]
+        self.updates = updates
+        self.squared_error = squared_error
+        self.last_reading: tuple[float, float, float, bool, bool] | None = None
+
+    @classmethod
+    def from_dict(cls, saved: dict | None) -> ThermalModel:
+        """Restore a model saved with to_dict (or start a new one if none)."""
+        if not saved:
+            return cls()
+        return cls(
+            saved["parameters"],
+            saved["covariance"],
+            saved["updates"],
+            saved["squared_error"],
+        )
+
+    def to_dict(self) -> dict:
+        """Get the fitted model as JSON serialisable values (see from_dict)."""
+        return {
+            "parameters": self.parameters,
+            "covariance": self.covariance,
+            "updates": self.updates,
+            "squared_error": self.squared_error,
+        }
+
+    @property
+    def stats(self) -> dict:
+        """Get the fitted parameters (per hour) and how well they predict readings."""
+        loss, outside_gain, heating_gain, cooling_gain, drift = self.parameters
+        return {
+            "updates": self.updates,
+            "time_constant_hours": round(1 / loss, 2) if loss > MIN_LOSS else None,
+            "outside_gain": round(outside_gain, 3),
+            "heating_gain": round(heating_gain, 3),
+            "cooling_gain": round(cooling_gain, 3),
+            "drift": round(drift, 3),
+            "rms_error": round(math.sqrt(self.squared_error), 3),
+        }
+
+    def fitted(self, min_updates: int) -> bool:
+        """Check the model has had enough readings (and is physical) to predict."""
+        return self.updates >= min_updates and self.parameters[0] > MIN_LOSS
+
+    def observe(
+        self,
+        timestamp: float,
+        temperature: float,
+        outside: float,
+        *,
+        heating: bool,
+        cooling: bool,
+    ):
+        """Fit the change since the last reading, then keep this one for the next."""
+        if self.last_reading is not None:
+            last_timestamp, last_temperature, last_outside, was_heating, was_cooling = (
+                self.last_reading
+            )
+            hours = (timestamp - last_timestamp) / 3600
+            if hours <= 0:  # another sensor of the room at the same time
+                timestamp = last_timestamp
+            elif hours <= MAX_GAP / 3600:
+                self.update(
+                    [
+                        -last_temperature * hours,
+                        last_outside * hours,
+                        was_heating * hours,
+                        was_cooling * hours,
+                        hours,
+                    ],
+                    temperature - last_temperature,
+                )
+        self.last_reading = (timestamp, temperature, outside, heating, cooling)
+
+    def update(self, regressors: list[float], change: float):
+        """Update the parameters with one observed temperature change."""
+        spread = [
+            sum(row[j] * regressors[j] for j in range(len(regressors)))
+            for row in self.covariance
+        ]
+        gain_scale = FORGETTING + sum(
+            regressor * spread_
+            for regressor, spread_ in zip(regressors, spread, strict=True)
+        )
+        error = change - sum(
+            parameter * regressor
+            for parameter, regressor in zip(self.parameters, regressors, strict=True)
+        )
+        gains = [spread_ / gain_scale for spread_ in spread]
+        self.parameters = [
+            parameter + gain * error
+            for parameter, gain in zip(self.parameters, gains, strict=True)
+        ]
+        forgetting = (
+            FORGETTING
+            if sum(self.covariance[i][i] for i in range(len(regressors)))
+            < MAX_COVARIANCE
+            else 1.0
+        )
+        self.covariance = [
+            [
+                (self.covariance[i][j] - gains[i] * spread[j]) / forgetting
+                for j in range(len(regressors))
+            ]
+            for i in range(len(regressors))
+        ]
+        self.updates += 1
+        self.squared_error += (error**2 - self.squared_error) / min(self.updates, 100)
+
+    def seconds_until(
+        self,
+        threshold: float,
+        temperature: float,
+        outside: float,
+        *,
+        heating: bool,
+        cooling: bool,
+    ) -> float | None:
+        """Predict the seconds until the room reaches a temperature (None if never)."""
+        loss, outside_gain, heating_gain, cooling_gain, drift = self.parameters
+        forcing = (
+            outside_gain * outside
+            + heating_gain * heating
+            + cooling_gain * cooling
+            + drift
+        )
+        if threshold == temperature:
+            return 0.0
+        if loss > MIN_LOSS:
+            equilibrium = forcing / loss
+            low, high = sorted((temperature, equilibrium))
+            if not low < threshold < high:
+                return None
+            hours = (
+                math.log((temperature - equilibrium) / (threshold - equilibrium)) / loss
+            )
+        else:
+            rate = forcing - loss * temperature
+            if rate == 0 or (threshold - temperature) / rate <= 0:
+                return None
+            hours = (threshold - temperature) / rate
+        return hours * 3600
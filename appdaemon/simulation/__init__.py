@@ -0,0 +1,30 @@
+"""Offline stand-in for AppDaemon and Home Assistant, to simulate the whole house.
+
+Runs all the apps together against an in-memory Home Assistant (state machine,
+event bus and service call recorder) on a virtual clock, with a simulated
+household driving sensor changes, so the apps can be exercised and benchmarked
+much faster than real time without a live Home Assistant.
+
+Run from the appdaemon directory with: python -m simulation --days 7
+(or backtest scene decisions with: python -m simulation.backtest DATABASE)
+"""
+
+from simulation.appdaemon import AppDaemon
+from simulation.backtest import Backtest, History
+from simulation.clock import Scheduler
+from simulation.hass import Entity, Hass
+from simulation.heartbeat import HeartbeatServer
+from simulation.home_assistant import HomeAssistant
+from simulation.household import Household
+
+__all__ = [
+    "AppDaemon",
+    "Backtest",
+    "Entity",
+    "Hass",
+    "HeartbeatServer",
+    "History",
+    "HomeAssistant",
+    "Household",
+    "Scheduler",
+]
@@ -0,0 +1,222 @@
+"""Simulate the house for a number of days and report throughput and service calls."""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+from simulation.appdaemon import AppDaemon
+from simulation.heartbeat import HeartbeatServer
+from simulation.household import Household
+
+APPDAEMON_DIR = Path(__file__).resolve().parent.parent
+
+
+class SimulatedTimeFormatter(logging.Formatter):
+    """Format log records with the simulated (rather than real) time."""
+
+    def __init__(self, ad: AppDaemon):
+        """Format as AppDaemon does, using the simulation's clock."""
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        self.ad = ad
+
+    def formatTime(self, record: logging.LogRecord, datefmt: str | None = None) -> str:  # noqa: N802 - overridden
+        """Get the simulated time."""
+        del record, datefmt
+        return self.ad.scheduler.now.isoformat(sep=" ", timespec="seconds")
+
+
+class ClimateKernelCheck:
+    """Periodic check that the climate kernel agrees with the climate devices.
+
+    Climate only adjusts the devices climate_kernel.might_adjust says might need
+    it, so any device it would leave alone that would adjust is counted.
+    """
+
+    period = datetime.timedelta(minutes=5)
+
+    def __init__(self, ad: AppDaemon):
+        """Start checking every period (if the Climate app is loaded)."""
+        self.ad = ad
+        self.disagreements: dict[str, int] = {}
+        if "Climate" in ad.apps:
+            ad.scheduler.schedule_in(self.period.total_seconds(), self.check)
+
+    def check(self):
+        """Count the devices left alone wrongly, then check again after the period."""
+        for device in self.ad.apps["Climate"].devices_left_alone_wrongly():
+            self.disagreements[device.device_id] = (
+                self.disagreements.get(device.device_id, 0) + 1
+            )
+        self.ad.scheduler.schedule_in(self.period.total_seconds(), self.check)
+
+
+def parse_args(argv: list[str] | None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(prog="python -m simulation", description=__doc__)
+    parser.add_argument("--days", type=float, default=1, help="simulated days to run")
+    parser.add_argument(
+        "--start",
+        type=datetime.datetime.fromisoformat,
+        default=datetime.datetime(2025, 1, 6),  # noqa: DTZ001 - simulated time is naive
+        help="simulated start time (ISO format, default: %(default)s)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="household routine seed")
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.1,
+        help="seconds for a service call to take effect (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--states",
+        type=Path,
+        default=Path(__file__).with_name("house.yaml"),
+        help="YAML file of initial entity states",
+    )
+    parser.add_argument("--secrets", type=Path, help="YAML file of app secrets")
+    parser.add_argument(
+        "--config-dir",
+        type=Path,
+        help="directory apps save state in, kept between runs (default: temporary)",
+    )
+    parser.add_argument(
+        "--heartbeat",
+        action="store_true",
+        help="send heartbeats to a local HTTP stand-in (instead of nowhere)",
+    )
+    parser.add_argument(
+        "--heartbeat-outage",
+        type=float,
+        default=0,
+        help="minutes the heartbeat stand-in is down for, from midday on the first day",
+    )
+    parser.add_argument("--json", action="store_true", help="report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show app INFO logs")
+    return parser.parse_args(argv)
+
+
+def simulate(args: argparse.Namespace) -> dict:
+    """Run the apps for the simulated days, returning the benchmark report."""
+    ad = AppDaemon(
+        APPDAEMON_DIR / "apps",
+        args.start,
+        args.latency,
+        config_dir=args.config_dir,
+    )
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(SimulatedTimeFormatter(ad))
+    handler.setLevel(logging.INFO if args.verbose else logging.WARNING)
+    logging.getLogger().addHandler(handler)
+    household = Household(ad, args.seed)
+    household.seed(
+        APPDAEMON_DIR.parent / "configuration",
+        yaml.safe_load(args.states.read_text()) or {},
+    )
+    secrets = yaml.safe_load(args.secrets.read_text()) if args.secrets else None
+    heartbeat = None
+    if args.heartbeat:
+        heartbeat = HeartbeatServer()
+        secrets = {**(secrets or {}), "heartbeat_url": heartbeat.url}
+        if args.heartbeat_outage:
+            outage = datetime.datetime.combine(args.start.date(), datetime.time(12))
+            ad.scheduler.schedule(outage, heartbeat.set_up, False)  # noqa: FBT003 - down
+            ad.scheduler.schedule(
+                outage + datetime.timedelta(minutes=args.heartbeat_outage),
+                heartbeat.set_up,
+                True,  # noqa: FBT003 - back up
+            )
+    load_start = time.perf_counter()
+    ad.load_apps(secrets)
+    kernel_check = ClimateKernelCheck(ad)
+    run_start = time.perf_counter()
+    household.start()
+    ad.scheduler.run_until(args.start + datetime.timedelta(days=args.days))
+    run_time = time.perf_counter() - run_start
+    ad.terminate_apps()
+    if heartbeat is not None:
+        heartbeat.close()
+    events = ad.hass.events_fired
+    service_calls = len(ad.hass.service_calls)
+    callback_stats = sys.modules["app"].App.callback_stats
+    return {
+        "simulated_days": args.days,
+        "load_seconds": round(run_start - load_start, 3),
+        "run_seconds": round(run_time, 3),
+        "speedup": round(args.days * 24 * 60 * 60 / run_time),
+        "entities": len(ad.hass.states),
+        "state_changes": ad.hass.state_changes,
+        "events": events,
+        "events_per_second": round(events / run_time),
+        "callbacks": ad.callbacks_run,
+        "callbacks_per_second": round(ad.callbacks_run / run_time),
+        "service_calls": service_calls,
+        "service_calls_per_day": round(service_calls / args.days, 1),
+        "service_calls_by_service": dict(ad.hass.service_counts.most_common()),
+        "errors": ad.errors,
+        "climate_kernel_disagreements": kernel_check.disagreements,
+        "heartbeats": heartbeat.stats if heartbeat is not None else None,
+        "busiest_callbacks": callback_stats.summary(limit=5),
+    }
+
+
+def format_report(report: dict) -> str:
+    """Format the benchmark report for reading."""
+    lines = [
+        (
+            f"Simulated {report['simulated_days']:g} day(s) in "
+            f"{report['run_seconds']} s ({report['speedup']:,}x real time, apps "
+            f"loaded in {report['load_seconds']} s) with {report['entities']} entities"
+        ),
+        (
+            f"Events: {report['events']:,} ({report['events_per_second']:,}/s), "
+            f"including {report['state_changes']:,} state changes"
+        ),
+        (
+            f"Callbacks: {report['callbacks']:,} "
+            f"({report['callbacks_per_second']:,}/s), {report['errors']} raised errors"
+        ),
+        (
+            "Climate devices the kernel would wrongly leave alone: "
+            f"{sum(report['climate_kernel_disagreements'].values())}"
+        ),
+        (
+            f"Service calls: {report['service_calls']:,} "
+            f"({report['service_calls_per_day']:,} per simulated day)"
+        ),
+    ]
+    lines.extend(
+        f"  {count:>7,} {service}"
+        for service, count in report["service_calls_by_service"].items()
+    )
+    if report["heartbeats"] is not None:
+        lines.append(
+            f"Heartbeats: {report['heartbeats']['requests']:,} on "
+            f"{report['heartbeats']['connections']:,} connection(s)",
+        )
+    lines.append("Busiest callbacks:")
+    lines.extend(
+        f"  {stats['total_ms']:>9,} ms total, {stats['count']:>7,} calls: {name}"
+        for name, stats in report["busiest_callbacks"].items()
+    )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None):
+    """Run the simulation from the command line."""
+    args = parse_args(argv)
+    report = simulate(args)
+    sys.stdout.write(
+        (json.dumps(report, indent=2) if args.json else format_report(report)) + "\n",
+    )
+
+
+if __name__ == "__main__":
+    main()
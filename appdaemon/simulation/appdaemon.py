@@ -0,0 +1,518 @@
+"""Stand-in for AppDaemon itself: loads the apps and dispatches their callbacks.
+
+Listeners and timers follow AppDaemon's semantics (filters, durations, constraints
+and namespaces), but every callback runs on the simulation's single thread in
+virtual time order, so a run is repeatable and can go much faster than real time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import importlib
+import itertools
+import logging
+import re
+import sys
+import tempfile
+import traceback
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import yaml
+
+from simulation.clock import Scheduler
+from simulation.hass import install
+from simulation.home_assistant import HomeAssistant
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine
+
+    from simulation.hass import Hass
+
+ENTITY_ID_PATTERN = re.compile(
+    r"[\"']((?:binary_sensor|climate|counter|device_tracker|event|fan|group|humidifier"
+    r"|input_boolean|input_datetime|input_number|input_select|light|lock|media_player"
+    r"|person|sensor|switch|update)\.[a-z0-9_]+)[\"']",
+)
+STATE_LISTENER_OPTIONS = (
+    "attribute",
+    "duration",
+    "immediate",
+    "namespace",
+    "new",
+    "old",
+    "oneshot",
+    "pin",
+    "pin_thread",
+)
+
+
+def referenced_entity_ids(apps_dir: Path) -> set[str]:
+    """Get the entity IDs referenced (as complete string literals) by the apps."""
+    return {
+        match.group(1)
+        for path in apps_dir.glob("*.py")
+        for match in ENTITY_ID_PATTERN.finditer(path.read_text())
+    }
+
+
+class StateListener:
+    """An app's subscription to state changes of all entities, a domain or an entity."""
+
+    def __init__(
+        self,
+        app: Hass,
+        callback: Callable,
+        entity_id: str | None,
+        kwargs: dict,
+    ):
+        """Subscribe with AppDaemon's listen_state options."""
+        self.app = app
+        self.callback = callback
+        self.entity_id = entity_id
+        self.attribute = kwargs.get("attribute")
+        self.new = kwargs.get("new")
+        self.old = kwargs.get("old")
+        self.duration = kwargs.get("duration")
+        self.oneshot = kwargs.get("oneshot", False)
+        self.kwargs = {
+            key: value
+            for key, value in kwargs.items()
+            if key not in STATE_LISTENER_OPTIONS
+        }
+        self.timers: dict[str, str] = {}
+
+    def matches_entity(self, entity_id: str) -> bool:
+        """Check if changes to an entity are subscribed to."""
+        return (
+            self.entity_id is None
+            or self.entity_id == entity_id
+            or (
+                "." not in self.entity_id and entity_id.startswith(f"{self.entity_id}.")
+            )
+        )
+
+    def value(self, state: dict | None):
+        """Get the listened to value (state, attribute or everything) from a state."""
+        if state is None or self.attribute == "all":
+            return state
+        if self.attribute is None:
+            return state["state"]
+        if self.attribute in state["attributes"]:
+            return state["attributes"][self.attribute]
+        return state.get(self.attribute)
+
+    def matches(self, old, new) -> bool:
+        """Check if a change passes the 'old' and 'new' filters."""
+        return all(
+            expected is None
+            or (expected(value) if callable(expected) else expected == value)
+            for expected, value in ((self.old, old), (self.new, new))
+        )
+
+
+class AppDaemon:
+    """Apps, their listeners and timers, driven by the simulated Home Assistant."""
+
+    def __init__(
+        self,
+        apps_dir: Path,
+        start: datetime.datetime,
+        service_latency: float = 0.1,
+        sunrise: datetime.time = datetime.time(6, 30),
+        sunset: datetime.time = datetime.time(18, 30),
+        config_dir: Path | None = None,
+    ):
+        """Prepare a house with no apps loaded, starting at the given time.
+
+        Apps save any state in the config directory, a temporary one if not given.
+        """
+        self.apps_dir = apps_dir
+        self.__temporary_config_dir = None
+        if config_dir is None:
+            self.__temporary_config_dir = tempfile.TemporaryDirectory(
+                prefix="simulation_",
+            )
+            config_dir = Path(self.__temporary_config_dir.name)
+        self.config_dir = config_dir
+        self.sunrise = sunrise
+        self.sunset = sunset
+        self.scheduler = Scheduler(start)
+        self.hass = HomeAssistant(self.scheduler, service_latency)
+        self.hass.listeners.append(self.__handle_event)
+        self.apps: dict[str, Hass] = {}
+        self.state_listeners: dict[str, StateListener] = {}
+        self.event_listeners: dict[str, tuple] = {}
+        self.log_listeners: dict[str, tuple] = {}
+        self.timers: dict[str, str] = {}
+        self.endpoints: dict[str, Callable] = {}
+        self.loop = asyncio.new_event_loop()
+        self.callbacks_run = 0
+        self.errors = 0
+        self.__handles = itertools.count()
+        self.__handling_log = False
+
+    def __handle(self, kind: str) -> str:
+        """Get a new unique handle for a listener or timer."""
+        return f"{kind}_{next(self.__handles)}"
+
+    def load_apps(self, secrets: dict | None = None):
+        """Create and initialise each configured app, in dependency then priority order.
+
+        Secrets not given are replaced with placeholders (which look like URLs with an
+        unknown scheme, so nothing outside the simulation is ever contacted).
+        """
+        install()
+        if str(self.apps_dir) not in sys.path:
+            sys.path.insert(0, str(self.apps_dir))
+
+        class AppLoader(yaml.SafeLoader):
+            """Resolve AppDaemon's !secret tag."""
+
+        AppLoader.add_constructor(
+            "!secret",
+            lambda loader, node: (secrets or {}).get(
+                loader.construct_scalar(node),
+                f"simulation:{loader.construct_scalar(node)}",
+            ),
+        )
+        configs: dict[str, dict] = {}
+        for path in sorted(self.apps_dir.glob("*.yaml")):
+            configs.update(yaml.load(path.read_text(), AppLoader) or {})  # noqa: S506 - safe
+        for name in self.__load_order(configs):
+            config = configs[name]
+            app_class = getattr(
+                importlib.import_module(config["module"]),
+                config["class"],
+            )
+            try:
+                app = self.apps[name] = app_class(self, name, dict(config))
+            except Exception:  # noqa: BLE001 - report and load the other apps
+                self.__log_error(None, f"creating app '{name}'")
+                continue
+            self.run_callback(app, app.initialize, (), {})
+            self.hass.fire("app_initialized", {"app": name, "__namespace": "admin"})
+        self.hass.fire("appd_started", {"__namespace": "global"})
+
+    @staticmethod
+    def __load_order(configs: dict[str, dict]) -> list[str]:
+        """Order apps by priority, with dependencies before the apps that need them."""
+        order: list[str] = []
+
+        def add(name: str):
+            if name in order or name not in configs:
+                return
+            dependencies = configs[name].get("dependencies", [])
+            for dependency in (
+                [dependencies] if isinstance(dependencies, str) else dependencies
+            ):
+                add(dependency)
+            order.append(name)
+
+        for name in sorted(
+            (name for name, config in configs.items() if "module" in config),
+            key=lambda name: (configs[name].get("priority", 50), name),
+        ):
+            add(name)
+        return order
+
+    def terminate_apps(self):
+        """Terminate each app (in reverse load order), as AppDaemon does on shutdown."""
+        for app in reversed(list(self.apps.values())):
+            if hasattr(app, "terminate"):
+                self.run_callback(app, app.terminate, (), {})
+        self.loop.close()
+        if self.__temporary_config_dir is not None:
+            self.__temporary_config_dir.cleanup()
+
+    def run_callback(self, app: Hass, callback: Callable, args: tuple, kwargs: dict):
+        """Run an app's callback (if its constraint allows), logging any exception."""
+        constraint = kwargs.get("constrain_input_boolean")
+        if constraint:
+            entity_id, _, state = constraint.partition(",")
+            if self.hass.ensure(entity_id.strip())["state"] != (state.strip() or "on"):
+                return
+        self.callbacks_run += 1
+        try:
+            callback(*args, **kwargs)
+        except Exception:  # noqa: BLE001 - AppDaemon logs and carries on
+            self.__log_error(app, getattr(callback, "__qualname__", repr(callback)))
+
+    def run_task(
+        self,
+        app: Hass,
+        coro: Coroutine,
+        callback: Callable | None,
+        kwargs: dict,
+    ):
+        """Run a coroutine on the event loop, then queue its callback with the result.
+
+        The coroutine runs to completion immediately, taking no simulated time.
+        """
+        try:
+            result = self.loop.run_until_complete(coro)
+        except Exception:  # noqa: BLE001 - AppDaemon logs and carries on
+            self.__log_error(app, getattr(coro, "__qualname__", repr(coro)))
+            return
+        if callback is not None:
+            self.scheduler.schedule(
+                self.scheduler.now,
+                self.run_callback,
+                app,
+                callback,
+                (),
+                {**kwargs, "result": result},
+            )
+
+    def __log_error(self, app: Hass | None, context: str):
+        """Log the current exception in the error log."""
+        self.errors += 1
+        self.log(
+            app,
+            "ERROR",
+            f"{traceback.format_exc()}(while {context})",
+            log_type="error_log",
+        )
+
+    def log(
+        self,
+        app: Hass | None,
+        level: str,
+        message: str,
+        log_type: str = "main_log",
+    ):
+        """Log a message and pass it to log listeners (unless logged by one of them)."""
+        level_number = logging.getLevelName(level)
+        logger = app.logger if app is not None else logging.getLogger("simulation")
+        if not logger.isEnabledFor(level_number):
+            return
+        logger.log(level_number, message)
+        if self.__handling_log:
+            return
+        for listener_app, callback, listener_level, kwargs in list(
+            self.log_listeners.values(),
+        ):
+            if level_number >= logging.getLevelName(listener_level):
+                self.scheduler.schedule(
+                    self.scheduler.now,
+                    self.__run_log_callback,
+                    listener_app,
+                    callback,
+                    (
+                        app.name if app is not None else "AppDaemon",
+                        self.scheduler.now,
+                        level,
+                        log_type,
+                        message,
+                    ),
+                    kwargs,
+                )
+
+    def __run_log_callback(
+        self,
+        app: Hass,
+        callback: Callable,
+        args: tuple,
+        kwargs: dict,
+    ):
+        """Run a log callback, without passing on anything it logs (no feedback)."""
+        self.__handling_log = True
+        try:
+            self.run_callback(app, callback, args, kwargs)
+        finally:
+            self.__handling_log = False
+
+    def add_log_listener(
+        self,
+        app: Hass,
+        callback: Callable,
+        level: str,
+        kwargs: dict,
+    ) -> str:
+        """Listen for log messages of (at least) a level."""
+        handle = self.__handle("log")
+        self.log_listeners[handle] = (app, callback, level, kwargs)
+        return handle
+
+    def add_state_listener(
+        self,
+        app: Hass,
+        callback: Callable,
+        entity_id: str | None,
+        kwargs: dict,
+    ) -> str:
+        """Listen for state changes (firing immediately if requested and matching)."""
+        handle = self.__handle("state")
+        listener = self.state_listeners[handle] = StateListener(
+            app,
+            callback,
+            entity_id,
+            kwargs,
+        )
+        if kwargs.get("immediate") and entity_id is not None and "." in entity_id:
+            new = listener.value(self.hass.ensure(entity_id))
+            if listener.new is None or listener.matches(listener.old, new):
+                self.__trigger(handle, listener, entity_id, None, new)
+        return handle
+
+    def cancel_state_listener(self, handle: str):
+        """Stop listening for state changes, cancelling any pending durations."""
+        listener = self.state_listeners.pop(handle, None)
+        if listener is not None:
+            for timer in listener.timers.values():
+                self.scheduler.cancel(timer)
+
+    def add_event_listener(
+        self,
+        app: Hass,
+        callback: Callable,
+        event: str | None,
+        kwargs: dict,
+    ) -> str:
+        """Listen for events (of a type, in a namespace, with matching data)."""
+        handle = self.__handle("event")
+        self.event_listeners[handle] = (app, callback, event, kwargs)
+        return handle
+
+    def add_timer(
+        self,
+        app: Hass,
+        callback: Callable,
+        at: datetime.datetime,
+        interval: datetime.timedelta | None,
+        args: tuple,
+        kwargs: dict,
+    ) -> str:
+        """Run a callback at a time (repeating at the interval, if given)."""
+        handle = self.__handle("timer")
+        self.timers[handle] = self.scheduler.schedule(
+            at,
+            self.__fire_timer,
+            handle,
+            at,
+            (app, callback, interval, args, kwargs),
+        )
+        return handle
+
+    def __fire_timer(self, handle: str, at: datetime.datetime, timer: tuple):
+        """Run a timer's callback, rescheduling it first if it repeats."""
+        app, callback, interval, args, kwargs = timer
+        if interval is None:
+            del self.timers[handle]
+        else:
+            self.timers[handle] = self.scheduler.schedule(
+                at + interval,
+                self.__fire_timer,
+                handle,
+                at + interval,
+                timer,
+            )
+        self.run_callback(app, callback, args, kwargs)
+
+    def cancel_timer(self, handle: str) -> bool:
+        """Cancel a timer, returning False if it isn't running."""
+        scheduled = self.timers.pop(handle, None)
+        return scheduled is not None and self.scheduler.cancel(scheduled)
+
+    def __handle_event(self, event_type: str, data: dict):
+        """Dispatch an event to event (and for state changes, state) listeners."""
+        namespace = data.get("__namespace", "default")
+        data = {key: value for key, value in data.items() if key != "__namespace"}
+        for app, callback, event, kwargs in list(self.event_listeners.values()):
+            listener_namespace = kwargs.get("namespace", "default")
+            if (
+                (event is None or event == event_type)
+                and namespace in (listener_namespace, "global")
+                and all(
+                    data.get(key) == value
+                    for key, value in kwargs.items()
+                    if key not in ("namespace", "oneshot")
+                    and not key.startswith("constrain_")
+                )
+            ):
+                self.scheduler.schedule(
+                    self.scheduler.now,
+                    self.run_callback,
+                    app,
+                    callback,
+                    (event_type, data),
+                    {key: value for key, value in kwargs.items() if key != "namespace"},
+                )
+        if event_type == "state_changed":
+            self.__dispatch_state_change(
+                data["entity_id"],
+                data["old_state"],
+                data["new_state"],
+            )
+
+    def __dispatch_state_change(
+        self,
+        entity_id: str,
+        old_state: dict | None,
+        new_state: dict | None,
+    ):
+        """Trigger (or start/cancel the durations of) matching state listeners."""
+        for handle, listener in list(self.state_listeners.items()):
+            if not listener.matches_entity(entity_id):
+                continue
+            old, new = listener.value(old_state), listener.value(new_state)
+            if listener.attribute != "all" and old == new:
+                continue
+            if listener.duration:
+                pending = listener.timers.pop(entity_id, None)
+                if pending is not None:
+                    self.scheduler.cancel(pending)
+            if listener.matches(old, new):
+                self.__trigger(handle, listener, entity_id, old, new)
+
+    def __trigger(
+        self,
+        handle: str,
+        listener: StateListener,
+        entity_id: str,
+        old,
+        new,
+    ):
+        """Run a state listener's callback now (or once its duration has passed)."""
+        if listener.duration:
+            listener.timers[entity_id] = self.scheduler.schedule_in(
+                float(listener.duration),
+                self.__run_state_callback,
+                handle,
+                listener,
+                entity_id,
+                old,
+                new,
+            )
+        else:
+            self.scheduler.schedule(
+                self.scheduler.now,
+                self.__run_state_callback,
+                handle,
+                listener,
+                entity_id,
+                old,
+                new,
+            )
+
+    def __run_state_callback(
+        self,
+        handle: str,
+        listener: StateListener,
+        entity_id: str,
+        old,
+        new,
+    ):
+        """Run a state listener's callback (if it is still listening)."""
+        listener.timers.pop(entity_id, None)
+        if handle not in self.state_listeners:
+            return
+        if listener.oneshot:
+            self.cancel_state_listener(handle)
+        self.run_callback(
+            listener.app,
+            listener.callback,
+            (entity_id, listener.attribute or "state", old, new),
+            listener.kwargs,
+        )
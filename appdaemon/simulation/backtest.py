@@ -0,0 +1,461 @@
+"""Backtest the scene decisions against recorded Home Assistant history.
+
+Replays a copy of the recorder's SQLite database through the same decisions the
+apps make (apps/scenes.py), with the times and delays given on the command line
+rather than those in use at the time. reset_scene's choice is evaluated at a
+fixed interval and the dark/bright outside handlers at each change of
+binary_sensor.dark_outside, each from the scene actually recorded at that time.
+Sampling and decisions are vectorised with numpy if it is installed (so months of
+history take seconds), otherwise they are made in plain Python.
+
+Run from the appdaemon directory with:
+    python -m simulation.backtest home-assistant_v2.db --morning-time 06:30
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import collections
+import contextlib
+import datetime
+import json
+import sqlite3
+import sys
+import zoneinfo
+from pathlib import Path
+
+import yaml
+
+try:
+    import numpy as np
+except ImportError:  # optional, only makes backtesting faster
+    np = None
+
+APPS_DIR = Path(__file__).resolve().parent.parent / "apps"
+if str(APPS_DIR) not in sys.path:
+    sys.path.insert(0, str(APPS_DIR))
+
+from scenes import (  # noqa: E402 - imported from the apps directory
+    HouseSnapshot,
+    choose_scene,
+    scene_when_bright,
+    scene_when_dark,
+)
+
+ENTITIES = {
+    "scene": "input_select.scene",
+    "anyone_home": "binary_sensor.anyone_home",
+    "guest_mode": "input_boolean.manual_guest_mode",
+    "dark_outside": "binary_sensor.dark_outside",
+    "tv_playing": "binary_sensor.tv_playing",
+    "morning_time": "input_datetime.morning_time",
+}
+SWITCHES = ("anyone_home", "guest_mode", "dark_outside", "tv_playing")
+SNAPSHOT_FIELDS = (*SWITCHES, "morning")
+MODERN_QUERY = """
+    SELECT states_meta.entity_id, states.last_updated_ts, states.state
+    FROM states JOIN states_meta ON states.metadata_id = states_meta.metadata_id
+    WHERE states_meta.entity_id IN ({})
+    ORDER BY states.last_updated_ts
+"""
+LEGACY_QUERY = """
+    SELECT entity_id, last_updated, state FROM states
+    WHERE entity_id IN ({})
+    ORDER BY last_updated
+"""
+
+
+def app_constants(name: str) -> dict:
+    """Get an app's configured constants (with any secrets left unresolved)."""
+
+    class AppLoader(yaml.SafeLoader):
+        """Leave AppDaemon's !secret tags unresolved."""
+
+    AppLoader.add_constructor("!secret", lambda _loader, _node: None)
+    path = APPS_DIR / f"{name.lower()}.yaml"
+    return yaml.load(path.read_text(), AppLoader)[name]  # noqa: S506 - safe
+
+
+def seconds_of_day(time: str) -> float:
+    """Get the seconds since midnight of a time string (HH:MM or HH:MM:SS)."""
+    parsed = datetime.time.fromisoformat(time)
+    return parsed.hour * 3600 + parsed.minute * 60 + parsed.second
+
+
+def house_snapshot(key: tuple[bool, ...]) -> HouseSnapshot:
+    """Get the house snapshot for a key of its fields (in SNAPSHOT_FIELDS order)."""
+    return HouseSnapshot(**dict(zip(SNAPSHOT_FIELDS, key, strict=True)))
+
+
+class History:
+    """Recorded states of some entities, as times and states in time order."""
+
+    def __init__(self, path: Path, entity_ids: list[str]):
+        """Load the entities' states from a recorder database (read only)."""
+        self.changes: dict[str, tuple[list[float], list[str]]] = {
+            entity_id: ([], []) for entity_id in entity_ids
+        }
+        with contextlib.closing(
+            sqlite3.connect(f"file:{path}?mode=ro", uri=True),
+        ) as database:
+            modern = database.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                ("states_meta",),
+            ).fetchone()
+            query = (MODERN_QUERY if modern else LEGACY_QUERY).format(
+                ", ".join("?" * len(entity_ids)),
+            )
+            for entity_id, updated, state in database.execute(query, entity_ids):
+                times, states = self.changes[entity_id]
+                times.append(
+                    updated
+                    if isinstance(updated, float)
+                    else datetime.datetime.fromisoformat(updated)
+                    .replace(tzinfo=datetime.UTC)
+                    .timestamp(),
+                )
+                states.append(state)
+
+    @property
+    def span(self) -> tuple[float, float]:
+        """Get the times of the first and last recorded states."""
+        recorded = [times for times, _ in self.changes.values() if times]
+        if not recorded:
+            msg = "No states recorded for the entities scenes are chosen from"
+            raise ValueError(msg)
+        return min(times[0] for times in recorded), max(times[-1] for times in recorded)
+
+    def sample(self, entity_id: str, times):
+        """Get an entity's state at each time (None before its first state)."""
+        recorded, states = self.changes[entity_id]
+        if np is not None:
+            indices = np.searchsorted(np.asarray(recorded), times, side="right") - 1
+            return np.array([*states, None], dtype=object)[indices]
+        return [
+            states[index] if index >= 0 else None
+            for index in (bisect.bisect_right(recorded, time) - 1 for time in times)
+        ]
+
+
+class Backtest:
+    """Scene decisions replayed over recorded history with the given settings."""
+
+    def __init__(
+        self,
+        history: History,
+        timezone: zoneinfo.ZoneInfo,
+        settings: dict,
+        interval: float = 60,
+    ):
+        """Prepare to backtest the history (settings are as named in the apps)."""
+        self.history = history
+        self.timezone = timezone
+        self.settings = settings
+        self.interval = interval
+
+    def __offset(self, hour: int) -> float:
+        """Get the time zone's offset from UTC (in seconds) for an hour."""
+        return self.timezone.utcoffset(
+            datetime.datetime.fromtimestamp(hour * 3600, datetime.UTC).replace(
+                tzinfo=None,
+            ),
+        ).total_seconds()
+
+    def local_seconds(self, times):
+        """Get the local seconds since midnight of each time."""
+        if np is not None:
+            hours, inverse = np.unique(times // 3600, return_inverse=True)
+            offsets = np.array([self.__offset(int(hour)) for hour in hours])
+            return (times + offsets[inverse]) % (24 * 60 * 60)
+        offsets: dict[int, float] = {}
+        return [
+            (time + offsets.setdefault(hour, self.__offset(hour))) % (24 * 60 * 60)
+            for time, hour in ((time, int(time // 3600)) for time in times)
+        ]
+
+    def snapshots(self, times) -> tuple[list, list, list]:
+        """Get the recorded scene, house snapshot key and local time for each time.
+
+        Keys are the snapshot's fields, in SNAPSHOT_FIELDS order.
+        """
+        local = self.local_seconds(times)
+        switches = [
+            self.history.sample(ENTITIES[name], times) == "on"
+            if np is not None
+            else [state == "on" for state in self.history.sample(ENTITIES[name], times)]
+            for name in SWITCHES
+        ]
+        day_time = seconds_of_day(self.settings["day_time"])
+        if self.settings.get("morning_time"):
+            morning_times = [seconds_of_day(self.settings["morning_time"])] * len(times)
+        else:
+            recorded = self.history.sample(ENTITIES["morning_time"], times)
+            parsed = {time: seconds_of_day(time) for time in set(recorded) if time}
+            morning_times = [parsed.get(time, day_time) for time in recorded]
+        if np is not None:
+            morning = (local >= np.asarray(morning_times)) & (local <= day_time)
+            keys = np.column_stack([*switches, morning])
+            keys = [tuple(key) for key in keys.tolist()]
+        else:
+            morning = [
+                start <= time <= day_time
+                for start, time in zip(morning_times, local, strict=True)
+            ]
+            keys = list(zip(*switches, morning, strict=True))
+        return list(self.history.sample(ENTITIES["scene"], times)), keys, list(local)
+
+    def choose_scenes(self, times) -> tuple[list, list, list]:
+        """Get the recorded and chosen scenes, and the local time, at each time.
+
+        The decision is only made once for each distinct scene and snapshot.
+        """
+        recorded, keys, local = self.snapshots(times)
+        decisions: dict[tuple, str] = {}
+        chosen = []
+        for current, key in zip(recorded, keys, strict=True):
+            decision = decisions.get((current, key))
+            if decision is None:
+                decision = decisions[current, key] = choose_scene(
+                    current or "",
+                    house_snapshot(key),
+                    keep_bright=self.settings.get("keep_bright", False),
+                )
+            chosen.append(decision)
+        return recorded, chosen, local
+
+    def outside_changes(self) -> tuple[list, list]:
+        """Get when it got dark and (for long enough) bright, and the scene chosen.
+
+        Returns (time, scene) pairs for changes to dark, then to bright.
+        """
+        times, states = self.history.changes[ENTITIES["dark_outside"]]
+        dark, bright = [], []
+        previous = None
+        for index, (time, state) in enumerate(zip(times, states, strict=True)):
+            if state == previous:
+                continue
+            previous = state
+            if state == "on":
+                dark.append(time)
+            elif state == "off":
+                settled = time + self.settings["night_to_day_delay"]
+                later = next(
+                    (
+                        changed
+                        for changed, new in zip(
+                            times[index + 1 :],
+                            states[index + 1 :],
+                            strict=True,
+                        )
+                        if new != "off"
+                    ),
+                    None,
+                )
+                if later is None or later > settled:
+                    bright.append(settled)
+        results = []
+        for change_times, decide in (
+            (dark, scene_when_dark),
+            (bright, scene_when_bright),
+        ):
+            if not change_times:
+                results.append([])
+                continue
+            sample_times = np.asarray(change_times) if np is not None else change_times
+            recorded, keys, local = self.snapshots(sample_times)
+            results.append(
+                [
+                    (time, decide(current or "", house_snapshot(key)))
+                    for time, current, key in zip(local, recorded, keys, strict=True)
+                ],
+            )
+        return results[0], results[1]
+
+    def run(self, start: float | None = None, end: float | None = None) -> dict:
+        """Backtest the history (or part of it), returning the report."""
+        first, last = self.history.span
+        start = max(start or first, first)
+        end = min(end or last, last)
+        count = int((end - start) // self.interval) + 1
+        times = (
+            start + np.arange(count) * self.interval
+            if np is not None
+            else [start + index * self.interval for index in range(count)]
+        )
+        recorded, chosen, local = self.choose_scenes(times)
+        shares = collections.Counter(chosen)
+        recorded_shares = collections.Counter(recorded)
+        by_hour: dict[int, collections.Counter] = collections.defaultdict(
+            collections.Counter,
+        )
+        for scene, seconds in zip(chosen, local, strict=True):
+            by_hour[int(seconds // 3600)][scene] += 1
+        dark, bright = self.outside_changes()
+        return {
+            "start": datetime.datetime.fromtimestamp(start, self.timezone).isoformat(),
+            "end": datetime.datetime.fromtimestamp(end, self.timezone).isoformat(),
+            "samples": count,
+            "interval": self.interval,
+            "vectorised": np is not None,
+            "settings": self.settings,
+            "scenes": {
+                scene: {
+                    "share": round(samples / count, 4),
+                    "recorded_share": round(recorded_shares[scene] / count, 4),
+                }
+                for scene, samples in shares.most_common()
+            },
+            "agreement": round(
+                sum(
+                    current == scene
+                    for current, scene in zip(recorded, chosen, strict=True)
+                )
+                / count,
+                4,
+            ),
+            "by_hour": {
+                hour: dict(by_hour[hour].most_common()) for hour in sorted(by_hour)
+            },
+            "dark_outside": outside_summary(dark),
+            "bright_outside": outside_summary(bright),
+        }
+
+
+def outside_summary(changes: list[tuple[float, str | None]]) -> dict:
+    """Summarise the scenes chosen as it changed outside, and when they were."""
+    changed = [seconds for seconds, scene in changes if scene is not None]
+    return {
+        "changes": len(changes),
+        "scenes": dict(
+            collections.Counter(
+                scene or "(kept)" for _, scene in changes
+            ).most_common(),
+        ),
+        "mean_time": clock_time(sum(changed) / len(changed)) if changed else None,
+        "earliest": clock_time(min(changed)) if changed else None,
+        "latest": clock_time(max(changed)) if changed else None,
+    }
+
+
+def clock_time(seconds: float) -> str:
+    """Format seconds since midnight as a time of day."""
+    return f"{int(seconds // 3600):02}:{int(seconds % 3600 // 60):02}"
+
+
+def parse_args(argv: list[str] | None) -> argparse.Namespace:
+    """Parse command line arguments (defaulting settings to the apps' config)."""
+    control, lights = app_constants("Control"), app_constants("Lights")
+    parser = argparse.ArgumentParser(
+        prog="python -m simulation.backtest",
+        description=__doc__.split("\n\n")[0],
+    )
+    parser.add_argument("database", type=Path, help="recorder SQLite database")
+    parser.add_argument("--start", type=datetime.datetime.fromisoformat)
+    parser.add_argument("--end", type=datetime.datetime.fromisoformat)
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=60,
+        help="seconds between reset_scene decisions (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--timezone",
+        type=zoneinfo.ZoneInfo,
+        default=zoneinfo.ZoneInfo("UTC"),
+        help="the house's time zone (default: UTC)",
+    )
+    parser.add_argument(
+        "--day-time",
+        default=control["day_time"],
+        help="time the Morning scene ends (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--morning-time",
+        help="time the Morning scene starts (default: as recorded)",
+    )
+    parser.add_argument(
+        "--night-to-day-delay",
+        type=float,
+        default=lights["night_to_day_delay"],
+        help="seconds it must be bright before changing to day (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--keep-bright",
+        action="store_true",
+        help="keep the Bright scene, as when resetting on startup",
+    )
+    parser.add_argument("--json", action="store_true", help="report as JSON")
+    return parser.parse_args(argv)
+
+
+def format_report(report: dict) -> str:
+    """Format the backtest report for reading."""
+    lines = [
+        (
+            f"Backtested {report['start']} to {report['end']} "
+            f"({report['samples']:,} decisions, every {report['interval']:g} s, "
+            f"{'vectorised' if report['vectorised'] else 'without numpy'})"
+        ),
+        f"Settings: {report['settings']}",
+        (
+            f"reset_scene would choose (agreeing with the recorded scene "
+            f"{report['agreement']:.1%} of the time):"
+        ),
+    ]
+    lines.extend(
+        f"  {scene:<14} {shares['share']:>6.1%} "
+        f"(recorded {shares['recorded_share']:.1%})"
+        for scene, shares in report["scenes"].items()
+    )
+    lines.append("Most chosen scene by hour:")
+    lines.extend(
+        f"  {hour:02}:00 {max(scenes, key=scenes.get)} "
+        f"({max(scenes.values()) / sum(scenes.values()):.0%})"
+        for hour, scenes in report["by_hour"].items()
+    )
+    for name in ("dark_outside", "bright_outside"):
+        summary = report[name]
+        lines.append(
+            f"{name.replace('_', ' ').capitalize()}: {summary['changes']} change(s), "
+            f"{summary['scenes']}"
+            + (
+                f", changing scene at {summary['mean_time']} on average "
+                f"({summary['earliest']} to {summary['latest']})"
+                if summary["mean_time"]
+                else ""
+            ),
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None):
+    """Backtest from the command line."""
+    args = parse_args(argv)
+    settings = {
+        "day_time": args.day_time,
+        "morning_time": args.morning_time,
+        "night_to_day_delay": args.night_to_day_delay,
+        "keep_bright": args.keep_bright,
+    }
+    backtest = Backtest(
+        History(args.database, list(ENTITIES.values())),
+        args.timezone,
+        settings,
+        args.interval,
+    )
+    report = backtest.run(
+        *(
+            time.replace(tzinfo=time.tzinfo or args.timezone).timestamp()
+            if time
+            else None
+            for time in (args.start, args.end)
+        ),
+    )
+    sys.stdout.write(
+        (json.dumps(report, indent=2) if args.json else format_report(report)) + "\n",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Virtual clock that simulated time advances through by running scheduled callbacks.
+
+Naive datetimes are used throughout and treated as UTC (the simulated time zone).
+"""
+
+from __future__ import annotations
+
+import datetime
+import heapq
+import itertools
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+class Scheduler:
+    """Callbacks queued against a virtual clock, run in time order.
+
+    Time only advances by running the next callback due (it never sleeps), so a
+    simulated day takes only as long as its callbacks take to run. Callbacks due
+    at the same time run in the order they were scheduled.
+    """
+
+    def __init__(self, start: datetime.datetime):
+        """Start the clock at the given time with nothing scheduled."""
+        self.now = start
+        self.run_count = 0
+        self.queue: list[tuple[datetime.datetime, int, str]] = []
+        self.callbacks: dict[str, tuple[Callable, tuple]] = {}
+        self.__sequence = itertools.count()
+
+    @property
+    def timestamp(self) -> float:
+        """Get the current simulated time as a POSIX timestamp."""
+        return self.now.replace(tzinfo=datetime.UTC).timestamp()
+
+    def schedule(self, at: datetime.datetime, callback: Callable, *args) -> str:
+        """Schedule a callback (now if the time has passed), returning its handle."""
+        sequence = next(self.__sequence)
+        handle = f"timer_{sequence}"
+        heapq.heappush(self.queue, (max(at, self.now), sequence, handle))
+        self.callbacks[handle] = (callback, args)
+        return handle
+
+    def schedule_in(self, delay: float, callback: Callable, *args) -> str:
+        """Schedule a callback a number of seconds from now, returning its handle."""
+        return self.schedule(
+            self.now + datetime.timedelta(seconds=delay),
+            callback,
+            *args,
+        )
+
+    def cancel(self, handle: str) -> bool:
+        """Cancel a scheduled callback, returning False if it wasn't scheduled."""
+        return self.callbacks.pop(handle, None) is not None
+
+    def scheduled(self, handle: str) -> bool:
+        """Check if a callback is still scheduled to run."""
+        return handle in self.callbacks
+
+    def run_until(self, end: datetime.datetime):
+        """Run every callback due up to (and including) the end time, in order."""
+        while self.queue and self.queue[0][0] <= end:
+            at, _, handle = heapq.heappop(self.queue)
+            scheduled = self.callbacks.pop(handle, None)
+            if scheduled is None:
+                continue
+            self.now = at
+            self.run_count += 1
+            callback, args = scheduled
+            callback(*args)
+        self.now = max(self.now, end)
+
+    def run_pending(self):
+        """Run every callback due now (including any they schedule for now)."""
+        self.run_until(self.now)
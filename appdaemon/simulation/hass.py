@@ -0,0 +1,516 @@
+"""Stand-in for AppDaemon's Hass API (and entity objects) used by the apps.
+
+Every entity an app references is assumed to exist in the simulated house, so
+looking one up creates it (with plausible defaults) if it hasn't been seen yet.
+"""
+
+from __future__ import annotations
+
+import datetime
+import logging
+import sys
+import types
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine
+
+    from simulation.appdaemon import AppDaemon
+
+TIME_FORMATS = ("%H:%M:%S", "%H:%M")
+DATETIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M")
+
+
+def install():
+    """Register the stand-in as AppDaemon's Hass API module, for the apps to import."""
+    modules = {
+        name: types.ModuleType(name)
+        for name in (
+            "appdaemon",
+            "appdaemon.entity",
+            "appdaemon.plugins",
+            "appdaemon.plugins.hass",
+            "appdaemon.plugins.hass.hassapi",
+        )
+    }
+    modules["appdaemon"].__path__ = []
+    modules["appdaemon"].entity = modules["appdaemon.entity"]
+    modules["appdaemon"].plugins = modules["appdaemon.plugins"]
+    modules["appdaemon.plugins"].hass = modules["appdaemon.plugins.hass"]
+    modules["appdaemon.plugins.hass"].hassapi = modules[
+        "appdaemon.plugins.hass.hassapi"
+    ]
+    modules["appdaemon.plugins.hass.hassapi"].Hass = Hass
+    modules["appdaemon.entity"].Entity = Entity
+    sys.modules.update(modules)
+
+
+class Entity:
+    """An entity as seen through AppDaemon's entity API."""
+
+    def __init__(self, app: Hass, entity_id: str):
+        """Create a reference to an entity for an app."""
+        self.app = app
+        self.entity_id = entity_id
+        self.domain, self.entity_name = entity_id.split(".", 1)
+
+    @property
+    def __state(self) -> dict:
+        """Get the entity's full (current) state object."""
+        return self.app.AD.hass.ensure(self.entity_id)
+
+    @property
+    def state(self) -> str:
+        """Get the entity's state."""
+        return self.__state["state"]
+
+    @property
+    def attributes(self) -> dict:
+        """Get the entity's attributes."""
+        return self.__state["attributes"]
+
+    @property
+    def friendly_name(self) -> str:
+        """Get the entity's friendly name."""
+        return self.attributes.get("friendly_name", self.entity_id)
+
+    @property
+    def last_changed(self) -> datetime.datetime:
+        """Get when the entity's state last changed (UTC)."""
+        return datetime.datetime.fromisoformat(self.__state["last_changed"])
+
+    @property
+    def last_changed_seconds(self) -> float:
+        """Get the number of seconds since the entity's state last changed."""
+        return self.app.get_now_ts() - self.last_changed.timestamp()
+
+    def exists(self) -> bool:
+        """Check if the entity exists."""
+        return self.app.entity_exists(self.entity_id)
+
+    def get_state(self, attribute: str | None = None, default=None):
+        """Get the entity's state or an attribute of it."""
+        return Hass.get_state(self.app, self.entity_id, attribute, default)
+
+    def set_state(self, state=None, attributes: dict | None = None, **kwargs: dict):
+        """Set the entity's state and/or attributes."""
+        return self.app.set_state(self.entity_id, state, attributes, **kwargs)
+
+    def call_service(self, service: str, **kwargs: dict):
+        """Call one of the entity's domain services for the entity."""
+        return self.app.call_service(
+            f"{self.domain}/{service}",
+            entity_id=self.entity_id,
+            **kwargs,
+        )
+
+    def turn_on(self, **kwargs: dict):
+        """Turn the entity on."""
+        return self.call_service("turn_on", **kwargs)
+
+    def turn_off(self, **kwargs: dict):
+        """Turn the entity off."""
+        return self.call_service("turn_off", **kwargs)
+
+    def toggle(self, **kwargs: dict):
+        """Toggle the entity."""
+        return self.call_service("toggle", **kwargs)
+
+    def listen_state(self, callback: Callable, **kwargs: dict) -> str:
+        """Listen for changes to the entity's state."""
+        return self.app.listen_state(callback, self.entity_id, **kwargs)
+
+
+class Entities:
+    """Entities accessed as attributes by domain and name (self.entities.light.x)."""
+
+    def __init__(self, app: Hass, domain: str | None = None):
+        """Create a reference to entities (of a domain) for an app."""
+        self.__app = app
+        self.__domain = domain
+
+    def __getattr__(self, name: str) -> Entities | Entity:
+        """Get the domain or (if a domain is already given) the entity."""
+        if name.startswith("__"):
+            raise AttributeError(name)
+        if self.__domain is None:
+            return Entities(self.__app, name)
+        return Entity(self.__app, f"{self.__domain}.{name}")
+
+
+class Hass:
+    """AppDaemon's Hass API, backed by the simulation instead of Home Assistant."""
+
+    def __init__(self, ad: AppDaemon, name: str, args: dict):
+        """Create an app with its name and configured arguments."""
+        self.AD = ad
+        self.name = name
+        self.config_dir = ad.config_dir
+        self.args = args
+        self.logger = logging.getLogger(f"simulation.{name}")
+        self.logger.setLevel(args.get("log_level", "INFO"))
+
+    @property
+    def entities(self) -> Entities:
+        """Get entities as attributes by domain and name."""
+        return Entities(self)
+
+    def log(self, msg: str, *args, level: str = "INFO", **kwargs: dict):
+        """Log a message in the app's log (and to any log listeners)."""
+        del args, kwargs
+        self.AD.log(self, level, msg)
+
+    def error(self, msg: str, *args, level: str = "ERROR", **kwargs: dict):
+        """Log a message in the error log."""
+        del args, kwargs
+        self.AD.log(self, level, msg, log_type="error_log")
+
+    def listen_log(
+        self,
+        callback: Callable,
+        level: str = "INFO",
+        **kwargs: dict,
+    ) -> str:
+        """Listen for log messages of (at least) the given level from all apps."""
+        return self.AD.add_log_listener(self, callback, level, kwargs)
+
+    def cancel_listen_log(self, handle: str):
+        """Stop listening for log messages."""
+        self.AD.log_listeners.pop(handle, None)
+
+    def get_app(self, name: str) -> Hass | None:
+        """Get another app's instance."""
+        return self.AD.apps.get(name)
+
+    def register_endpoint(self, callback: Callable, endpoint: str | None = None) -> str:
+        """Register an API endpoint (simulation only records it)."""
+        name = endpoint or self.name
+        self.AD.endpoints[name] = callback
+        return name
+
+    def deregister_endpoint(self, handle: str):
+        """Remove an API endpoint."""
+        self.AD.endpoints.pop(handle, None)
+
+    @staticmethod
+    def split_entity(entity_id: str) -> tuple[str, str]:
+        """Split an entity ID into its domain and name."""
+        domain, name = entity_id.split(".", 1)
+        return domain, name
+
+    def entity_exists(self, entity_id: str, **kwargs: dict) -> bool:
+        """Check an entity exists (all entities referenced exist in the simulation)."""
+        del kwargs
+        self.AD.hass.ensure(entity_id)
+        return True
+
+    def get_entity(self, entity_id: str, **kwargs: dict) -> Entity:
+        """Get an entity object for an entity ID."""
+        del kwargs
+        return Entity(self, entity_id)
+
+    def get_state(
+        self,
+        entity_id: str | None = None,
+        attribute: str | None = None,
+        default=None,
+        **kwargs: dict,
+    ):
+        """Get the state of all entities, a domain, or an entity (or its attribute)."""
+        del kwargs
+        states = self.AD.hass.states
+        if entity_id is None:
+            return dict(states)
+        if "." not in entity_id:
+            return {
+                state_id: state
+                for state_id, state in states.items()
+                if state_id.startswith(f"{entity_id}.")
+            }
+        state = self.AD.hass.ensure(entity_id)
+        if attribute == "all":
+            return state
+        if attribute is None:
+            value = state["state"]
+        elif attribute in state["attributes"]:
+            value = state["attributes"][attribute]
+        else:
+            value = state.get(attribute)
+        return default if value is None else value
+
+    def set_state(
+        self,
+        entity_id: str,
+        state=None,
+        attributes: dict | None = None,
+        **kwargs: dict,
+    ) -> dict:
+        """Set an entity's state and/or attributes directly."""
+        if "state" in kwargs:
+            state = kwargs["state"]
+        return self.AD.hass.set_state(entity_id, state, attributes)
+
+    def call_service(self, service: str, **kwargs: dict):
+        """Call a Home Assistant service (recorded then applied after the latency)."""
+        for key in ("namespace", "callback", "return_result", "hass_timeout"):
+            kwargs.pop(key, None)
+        self.AD.hass.call_service(service, kwargs)
+
+    def turn_on(self, entity_id: str, **kwargs: dict):
+        """Turn an entity on."""
+        self.call_service(
+            f"{self.__toggle_domain(entity_id)}/turn_on",
+            entity_id=entity_id,
+            **kwargs,
+        )
+
+    def turn_off(self, entity_id: str, **kwargs: dict):
+        """Turn an entity off."""
+        self.call_service(
+            f"{self.__toggle_domain(entity_id)}/turn_off",
+            entity_id=entity_id,
+            **kwargs,
+        )
+
+    def toggle(self, entity_id: str, **kwargs: dict):
+        """Toggle an entity."""
+        self.call_service(
+            f"{self.__toggle_domain(entity_id)}/toggle",
+            entity_id=entity_id,
+            **kwargs,
+        )
+
+    def __toggle_domain(self, entity_id: str) -> str:
+        """Get the domain of an entity's on/off services (generic for groups)."""
+        domain, _ = self.split_entity(entity_id)
+        return "homeassistant" if domain == "group" else domain
+
+    def notify(
+        self,
+        message: str,
+        title: str | None = None,
+        name: str | None = None,
+        **kwargs: dict,
+    ):
+        """Send a notification via a notify service."""
+        kwargs.pop("namespace", None)
+        self.call_service(
+            f"notify/{name or 'notify'}",
+            message=message,
+            title=title,
+            **kwargs,
+        )
+
+    def fire_event(self, event: str, **kwargs: dict):
+        """Fire an event on the Home Assistant event bus."""
+        kwargs.pop("namespace", None)
+        self.AD.hass.fire(event, kwargs)
+
+    def listen_state(
+        self,
+        callback: Callable,
+        entity_id: str | None = None,
+        **kwargs: dict,
+    ) -> str:
+        """Listen for state changes of all entities, a domain, or an entity."""
+        return self.AD.add_state_listener(self, callback, entity_id, kwargs)
+
+    def cancel_listen_state(self, handle: str, **kwargs: dict):
+        """Stop listening for state changes."""
+        del kwargs
+        self.AD.cancel_state_listener(handle)
+
+    def listen_event(
+        self,
+        callback: Callable,
+        event: str | None = None,
+        **kwargs: dict,
+    ) -> str:
+        """Listen for events (of a type, and with data matching any kwargs)."""
+        return self.AD.add_event_listener(self, callback, event, kwargs)
+
+    def cancel_listen_event(self, handle: str, **kwargs: dict):
+        """Stop listening for events."""
+        del kwargs
+        self.AD.event_listeners.pop(handle, None)
+
+    def run_in(self, callback: Callable, delay: float, *args, **kwargs: dict) -> str:
+        """Run a callback after a delay (in seconds)."""
+        return self.AD.add_timer(
+            self,
+            callback,
+            self.AD.scheduler.now + datetime.timedelta(seconds=delay),
+            None,
+            args,
+            kwargs,
+        )
+
+    def run_at(self, callback: Callable, start, *args, **kwargs: dict) -> str:
+        """Run a callback at a given time (datetime or time string)."""
+        return self.AD.add_timer(
+            self,
+            callback,
+            self.__next_time(start),
+            None,
+            args,
+            kwargs,
+        )
+
+    def run_every(
+        self,
+        callback: Callable,
+        start,
+        interval,
+        *args,
+        **kwargs: dict,
+    ) -> str:
+        """Run a callback periodically from a start time ('now', 'now+N', or a time)."""
+        if isinstance(start, str) and start.startswith("now"):
+            first = self.AD.scheduler.now + datetime.timedelta(
+                seconds=float(start.removeprefix("now") or 0),
+            )
+        else:
+            first = self.__next_time(start)
+        if not isinstance(interval, datetime.timedelta):
+            interval = datetime.timedelta(seconds=interval)
+        return self.AD.add_timer(self, callback, first, interval, args, kwargs)
+
+    def run_daily(self, callback: Callable, start, *args, **kwargs: dict) -> str:
+        """Run a callback every day at the given time."""
+        return self.AD.add_timer(
+            self,
+            callback,
+            self.__next_time(start),
+            datetime.timedelta(days=1),
+            args,
+            kwargs,
+        )
+
+    def __next_time(self, start) -> datetime.datetime:
+        """Get the next occurrence of a time (or the datetime itself, if given one)."""
+        if isinstance(start, datetime.datetime):
+            return start
+        if isinstance(start, str):
+            start = self.parse_time(start)
+        moment = datetime.datetime.combine(self.date(), start)
+        if moment < self.datetime():
+            moment += datetime.timedelta(days=1)
+        return moment
+
+    def cancel_timer(self, handle: str, *, silent: bool = False) -> bool:
+        """Cancel a timer (warning if it isn't running, unless silent)."""
+        cancelled = self.AD.cancel_timer(handle)
+        if not cancelled and not silent:
+            self.log(
+                f"Invalid callback handle '{handle}' in cancel_timer()",
+                level="WARNING",
+            )
+        return cancelled
+
+    def create_task(self, coro: Coroutine, callback: Callable | None = None, **kwargs):
+        """Run a coroutine, then a callback (if given) with its result."""
+        self.AD.run_task(self, coro, callback, kwargs)
+
+    def timer_running(self, handle: str) -> bool:
+        """Check if a timer is still running."""
+        return handle in self.AD.timers
+
+    def datetime(self, *, aware: bool = False) -> datetime.datetime:
+        """Get the current simulated time."""
+        now = self.AD.scheduler.now
+        return now.replace(tzinfo=datetime.UTC) if aware else now
+
+    def get_now(self) -> datetime.datetime:
+        """Get the current simulated time (timezone aware)."""
+        return self.datetime(aware=True)
+
+    def get_now_ts(self) -> float:
+        """Get the current simulated time as a POSIX timestamp."""
+        return self.AD.scheduler.timestamp
+
+    def date(self) -> datetime.date:
+        """Get the current simulated date."""
+        return self.AD.scheduler.now.date()
+
+    def time(self) -> datetime.time:
+        """Get the current simulated time of day."""
+        return self.AD.scheduler.now.time()
+
+    def sunrise(self, *, aware: bool = False, today: bool = False) -> datetime.datetime:
+        """Get the time of the next (or today's) sunrise."""
+        return self.__sun_event(self.AD.sunrise, aware=aware, today=today)
+
+    def sunset(self, *, aware: bool = False, today: bool = False) -> datetime.datetime:
+        """Get the time of the next (or today's) sunset."""
+        return self.__sun_event(self.AD.sunset, aware=aware, today=today)
+
+    def __sun_event(
+        self,
+        time: datetime.time,
+        *,
+        aware: bool,
+        today: bool,
+    ) -> datetime.datetime:
+        """Get the next (or today's) occurrence of a sun event."""
+        moment = datetime.datetime.combine(self.date(), time)
+        if not today and moment < self.datetime():
+            moment += datetime.timedelta(days=1)
+        return moment.replace(tzinfo=datetime.UTC) if aware else moment
+
+    def sun_up(self) -> bool:
+        """Check if the sun is up."""
+        return self.AD.sunrise <= self.time() < self.AD.sunset
+
+    def sun_down(self) -> bool:
+        """Check if the sun is down."""
+        return not self.sun_up()
+
+    def parse_time(
+        self,
+        time_str: str,
+        name: str | None = None,
+        **kwargs: dict,
+    ) -> datetime.time:
+        """Parse a time string (or 'sunrise'/'sunset')."""
+        del name, kwargs
+        if time_str in ("sunrise", "sunset"):
+            return getattr(self.AD, time_str)
+        for time_format in TIME_FORMATS:
+            try:
+                return datetime.datetime.strptime(time_str, time_format).time()  # noqa: DTZ007 - simulated time is naive
+            except ValueError:
+                continue
+        message = f"Invalid time string '{time_str}'"
+        raise ValueError(message)
+
+    def parse_datetime(
+        self,
+        time_str: str,
+        name: str | None = None,
+        **kwargs: dict,
+    ) -> datetime.datetime:
+        """Parse a datetime string (or a time string, for today)."""
+        del name, kwargs
+        for datetime_format in DATETIME_FORMATS:
+            try:
+                return datetime.datetime.strptime(time_str, datetime_format)  # noqa: DTZ007 - simulated time is naive
+            except ValueError:
+                continue
+        return datetime.datetime.combine(self.date(), self.parse_time(time_str))
+
+    @staticmethod
+    def convert_utc(utc: str) -> datetime.datetime:
+        """Convert a Home Assistant timestamp to a (timezone aware) datetime."""
+        return datetime.datetime.fromisoformat(utc)
+
+    def now_is_between(self, start_time: str, end_time: str, **kwargs: dict) -> bool:
+        """Check if the current time is between two times (which may span midnight)."""
+        del kwargs
+        start, end, now = (
+            self.parse_time(start_time),
+            self.parse_time(end_time),
+            self.time(),
+        )
+        if start <= end:
+            return start <= now <= end
+        return now >= start or now <= end
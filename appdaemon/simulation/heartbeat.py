@@ -0,0 +1,66 @@
+"""Local HTTP server standing in for the heartbeat monitoring service.
+
+Answers heartbeats on the loopback interface (keeping connections alive, as the
+real service does), and can be taken down to simulate an outage.
+"""
+
+from __future__ import annotations
+
+import http.server
+import threading
+
+
+class HeartbeatServer:
+    """Heartbeat endpoint on a free local port, counting requests and connections."""
+
+    def __init__(self):
+        """Start serving heartbeats in a background thread."""
+        self.up = True
+        self.requests = 0
+        self.connections = 0
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            """Answer each heartbeat (with an error while the server is down)."""
+
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                """Count the new connection."""
+                super().setup()
+                server.connections += 1
+
+            def do_GET(self):
+                """Answer a heartbeat."""
+                server.requests += 1
+                self.send_response(200 if server.up else 503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                """Don't log each heartbeat."""
+                del args
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self) -> str:
+        """Get the URL to send heartbeats to."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def set_up(self, up: bool):
+        """Take the server down (answering with errors) or bring it back up."""
+        self.up = up
+
+    def close(self):
+        """Stop serving and close the listening socket."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    @property
+    def stats(self) -> dict:
+        """Get the number of heartbeats and the connections they came on."""
+        return {"requests": self.requests, "connections": self.connections}
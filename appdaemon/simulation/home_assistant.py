@@ -0,0 +1,411 @@
+"""In-memory stand-in for Home Assistant's state machine, event bus and services.
+
+Service calls are recorded and (after a short latency, like a real device) applied
+to the states of the entities they target, so apps see the effect of their calls
+through 'state_changed' events as they would with a live Home Assistant.
+"""
+
+from __future__ import annotations
+
+import collections
+import datetime
+import itertools
+import threading
+from typing import TYPE_CHECKING
+
+import yaml
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+
+    from simulation.clock import Scheduler
+
+HELPER_DOMAINS = (
+    "counter",
+    "input_boolean",
+    "input_datetime",
+    "input_number",
+    "input_select",
+)
+OFF_STATES = ("off", "closed", "locked", "not_home", "unavailable", "unknown")
+
+
+def timestamp(moment: datetime.datetime) -> str:
+    """Get the ISO format Home Assistant uses for state timestamps."""
+    return moment.replace(tzinfo=datetime.UTC).isoformat(timespec="microseconds")
+
+
+def light_turn_on(current: dict, data: dict) -> tuple[str, dict]:
+    """Get a light's state and attributes after turning on."""
+    attributes = current["attributes"]
+    brightness = data.get("brightness", attributes.get("brightness") or 255)
+    if "brightness_pct" in data:
+        brightness = round(data["brightness_pct"] * 2.55)
+    if brightness == 0:
+        return "off", {"brightness": None, "color_temp_kelvin": None}
+    return "on", {
+        "brightness": brightness,
+        "color_temp_kelvin": data.get(
+            "color_temp_kelvin",
+            data.get("kelvin", attributes.get("color_temp_kelvin")),
+        )
+        or attributes.get("max_color_temp_kelvin"),
+    }
+
+
+def fan_set_percentage(current: dict, data: dict) -> tuple[str, dict]:
+    """Get a fan's state and attributes after setting (or turning on at) a speed."""
+    percentage = data.get("percentage", current["attributes"].get("percentage") or 0)
+    percentage = percentage or current["attributes"].get("percentage_step", 100)
+    return "on", {"percentage": percentage}
+
+
+def climate_turn_on(current: dict, data: dict) -> tuple[str, dict]:
+    """Get a climate device's state and attributes after turning on."""
+    hvac_mode = data.get("hvac_mode") or next(
+        mode
+        for mode in current["attributes"].get("hvac_modes", ["heat"])
+        if mode != "off"
+    )
+    return hvac_mode, {
+        key: value for key, value in data.items() if key == "temperature"
+    }
+
+
+DEVICE_DEFAULTS: dict[str, tuple[str, dict]] = {
+    "binary_sensor": ("off", {}),
+    "climate": (
+        "off",
+        {
+            "hvac_modes": ["off", "cool", "heat", "dry"],
+            "fan_modes": ["auto", "low", "medium", "high"],
+            "swing_modes": ["rangefull", "both"],
+            "fan_mode": "auto",
+            "swing_mode": "rangefull",
+            "temperature": 21,
+            "current_temperature": 21,
+        },
+    ),
+    "counter": ("0", {}),
+    "device_tracker": ("home", {}),
+    "event": ("unknown", {"event_type": None}),
+    "fan": (
+        "off",
+        {"percentage": 0, "percentage_step": 100 / 6, "direction": "forward"},
+    ),
+    "humidifier": (
+        "off",
+        {
+            "humidity": 50,
+            "current_humidity": 45,
+            "mode": "Constant Humidity",
+            "available_modes": ["Constant Humidity", "Sleep"],
+        },
+    ),
+    "light": (
+        "off",
+        {
+            "supported_color_modes": ["color_temp"],
+            "min_color_temp_kelvin": 2000,
+            "max_color_temp_kelvin": 6500,
+            "brightness": None,
+            "color_temp_kelvin": None,
+        },
+    ),
+    "lock": ("locked", {}),
+    "media_player": ("off", {"is_volume_muted": False, "source": None}),
+    "person": ("home", {}),
+    "switch": ("off", {}),
+    "update": (
+        "off",
+        {"installed_version": "1.0", "latest_version": "1.0", "auto_update": False},
+    ),
+}
+SENSOR_DEFAULTS = {
+    "temperature": ("21.0", {"humidity_source_value": 50}),
+    "illuminance": ("50", {}),
+}
+SERVICE_EFFECTS: dict[str, Callable[[dict, dict], tuple[str | None, dict]]] = {
+    "light/turn_on": light_turn_on,
+    "light/turn_off": lambda _, __: (
+        "off",
+        {"brightness": None, "color_temp_kelvin": None},
+    ),
+    "fan/turn_on": fan_set_percentage,
+    "fan/set_percentage": lambda current, data: (
+        fan_set_percentage(current, data)
+        if data["percentage"]
+        else ("off", {"percentage": 0})
+    ),
+    "fan/turn_off": lambda _, __: ("off", {"percentage": 0}),
+    "fan/set_direction": lambda _, data: (None, {"direction": data["direction"]}),
+    "climate/turn_on": climate_turn_on,
+    "climate/set_hvac_mode": lambda current, data: (
+        climate_turn_on(current, data) if data["hvac_mode"] != "off" else ("off", {})
+    ),
+    "climate/set_temperature": lambda current, data: (
+        climate_turn_on(current, data)
+        if data.get("hvac_mode", "off") != "off"
+        else (None, {"temperature": data["temperature"]})
+    ),
+    "climate/set_fan_mode": lambda _, data: (None, {"fan_mode": data["fan_mode"]}),
+    "climate/set_swing_mode": lambda _, data: (
+        None,
+        {"swing_mode": data["swing_mode"]},
+    ),
+    "humidifier/set_humidity": lambda _, data: (None, {"humidity": data["humidity"]}),
+    "humidifier/set_mode": lambda _, data: (None, {"mode": data["mode"]}),
+    "input_number/set_value": lambda _, data: (str(float(data["value"])), {}),
+    "input_select/select_option": lambda _, data: (data["option"], {}),
+    "input_datetime/set_datetime": lambda current, data: (
+        str(data.get("time", current["state"])),
+        {},
+    ),
+    "counter/increment": lambda current, _: (str(int(current["state"]) + 1), {}),
+    "counter/decrement": lambda current, _: (str(int(current["state"]) - 1), {}),
+    "counter/reset": lambda _, __: ("0", {}),
+    "counter/set_value": lambda _, data: (str(int(data["value"])), {}),
+    "lock/lock": lambda _, __: ("locked", {}),
+    "lock/unlock": lambda _, __: ("unlocked", {}),
+    "media_player/media_pause": lambda _, __: ("paused", {}),
+    "media_player/media_play": lambda _, __: ("playing", {}),
+    "media_player/select_source": lambda _, data: (None, {"source": data["source"]}),
+    "media_player/volume_mute": lambda _, data: (
+        None,
+        {"is_volume_muted": data["is_volume_muted"]},
+    ),
+}
+
+
+class HomeAssistant:
+    """States of all entities, the event bus and the services that change them."""
+
+    def __init__(self, scheduler: Scheduler, service_latency: float = 0.1):
+        """Start with no entities, listeners or recorded service calls."""
+        self.scheduler = scheduler
+        self.service_latency = service_latency
+        self.states: dict[str, dict] = {}
+        self.helpers: dict[str, dict] = {}
+        self.groups: dict[str, dict] = {}
+        self.listeners: list[Callable[[str, dict], None]] = []
+        self.service_calls: list[tuple[datetime.datetime, str, dict]] = []
+        self.service_counts: collections.Counter[str] = collections.Counter()
+        self.state_changes = 0
+        self.events_fired = 0
+        self.__context_ids = itertools.count(1)
+        self.__lock = threading.Lock()
+
+    def load_packages(self, config_dir: Path):
+        """Load helper (input_*, counter) and group definitions from HA packages."""
+
+        class PackageLoader(yaml.SafeLoader):
+            """Ignore Home Assistant's custom tags (includes, secrets, etc.)."""
+
+        PackageLoader.add_multi_constructor("!", lambda *_: None)
+        for path in sorted(config_dir.rglob("*.yaml")):
+            package = yaml.load(path.read_text(), PackageLoader)  # noqa: S506 - safe
+            if not isinstance(package, dict):
+                continue
+            for domain in HELPER_DOMAINS:
+                for name, config in (package.get(domain) or {}).items():
+                    self.helpers[f"{domain}.{name}"] = config or {}
+            for name, config in (package.get("group") or {}).items():
+                self.groups[f"group.{name}"] = {
+                    "entities": list(config.get("entities", [])),
+                    "all": bool(config.get("all", False)),
+                }
+
+    def default_state(self, entity_id: str) -> tuple[str, dict]:
+        """Get a plausible initial state and attributes for an entity."""
+        domain, name = entity_id.split(".", 1)
+        helper = self.helpers.get(entity_id, {})
+        if domain == "input_number":
+            minimum, maximum = helper.get("min", 0), helper.get("max", 100)
+            step = helper.get("step", 1)
+            value = helper.get(
+                "initial",
+                minimum + round((maximum - minimum) / 2 / step) * step,
+            )
+            return str(float(value)), {"min": minimum, "max": maximum, "step": step}
+        if domain == "input_select":
+            options = helper.get("options", [])
+            return helper.get("initial", options[0] if options else ""), {
+                "options": options,
+            }
+        if domain == "input_boolean":
+            return "on" if helper.get("initial") else "off", {}
+        if domain == "input_datetime":
+            return str(helper.get("initial", "00:00:00")), {}
+        if domain == "group":
+            return "off", {
+                "entity_id": self.groups.get(entity_id, {}).get("entities", []),
+            }
+        return self.__device_default_state(domain, name)
+
+    @staticmethod
+    def __device_default_state(domain: str, name: str) -> tuple[str, dict]:
+        """Get a plausible initial state and attributes for a (non-helper) entity."""
+        state, attributes = DEVICE_DEFAULTS.get(domain, ("unknown", {}))
+        if domain == "sensor":
+            state, attributes = next(
+                (
+                    default
+                    for keyword, default in SENSOR_DEFAULTS.items()
+                    if keyword in name
+                ),
+                (state, attributes),
+            )
+        elif domain == "climate" and "heater" in name:
+            attributes = {**attributes, "hvac_modes": ["off", "heat"]}
+        return state, dict(attributes)
+
+    def exists(self, entity_id: str) -> bool:
+        """Check if an entity has a state (without creating it)."""
+        return entity_id in self.states
+
+    def ensure(self, entity_id: str) -> dict:
+        """Get an entity's state, creating it with default values if it's new."""
+        current = self.states.get(entity_id)
+        if current is None:
+            state, attributes = self.default_state(entity_id)
+            current = self.states[entity_id] = self.__new_state(
+                entity_id,
+                state,
+                attributes,
+                None,
+            )
+            if entity_id.startswith("group."):
+                self.__update_group(entity_id)
+                current = self.states[entity_id]
+        return current
+
+    def set_state(
+        self,
+        entity_id: str,
+        state: str | float | None = None,
+        attributes: dict | None = None,
+        *,
+        user_id: str | None = None,
+    ) -> dict:
+        """Set an entity's state and/or attributes, firing 'state_changed'."""
+        old_state = self.ensure(entity_id)
+        new_state = self.__new_state(
+            entity_id,
+            old_state["state"] if state is None else str(state),
+            {**old_state["attributes"], **(attributes or {})},
+            user_id,
+            old_state,
+        )
+        self.states[entity_id] = new_state
+        self.state_changes += 1
+        self.fire(
+            "state_changed",
+            {"entity_id": entity_id, "old_state": old_state, "new_state": new_state},
+        )
+        if new_state["state"] != old_state["state"]:
+            for group_id, group in self.groups.items():
+                if entity_id in group["entities"] and group_id in self.states:
+                    self.__update_group(group_id)
+        return new_state
+
+    def __new_state(
+        self,
+        entity_id: str,
+        state: str,
+        attributes: dict,
+        user_id: str | None,
+        old_state: dict | None = None,
+    ) -> dict:
+        """Build a state object (never changed once built, so safe to share)."""
+        now = timestamp(self.scheduler.now)
+        attributes.setdefault(
+            "friendly_name",
+            entity_id.split(".", 1)[1].replace("_", " ").capitalize(),
+        )
+        return {
+            "entity_id": entity_id,
+            "state": state,
+            "attributes": attributes,
+            "last_changed": now
+            if old_state is None or old_state["state"] != state
+            else old_state["last_changed"],
+            "last_updated": now,
+            "context": {
+                "id": f"{next(self.__context_ids):032x}",
+                "parent_id": None,
+                "user_id": user_id,
+            },
+        }
+
+    def __update_group(self, group_id: str):
+        """Set a group on if any (or all, if required) of its members are on."""
+        group = self.groups.get(group_id)
+        if group is None:
+            return
+        members_on = [
+            self.ensure(member)["state"] not in OFF_STATES
+            for member in group["entities"]
+        ]
+        state = (
+            "on" if (all if group["all"] else any)(members_on) and members_on else "off"
+        )
+        if self.states[group_id]["state"] != state:
+            self.set_state(group_id, state)
+
+    def fire(self, event_type: str, data: dict):
+        """Fire an event to every listener on the bus."""
+        self.events_fired += 1
+        for listener in self.listeners:
+            listener(event_type, data)
+
+    def call_service(self, service: str, data: dict, user_id: str | None = None):
+        """Record a service call, applying it to its entities after the latency."""
+        with self.__lock:
+            self.service_calls.append((self.scheduler.now, service, data))
+            self.service_counts[service] += 1
+        entity_ids = data.get("entity_id")
+        if not entity_ids or service.startswith("notify/"):
+            return
+        self.scheduler.schedule_in(
+            self.service_latency,
+            self.__apply_service,
+            service,
+            [entity_ids] if isinstance(entity_ids, str) else list(entity_ids),
+            {key: value for key, value in data.items() if key != "entity_id"},
+            user_id,
+        )
+
+    def __apply_service(
+        self,
+        service: str,
+        entity_ids: list[str],
+        data: dict,
+        user_id: str | None,
+    ):
+        """Change the state of entities as the service would."""
+        domain, action = service.split("/")
+        for entity_id in entity_ids:
+            entity_domain = entity_id.split(".", 1)[0]
+            if domain == "homeassistant" and entity_domain == "group":
+                self.__apply_service(
+                    service,
+                    self.groups.get(entity_id, {}).get("entities", []),
+                    data,
+                    user_id,
+                )
+                continue
+            current = self.ensure(entity_id)
+            entity_action = action
+            if action == "toggle":
+                entity_action = (
+                    "turn_off" if current["state"] not in OFF_STATES else "turn_on"
+                )
+            effect = SERVICE_EFFECTS.get(f"{entity_domain}/{entity_action}")
+            if effect is not None:
+                state, attributes = effect(current, data)
+            elif entity_action in ("turn_on", "turn_off"):
+                state, attributes = entity_action.removeprefix("turn_"), {}
+            else:
+                continue
+            self.set_state(entity_id, state, attributes, user_id=user_id)
@@ -0,0 +1,246 @@
+"""Simulated residents and surroundings, changing sensor states through each day.
+
+The routine is randomised but seeded, so a given seed always produces the same
+days (and so comparable benchmarks).
+"""
+
+from __future__ import annotations
+
+import datetime
+import math
+import random
+from typing import TYPE_CHECKING
+
+from simulation.appdaemon import referenced_entity_ids
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+
+    from simulation.appdaemon import AppDaemon
+
+OCCUPANCY_SUFFIXES = (
+    "_motion",
+    "_occupancy",
+    "_person_detected",
+    "_motion_detected",
+    "_pet_detected",
+    "_active_at_home",
+)
+AWAKE = (datetime.time(6, 30), datetime.time(22, 30))
+WEATHER_PERIOD = 300
+USER_ID = "simulated_user"
+
+
+class Household:
+    """Residents moving around, going out, watching TV and adjusting lights."""
+
+    def __init__(self, ad: AppDaemon, seed: int = 0):
+        """Prepare a household for the simulated house."""
+        self.ad = ad
+        self.hass = ad.hass
+        self.scheduler = ad.scheduler
+        self.random = random.Random(seed)  # noqa: S311 - not used for security
+        self.home = True
+
+    def seed(self, config_dir: Path, initial_states: dict):
+        """Create the entities the apps and packages define, and set initial states.
+
+        Initial states are given by entity ID, either as a state or as a dictionary
+        with a 'state' and/or 'attributes'.
+        """
+        self.hass.load_packages(config_dir)
+        for entity_id in sorted(
+            referenced_entity_ids(self.ad.apps_dir)
+            | set(self.hass.helpers)
+            | set(self.hass.groups),
+        ):
+            self.hass.ensure(entity_id)
+        for entity_id, state in initial_states.items():
+            if isinstance(state, dict):
+                self.hass.set_state(
+                    entity_id,
+                    state.get("state"),
+                    state.get("attributes"),
+                )
+            else:
+                self.hass.set_state(entity_id, state)
+        self.hass.state_changes = 0
+        self.hass.events_fired = 0
+
+    def start(self):
+        """Start the daily routine (and weather) from the current simulated time."""
+        self.__plan_day()
+        for entity_id in self.__entities("binary_sensor.", OCCUPANCY_SUFFIXES):
+            self.__schedule_visit(entity_id)
+        self.__update_weather()
+
+    def __entities(self, prefix: str, suffixes: tuple[str, ...] = ("",)) -> list[str]:
+        """Get the IDs of existing entities with a prefix and one of the suffixes."""
+        return sorted(
+            entity_id
+            for entity_id in self.hass.states
+            if entity_id.startswith(prefix) and entity_id.endswith(suffixes)
+        )
+
+    def __at(self, time: datetime.time, spread: float = 0) -> datetime.datetime:
+        """Get today's occurrence of a time, moved randomly by up to spread minutes."""
+        return datetime.datetime.combine(
+            self.scheduler.now.date(),
+            time,
+        ) + datetime.timedelta(minutes=self.random.uniform(-spread, spread))
+
+    def __schedule(self, at: datetime.datetime, callback: Callable, *args):
+        """Schedule part of today's routine (unless its time has already passed)."""
+        if at >= self.scheduler.now:
+            self.scheduler.schedule(at, callback, *args)
+
+    def __set(self, entity_id: str, state: str | None, attributes: dict | None = None):
+        """Set an entity's state as its sensor (or Home Assistant) would."""
+        self.hass.set_state(entity_id, state, attributes)
+
+    def __plan_day(self):
+        """Schedule today's routine, then planning of the next day at midnight."""
+        sunrise, sunset = self.ad.sunrise, self.ad.sunset
+        for time, dark in ((sunrise, "off"), (sunset, "on")):
+            self.__schedule(
+                self.__at(time, 15),
+                self.__set,
+                "binary_sensor.dark_outside",
+                dark,
+            )
+        if self.scheduler.now.weekday() < 5:  # noqa: PLR2004 - weekdays
+            self.__schedule(
+                self.__at(datetime.time(8, 30), 20),
+                self.__set_home,
+                "not_home",
+            )
+            self.__schedule(
+                self.__at(datetime.time(17, 30), 60),
+                self.__set_home,
+                "home",
+            )
+        tv_on = self.__at(datetime.time(19, 45), 30)
+        self.__schedule(tv_on, self.__set_tv, "playing")
+        self.__schedule(
+            tv_on + datetime.timedelta(minutes=self.random.uniform(45, 150)),
+            self.__set_tv,
+            "off",
+        )
+        for door in self.__entities("binary_sensor.", ("_door",)):
+            for _ in range(3):
+                opened = self.__at(datetime.time(14, 30), 8 * 60)
+                self.__schedule(opened, self.__set, door, "on")
+                self.__schedule(
+                    opened + datetime.timedelta(minutes=self.random.uniform(1, 10)),
+                    self.__set,
+                    door,
+                    "off",
+                )
+        lights = self.__entities("light.")
+        for _ in range(2):
+            self.__schedule(
+                self.__at(datetime.time(15), 6 * 60),
+                self.__adjust_light,
+                self.random.choice(lights),
+            )
+        self.scheduler.schedule(
+            datetime.datetime.combine(
+                self.scheduler.now.date() + datetime.timedelta(days=1),
+                datetime.time(),
+            ),
+            self.__plan_day,
+        )
+
+    def __set_home(self, state: str):
+        """Change whether the residents are home (leaving or returning together)."""
+        self.home = state == "home"
+        for person in self.__entities("person."):
+            self.__set(person, state)
+        for sensor in ("binary_sensor.anyone_home", "binary_sensor.resident_home"):
+            self.__set(sensor, "on" if self.home else "off")
+
+    def __set_tv(self, state: str):
+        """Start playing on the TV (if anyone's home to watch), or turn it off."""
+        if state == "playing" and not self.home:
+            return
+        self.__set("media_player.tv", state)
+        self.__set("binary_sensor.tv_playing", "on" if state == "playing" else "off")
+
+    def __adjust_light(self, light: str):
+        """Have a resident manually change a light's brightness."""
+        if not self.home:
+            return
+        self.hass.set_state(
+            light,
+            "on",
+            {"brightness": self.random.randint(30, 255)},
+            user_id=USER_ID,
+        )
+
+    def __schedule_visit(self, sensor: str):
+        """Schedule the next time someone (or a pet) is detected by a sensor."""
+        awake = AWAKE[0] <= self.scheduler.now.time() < AWAKE[1]
+        self.scheduler.schedule_in(
+            self.random.expovariate(1 / (40 * 60 if awake else 4 * 60 * 60)),
+            self.__visit,
+            sensor,
+        )
+
+    def __visit(self, sensor: str):
+        """Detect presence for a while (if anyone's home), then schedule the next."""
+        if self.home or sensor.endswith("_pet_detected"):
+            self.__set(sensor, "on")
+            self.scheduler.schedule_in(
+                self.random.uniform(60, 15 * 60),
+                self.__set,
+                sensor,
+                "off",
+            )
+        self.__schedule_visit(sensor)
+
+    def __update_weather(self):
+        """Update temperatures, humidity and light levels, then schedule the next."""
+        now = self.scheduler.now
+        hours = now.hour + now.minute / 60
+        outside = 18 + 7 * math.sin(2 * math.pi * (hours - 9) / 24)
+        outside += self.random.gauss(0, 0.3)
+        self.__set("sensor.outside_apparent_temperature", f"{outside:.1f}")
+        inside = []
+        for sensor in self.__entities(
+            "sensor.",
+            ("_apparent_temperature_ignoring_wind",),
+        ):
+            current = self.hass.ensure(sensor)
+            room = sensor.removeprefix("sensor.").removesuffix(
+                "_apparent_temperature_ignoring_wind",
+            )
+            target = 0.3 * outside + 0.7 * 21
+            for device in (f"climate.{room}_aircon", f"climate.{room}_heater"):
+                climate = self.hass.states.get(device)
+                if climate is not None and climate["state"] != "off":
+                    target = climate["attributes"].get("temperature") or target
+            temperature = float(current["state"]) + 0.1 * (
+                target - float(current["state"])
+            )
+            temperature += self.random.gauss(0, 0.1)
+            inside.append(temperature)
+            humidity = current["attributes"].get("humidity_source_value", 50)
+            humidity = min(max(humidity + self.random.gauss(0, 1), 30), 70)
+            self.__set(
+                sensor,
+                f"{temperature:.1f}",
+                {"humidity_source_value": round(humidity, 1)},
+            )
+        if inside:
+            self.__set(
+                "sensor.weighted_average_inside_apparent_temperature",
+                f"{sum(inside) / len(inside):.1f}",
+            )
+        daylight = self.ad.sunrise <= now.time() < self.ad.sunset
+        for sensor in self.__entities("sensor.", ("_illuminance",)):
+            self.__set(
+                sensor,
+                str(round(max(self.random.gauss(150 if daylight else 3, 5), 0))),
+            )
+        self.scheduler.schedule_in(WEATHER_PERIOD, self.__update_weather)